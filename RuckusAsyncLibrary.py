@@ -0,0 +1,328 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+'''
+PURPOSE
+This file contains asyncio versions of the RuckusLibrary controller calls.
+
+RuckusLibrary blocks a thread for every AP it programs. asyncRuckusClient
+runs the same controller operations as coroutines, so one event loop can
+program a whole zone of APs with a limited number of requests open at once.
+'''
+# ------------------------------------------------------------------------------
+'''
+OBJECTS
+    asyncRuckusClient takes the same controllerInputObject as RuckusLibrary.
+    It logs in once and shares its JSESSIONID between every AP.
+
+        async with RuckusAsyncLibrary.asyncRuckusClient(userInputObject) as client:
+            zoneStatus = await client.retrieveZoneInfo()
+            results = await client.programAPs(apInfoObjList)
+
+    Or from a thread without an event loop:
+
+        results = RuckusAsyncLibrary.programAPs(userInputObject, apInfoObjList)
+
+    Request bodies and QC comparisons come from RuckusLibrary so both
+    libraries program APs the same way.
+'''
+# ------------------------------------------------------------------------------
+# Python/3rd Party Libraries
+import asyncio
+import json
+import aiohttp
+# UI Libraries
+import RuckusLibrary
+import retrypolicy  # bounds the controller and zone change retries
+
+MAXREQUESTS = 8  # controller requests allowed in flight at once
+REQUESTTIMEOUT = 30  # seconds before a controller request is retried
+RETRYDELAY = 1  # seconds between retries when the controller can't be reached
+ZONERETRYDELAY = 10  # longest wait between zone change attempts while the AP joins the controller
+# same limits as RuckusLibrary.controllerRetry, the delays are awaited so other APs keep running
+requestRetry = retrypolicy.retryPolicy((aiohttp.ClientError, asyncio.TimeoutError), deadline=120, baseDelay=RETRYDELAY, maxDelay=15, onGiveUp=retrypolicy.printGiveUp('Controller'))
+# the AP has APONLINETIMEOUT seconds to join the controller before programming it is given up
+zoneRetry = retrypolicy.retryPolicy(RuntimeError, deadline=RuckusLibrary.APONLINETIMEOUT, baseDelay=2, maxDelay=ZONERETRYDELAY, onGiveUp=retrypolicy.printGiveUp('Zone change'))
+
+
+class asyncRuckusClient:
+    def __init__(self, userInputObject, maxRequests=MAXREQUESTS):
+        self.userInputObject = userInputObject
+        self.maxRequests = maxRequests
+        self.zoneInfoObject = RuckusLibrary.initializeZoneInfo(userInputObject)
+        self.semaphore = asyncio.Semaphore(maxRequests)  # bounds concurrent controller requests
+        self.loginLock = asyncio.Lock()  # one login at a time, waiting APs reuse it
+        self.sessionID = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, excType, exc, tb):
+        await self.close()
+
+    def url(self, path):
+        return 'https://' + self.zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/' + path
+
+    async def open(self):
+        if self.sessionID is None:
+            connector = aiohttp.TCPConnector(ssl=False, limit=self.maxRequests)
+            timeout = aiohttp.ClientTimeout(total=REQUESTTIMEOUT)
+            self.sessionID = aiohttp.ClientSession(connector=connector, timeout=timeout, cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def close(self):
+        if self.sessionID is not None:
+            if self.zoneInfoObject.validSession is True:
+                await self.logout()
+            await self.sessionID.close()
+            self.sessionID = None
+
+    # ---------------------------------SESSION----------------------------------
+    async def login(self):
+        # body for login request
+        loginRequestBody = {
+            'username': self.userInputObject.loginUsername,
+            'password': self.userInputObject.loginPassword,
+            'apiVersions': [
+                'v6_1'
+            ],
+            'timeZoneUtvOffset': '-04:00'
+        }
+        print('Logging into Ruckus controller...')
+        for ip in self.userInputObject.controllerCluster:
+            try:
+                async with self.semaphore:
+                    async with self.sessionID.post('https://' + ip + ':8443/wsg/api/public/v6_1/session', headers=RuckusLibrary.universalHeaders, data=json.dumps(loginRequestBody)) as loginRequest:
+                        status = loginRequest.status
+                if status == 200:  # checks HTTP response code
+                    self.zoneInfoObject.sessionIP = ip
+                    self.zoneInfoObject.validSession = True
+                    print('Logged into Ruckus controller.')
+                    return 200
+                elif status == 401:
+                    print('Controller username or password is incorrect.')
+                    return 202
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                print("Login attempt failed, didn't receive connection to controller...")
+                await asyncio.sleep(RETRYDELAY)
+        return False  # all ips failed on login
+
+    async def logout(self):
+        try:
+            async with self.sessionID.delete(self.url('session'), headers=RuckusLibrary.universalHeaders) as logoutRequest:
+                status = logoutRequest.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status = None
+        self.zoneInfoObject.validSession = False
+        print('Logged out of Ruckus Controller.')
+        return status
+
+    async def ensureSession(self):
+        async with self.loginLock:
+            while self.zoneInfoObject.validSession is False:
+                loginAttempt = await self.login()
+                if loginAttempt == 202:  # wrong username/password, retrying won't help
+                    return loginAttempt
+                if loginAttempt != 200:
+                    await asyncio.sleep(RETRYDELAY)
+        return 200
+
+    async def request(self, method, path, body=None, params=None):
+        # returns [statusCode, json], logs in again if the JSESSIONID expires
+        # connection errors are raised once requestRetry gives up
+        retry = requestRetry.start()
+        while True:
+            if await self.ensureSession() != 200:
+                return [202, None]
+            sessionIP = self.zoneInfoObject.sessionIP
+            try:
+                async with self.semaphore:
+                    async with self.sessionID.request(method, self.url(path), headers=RuckusLibrary.universalHeaders, params=params, data=None if body is None else json.dumps(body)) as response:
+                        status = response.status
+                        try:
+                            responseJSON = await response.json(content_type=None)
+                        except ValueError:
+                            responseJSON = None
+                if status == 401:  # session expired, only the first AP to see it logs in again
+                    if self.zoneInfoObject.sessionIP == sessionIP:
+                        print('Controller session expired. Logging in again...')
+                        self.zoneInfoObject.validSession = False
+                    continue
+                return [status, responseJSON]
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                print('Error connecting to controller. Check your internet connection.')
+                self.zoneInfoObject.validSession = False
+                await asyncio.sleep(retry.nextDelay(error))
+
+    # --------------------------------ZONE INFO---------------------------------
+    async def retrieveZoneInfo(self):
+        print('\n*****************************Retrieving AP lists...*****************************')
+        loginAttempt = await self.ensureSession()
+        if loginAttempt != 200:
+            return loginAttempt
+        zoneIDs = self.zoneInfoObject.getCache('zone')
+        if zoneIDs is not None:  # zone and AP group IDs haven't expired
+            self.zoneInfoObject.apZoneID, self.zoneInfoObject.apGroupID = zoneIDs
+            return 200
+        zoneList = await self.retrieveZoneList()
+        if zoneList == 200:
+            if await self.retrieveAPGroupList() is True:
+                self.zoneInfoObject.setCache('zone', [self.zoneInfoObject.apZoneID, self.zoneInfoObject.apGroupID])
+            print('******************************AP Lists retrieved.*******************************\n')
+        return zoneList
+
+    async def retrieveZoneList(self):
+        print('Retrieving zone list...')
+        status, apZoneList = await self.request('GET', 'rkszones', params={'listSize': '999'})
+        if status == 200:  # checks HTTP response code
+            for zones in apZoneList['list']:
+                if zones['name'] == self.zoneInfoObject.apZoneName:
+                    print('Zone ID retrieved.')
+                    self.zoneInfoObject.apZoneID = zones['id']
+                    self.zoneInfoObject.apZoneList = apZoneList
+                    return 200
+            print('Zone not found. Please check zone spelling.')
+            return 404
+        print(status)
+        return status
+
+    async def retrieveAPGroupList(self):
+        print('Retrieving AP group list...')
+        status, apGroupList = await self.request('GET', 'rkszones/' + self.zoneInfoObject.apZoneID + '/apgroups', params={'listSize': '999'})
+        if status == 200:  # checks HTTP response code
+            self.zoneInfoObject.apGroupList = apGroupList
+            self.zoneInfoObject.apGroupID = apGroupList['list'][0]['id']
+            return True
+        print('AP group list retrieval failed.')
+        print(status)
+        return status
+
+    async def retrieveWLANGroupList(self, apInfoObj):
+        wlanGroups = self.zoneInfoObject.getCache('wlanGroups')
+        if wlanGroups is not None:  # shares RuckusLibrary's zone metadata cache
+            RuckusLibrary.selectWLANGroup(wlanGroups, apInfoObj)
+            return 200
+        print('Retrieving WLAN Group list...')
+        status, wlanGroupList = await self.request('GET', 'rkszones/' + self.zoneInfoObject.apZoneID + '/wlangroups', params={'listSize': '99999'})
+        if status == 200:  # checks HTTP response code
+            wlanGroups = RuckusLibrary.wlanGroupIndex(wlanGroupList)
+            self.zoneInfoObject.setCache('wlanGroups', wlanGroups)
+            RuckusLibrary.selectWLANGroup(wlanGroups, apInfoObj)
+            return 200
+        print('WLAN Group list retrieval failed.')
+        print(status)
+        return status
+
+    async def retrievePortID(self):
+        portIDs = self.zoneInfoObject.getCache('portIDs')
+        if portIDs is not None:  # port profiles are the same for every AP in the zone
+            return portIDs
+        status, portList = await self.request('GET', 'rkszones/' + self.zoneInfoObject.apZoneID + '/profile/ethernetPort')
+        if status == 200:  # checks HTTP response code
+            portIDs = RuckusLibrary.selectPortIDs(portList)
+            self.zoneInfoObject.setCache('portIDs', portIDs)
+            return portIDs
+        print('Ethernet Port Profile list retrieval failed.')
+        return status
+
+    # -----------------------------------APS------------------------------------
+    async def retrieveAPConfig(self, apInfoObj):
+        status, apConfig = await self.request('GET', 'aps/' + apInfoObj.apMAC)
+        if status == 200:  # checks HTTP response code
+            return apConfig
+        return status
+
+    async def changeAPZone(self, apInfoObj):
+        status, response = await self.request('PATCH', 'aps/' + apInfoObj.apMAC, body=RuckusLibrary.apZoneBody(self.zoneInfoObject))
+        if status == 204:  # checks HTTP response code
+            print(apInfoObj.apSSID + ' zone changed.')
+        elif status == 422:
+            print(apInfoObj.apSSID + ' already in a zone.')
+        else:
+            print(apInfoObj.apSSID + ' zone change failed: ' + str(status))
+        return status
+
+    async def changeAPConfig(self, apInfoObj):
+        status, response = await self.request('PATCH', 'aps/' + apInfoObj.apMAC, body=RuckusLibrary.apConfigBody(apInfoObj))
+        if status == 204:  # checks HTTP response code
+            print(apInfoObj.apSSID + ' configuration changed.')
+        elif status == 211:
+            print(apInfoObj.apSSID + ' not on controller.')
+        else:
+            print(apInfoObj.apSSID + ' configuration failed: ' + str(status))
+        return status
+
+    async def changeAPSpecific(self, apInfoObj):
+        apConfig = await self.retrieveAPConfig(apInfoObj)
+        try:
+            apInfoObj.apModel = apConfig['model']
+        except (KeyError, TypeError):
+            print('Model not found in AP Config')
+        portIDs = await self.retrievePortID()
+        if isinstance(portIDs, int):  # port profile list couldn't be retrieved, returns its status
+            return portIDs
+        status, response = await self.request('PUT', 'aps/' + apInfoObj.apMAC + '/specific', body=RuckusLibrary.apSpecificBody(apInfoObj.apModel, portIDs))
+        return status
+
+    async def checkAPConfig(self, apInfoObj, poeSpecific=False):
+        # returns the same list as RuckusLibrary.checkAPConfig
+        status, apConfig = await self.request('GET', 'aps/' + apInfoObj.apMAC)
+        if status != 200:
+            return status
+        apInfoObj.apSN = apConfig['serial']
+        return RuckusLibrary.compareAPConfig(apConfig, poeSpecific, self.zoneInfoObject, apInfoObj)
+
+    async def deleteRefurbAP(self, apMAC):
+        print('Deleting AP from controller...')
+        status, response = await self.request('DELETE', 'aps/' + apMAC)
+        if status == 204:  # checks HTTP response code
+            print('AP deletion Successful.')
+            return True
+        elif status == 404:
+            print('AP not found on controller.')
+            return None
+        print('AP deletion failure.')
+        return False
+
+    # --------------------------------PROGRAMMING-------------------------------
+    async def programAP(self, apInfoObj, attempts=3):
+        # same steps as programKaiACK.kaiACKProgramSingleAP, returns the qc list
+        if self.zoneInfoObject.apZoneID == '':
+            print("Couldn't find AP Zone. Please relaunch and enter a valid zone.")
+            return False
+        wlanStatus = await self.retrieveWLANGroupList(apInfoObj)
+        if wlanStatus != 200 or apInfoObj.wlanInfo.wlanGroupID == '':
+            print('No WLAN IDs retrieved for ' + apInfoObj.apSSID)
+            return False
+        qcAP = False
+        for attempt in range(attempts):
+            retry = zoneRetry.start()
+            zoneStatus = await self.changeAPZone(apInfoObj)
+            while zoneStatus not in (204, 422):  # AP may not have joined the controller yet
+                try:
+                    await asyncio.sleep(retry.nextDelay(RuntimeError('status ' + str(zoneStatus))))
+                except RuntimeError:
+                    print(apInfoObj.apSSID + ' never joined the controller.')
+                    return False
+                zoneStatus = await self.changeAPZone(apInfoObj)
+            await self.changeAPConfig(apInfoObj)
+            qcAP = await self.checkAPConfig(apInfoObj)
+            if isinstance(qcAP, list) and qcAP[0] is True:
+                print(apInfoObj.apSSID + ' settings correct.')
+                break
+            print('Detected AP error on ' + apInfoObj.apSSID + '. Retrying...')
+        return qcAP
+
+    async def programAPs(self, apInfoObjList):
+        # programs every AP concurrently, the semaphore keeps the controller load bounded
+        return await asyncio.gather(*[self.programAP(apInfoObj) for apInfoObj in apInfoObjList], return_exceptions=True)
+
+
+def programAPs(userInputObject, apInfoObjList, maxRequests=MAXREQUESTS):
+    # blocking entry point for threads that don't run an event loop
+    async def run():
+        async with asyncRuckusClient(userInputObject, maxRequests) as client:
+            zoneStatus = await client.retrieveZoneInfo()
+            if zoneStatus != 200:
+                return zoneStatus
+            return await client.programAPs(apInfoObjList)
+    return asyncio.run(run())
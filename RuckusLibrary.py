@@ -47,6 +47,16 @@ OBJECTS
     to create an object using the initializeZoneInfo class if you're doing
     anything AP/zone related.
 
+    --SESSION POOL--
+    Logged in sessions are kept in sessionPool and shared between threads.
+    Sessions are keyed by controller cluster, port and username, so every AP
+    on a site reuses the same JSESSIONID instead of logging in and out.
+
+        loginAttempt, sessionID = RuckusLibrary.sessionPool.getSession(zoneInfoObject, userInputObject)
+
+    A 401 response drops the pooled session and the next getSession call logs
+    in again. Call sessionPool.closeAll() once when the program exits.
+
     --WITH KAI-ACK--
     RuckusLibrary is used alongside Kai-ACK.
     The programKaiACK class is used to program both single and double APs.
@@ -61,8 +71,11 @@ import time
 import json
 import socket
 import urllib3
+import threading  # session pool is shared by the AP programming threads
 # UI Libraries
 import googlesheets
+import readiness  # waits for the AP to show up on the controller
+import retrypolicy  # backoff for controller connection errors
 import traceback  # helps identify errors
 from pubsub import pub as Publisher  # used to post messages in UI
 import wx  # used for login error message
@@ -80,10 +93,16 @@ universalHeaders = {
 universalCookies = {
     'Cookie': 'JSESSIONID={JSESSIONID}'
     }
+ZONEAPPAGESIZE = 1000  # APs requested per page of the zone AP list
+ZONECACHETTL = 3600  # seconds zone metadata is reused before it's downloaded again
+# connection errors are retried with backoff and jitter so AP threads don't all hit a recovering controller together,
+# the error is raised once the deadline passes
+controllerRetry = retrypolicy.retryPolicy((socket.gaierror, requests.exceptions.ConnectionError), deadline=120, baseDelay=1, maxDelay=15, onGiveUp=retrypolicy.printGiveUp('Controller'))
+APONLINETIMEOUT = 60  # seconds to wait for the controller to report the AP before changing the zone again
 
 # --------------------------------CLASSES---------------------------------------
 class initializeZoneInfo:  # retrieves static zone information
-    def __init__(self, userInputObject):
+    def __init__(self, userInputObject, cacheTTL=ZONECACHETTL):
         self.userInputObject = userInputObject
         # --------------------------------------------
         self.apZoneName = userInputObject.apZoneName
@@ -93,18 +112,50 @@ class initializeZoneInfo:  # retrieves static zone information
         self.apZoneID = ''
         self.sessionIP = ''  # zone info class uses sessionIP inside its functions
         self.validSession = False  # used in each function to check if session is good
+        # zone metadata cache, changes maybe once per site so APs share it
+        # 'zone' - [apZoneID, apGroupID]
+        # 'wlanGroups' - WLAN group name to ID index
+        # 'portIDs' - [accessPortID, trunkPortID]
+        self.cacheTTL = cacheTTL
+        self.cache = {}  # [value, time stored] by name
+        self.cacheLock = threading.Lock()  # APs are programmed from multiple threads
+
+    def getCache(self, name):  # returns None if missing or older than cacheTTL
+        with self.cacheLock:
+            if name not in self.cache:
+                return None
+            value, timeStored = self.cache[name]
+            if time.time() - timeStored > self.cacheTTL:
+                del self.cache[name]
+                return None
+            return value
+
+    def setCache(self, name, value):
+        with self.cacheLock:
+            self.cache[name] = [value, time.time()]
+
+    def invalidateCache(self, name=None):  # clears one entry, or everything if name is None
+        with self.cacheLock:
+            if name is None:
+                self.cache = {}
+            elif name in self.cache:
+                del self.cache[name]
+
     def retrieveZoneInfo(self):
-        sessionID = requests.session()  # ID used to store session cookies  # ID used to store session cookies
         print('\n*****************************Retrieving AP lists...*****************************')
-        loginAttempt = loginRuckus(sessionID, self, self.userInputObject)
+        loginAttempt, sessionID = sessionPool.getSession(self, self.userInputObject)  # session stays logged in for programming
         if loginAttempt == 200:  # login successful
+            zoneIDs = self.getCache('zone')
+            if zoneIDs is not None:  # zone and AP group IDs haven't expired
+                self.apZoneID, self.apGroupID = zoneIDs
+                print('******************************AP Lists retrieved.*******************************\n')
+                return 200
+
             zoneList = retrieveZoneList(sessionID, self, self.userInputObject)
 
             if zoneList == 200:
-                retrieveAPGroupList(sessionID, self, self.userInputObject)
-
-                logoutRuckus(sessionID, self.sessionIP)
-                self.sessionIP = None
+                if retrieveAPGroupList(sessionID, self, self.userInputObject) is True:
+                    self.setCache('zone', [self.apZoneID, self.apGroupID])
 
                 print('******************************AP Lists retrieved.*******************************\n')
                 return 200
@@ -138,15 +189,16 @@ class initializeAP:
         self.wlanInfo = wlanInfo
 
 class programKaiACK:  # skeleton class that calls objects for programming APs
-    def __init__(self, userInputObject):
+    def __init__(self, userInputObject, cacheTTL=ZONECACHETTL):
         # STORES USER INPUTS & OBJECTS
         self.userInputObject = userInputObject  # used in zoneInfo & prog APs
+        self.cacheTTL = cacheTTL  # how long zone metadata is reused between APs
         # -------------------------------------
         self.zoneInfoObject = None
 
     def kaiACKRetrieveZoneInfo(self):
         # ZONE INFO
-        self.zoneInfoObject = initializeZoneInfo(self.userInputObject)  # initializes zoneInfo object
+        self.zoneInfoObject = getZoneInfo(self.userInputObject, self.cacheTTL)  # reuses the zoneInfo object for this zone so its cache is kept
         zoneInfoStatus = self.zoneInfoObject.retrieveZoneInfo()  # populates zoneInfo object with IDs
         return zoneInfoStatus  # will return True or False
 
@@ -166,7 +218,7 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
             Publisher.sendMessage('status', ssid=panel.ssid, message="Couldn't find AP Zone. Please relaunch and enter a valid zone.", group = 1)
             return panel
 
-        sessionID = requests.session()  # ID used to store session cookies
+        sessionID = None  # pooled session, shared with the other AP threads
         # -------------------------RETRIEVES DATA---------------------------
         # operates if required AP Lists info is retrieved successfully
         # or doesn't recieve the info it needs from a previous command
@@ -175,9 +227,9 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
 
             # LOGIN BLOCK
             printLoginPublisher = True
-            while self.zoneInfoObject.validSession is False:  # loops until session is established
-                # selects controller ip to use for programming process
-                loginAttempt = loginRuckus(sessionID, self.zoneInfoObject, self.userInputObject)
+            while self.zoneInfoObject.validSession is False or sessionID is None:  # loops until session is established
+                # reuses the pooled session, only logs in if there isn't one
+                loginAttempt, sessionID = sessionPool.getSession(self.zoneInfoObject, self.userInputObject)
                 if loginAttempt == 200:
                     Publisher.sendMessage('status', ssid=panel.ssid, message='Ruckus Controller logged in.', group = 1)
                     break
@@ -196,10 +248,12 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
                     Publisher.sendMessage('status', ssid=panel.ssid, message='WLAN IDs retrieved.', group = 1)
                 else:  # wlanGroupIDs weren't found
                     Publisher.sendMessage('status', ssid=panel.ssid, message='No WLAN IDs retrieved.', group = 1)
+                    self.zoneInfoObject.invalidateCache('wlanGroups')  # WLANs may be created before the retry
                     return False
 
                 # -------------------------CHANGES DATA-----------------------
                 showZoneStatus = True  # variable that sets publisher messages to only print once
+                zonePoll = readiness.poller(1, 10)  # retries back off to the old 10 seconds
                 # CHANGE ZONE
                 while self.zoneInfoObject.validSession is True:
                     changeAPZoneResponse = changeAPZone(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj)
@@ -210,12 +264,15 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
                         if showZoneStatus == True:
                             Publisher.sendMessage('status', ssid=panel.ssid, message='Controller not accepting commands. Make sure AP is on the controller...', group = 1)
                             showZoneStatus = False
-                        time.sleep(10)
+                        # waits for the controller to report the AP instead of a fixed 10 seconds, then still backs off
+                        # so a 403 for another reason (AP already known) doesn't retry the zone change in a tight loop
+                        readiness.waitFor(lambda: isinstance(retrieveAPConfig(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj), dict), APONLINETIMEOUT, 1, 10)
+                        zonePoll.wait()
                     else:
                         if showZoneStatus == True:
                             Publisher.sendMessage('status', ssid=panel.ssid, message='AP zone changed failed, Retrying...', group = 1)
                             showZoneStatus = False
-                        time.sleep(10)
+                        zonePoll.wait()
 
                 # CHANGE CONFIG
                 changeAPConfigResponse = changeAPConfig(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj)
@@ -237,7 +294,6 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
                 qcAP = checkAPConfig(sessionID, False, self.zoneInfoObject, self.userInputObject, apInfoObj)
                 if qcAP[0] == True:  # ends program single AP
                     print('AP settings correct.')
-                    logoutRuckus(sessionID, self.zoneInfoObject.sessionIP)
 
                     panel.apSN = apInfoObj.apSN
                     print('******************************Programmed single AP.*****************************\n')
@@ -263,7 +319,6 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
         # this is one of the messier functions. wasn't really thought out beforehand,
         # but it's functional. at some point we'll rewrite it
         self.zoneInfoObject.validSession = False  # used in each function to check if session is good
-        sessionID = requests.session()  # ID used to store session cookies
         print('\n****************************Programming Double APs...***************************')
 
         if self.zoneInfoObject.apZoneID == None:
@@ -275,8 +330,8 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
         # LOGIN BLOCK
         printLoginPublisher = True
         while self.zoneInfoObject.validSession is False:  # loops until session is established
-            # selects controller ip to use for programming process
-            loginAttempt = loginRuckus(sessionID, self, self.userInputObject)
+            # reuses the pooled session, only logs in if there isn't one
+            loginAttempt, sessionID = sessionPool.getSession(self.zoneInfoObject, self.userInputObject)
             if loginAttempt == 200:
                 Publisher.sendMessage('status', ssid='Double APs', message='Ruckus Controller logged in.')
                 break
@@ -440,11 +495,92 @@ class programKaiACK:  # skeleton class that calls objects for programming APs
             ap += 1
 
 
-        logoutRuckus(sessionID, self.zoneInfoObject.sessionIP)
         print('*****************************Programmed Double APs.*****************************\n')
         return doubleAPList
 
 
+    def programZoneAPs(self, apList):
+        # programs a list of APs from one zone AP list instead of a GET for every AP
+        # apList is [[ssid, mac], ...], returns [[ssid, mac, serial], ...] for APs that passed QC
+        self.zoneInfoObject.validSession = False  # used in each function to check if session is good
+        print('\n*****************************Programming zone APs...****************************')
+
+        if self.zoneInfoObject.apZoneID == '':  # zone lookup failed, an empty zoneId would list every AP on the controller
+            print("Couldn't find AP Zone. Please relaunch and enter a valid zone.")
+            Publisher.sendMessage('status', ssid='Zone APs', message="Couldn't find AP Zone. Please relaunch and enter a valid zone.")
+            return False
+
+        # LOGIN BLOCK
+        printLoginPublisher = True
+        while self.zoneInfoObject.validSession is False:  # loops until session is established
+            # reuses the pooled session, only logs in if there isn't one
+            loginAttempt, sessionID = sessionPool.getSession(self.zoneInfoObject, self.userInputObject)
+            if loginAttempt == 200:
+                Publisher.sendMessage('status', ssid='Zone APs', message='Ruckus Controller logged in.')
+                break
+            elif printLoginPublisher is True:
+                Publisher.sendMessage('status', ssid='Zone APs', message='Controller login error. Retrying...')
+                printLoginPublisher = False  # stops login publisher messages
+
+        # INVENTORY BLOCK
+        zoneAPs = retrieveZoneAPsList(sessionID, self.zoneInfoObject, self.userInputObject)
+        if not isinstance(zoneAPs, dict):
+            Publisher.sendMessage('status', ssid='Zone APs', message="Couldn't retrieve the zone AP list.")
+            return False
+        Publisher.sendMessage('status', ssid='Zone APs', message=str(len(zoneAPs)) + ' APs found in zone.')
+
+        # DELTA BLOCK
+        # the zone AP list only has name, zone and AP group, APs already in the zone are checked with
+        # checkAPConfig for their WLAN groups and static ip, which also gets their serial
+        qcAPs = {}  # checkAPConfig result by MAC
+        changedAPs = []
+        for ap in apList:
+            apInfoObj = initializeAP()
+            apInfoObj.apSSID = ap[0]
+            apInfoObj.apMAC = ap[1]
+            apInfoObj.apIP = '10.10.10.254'
+            apDelta = zoneAPDelta(zoneAPs.get(apInfoObj.apMAC.upper()), self.zoneInfoObject)
+            if len(apDelta) == 0:
+                qcAP = checkAPConfig(sessionID, False, self.zoneInfoObject, self.userInputObject, apInfoObj)
+                if isinstance(qcAP, list) and qcAP[0] is True:
+                    qcAPs[apInfoObj.apMAC] = [qcAP, apInfoObj]
+                    continue
+                apDelta = ['config']
+
+            retrieveWLANGroupList(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj)  # cached after the first AP
+            if apInfoObj.wlanInfo.wlanGroupID == '':
+                Publisher.sendMessage('status', ssid='Zone APs', message=apInfoObj.apSSID + ' skipped, no WLAN IDs retrieved.')
+                continue
+
+            if 'zone' in apDelta:
+                changeAPZoneResponse = changeAPZone(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj)
+                if changeAPZoneResponse == 403:  # AP hasn't joined the controller
+                    Publisher.sendMessage('status', ssid='Zone APs', message=apInfoObj.apSSID + ' not registered on controller.')
+                    continue
+            changeAPConfig(sessionID, self.zoneInfoObject, self.userInputObject, apInfoObj)
+            changedAPs.append(apInfoObj)
+
+        # QC BLOCK
+        # only the APs that were changed are checked again
+        for apInfoObj in changedAPs:
+            qcAPs[apInfoObj.apMAC] = [checkAPConfig(sessionID, False, self.zoneInfoObject, self.userInputObject, apInfoObj), apInfoObj]
+
+        programmedAPs = []
+        for ap in apList:
+            if ap[1] not in qcAPs:
+                Publisher.sendMessage('status', ssid='Zone APs', message=ap[0] + ' not configured')
+                continue
+            qcAP, apInfoObj = qcAPs[ap[1]]
+            if isinstance(qcAP, list) and qcAP[0] is True and apInfoObj.apSN != '':
+                programmedAPs.append([apInfoObj.apSSID, apInfoObj.apMAC, apInfoObj.apSN])
+                Publisher.sendMessage('status', ssid='Zone APs', message=apInfoObj.apSSID + ' configured')
+            else:
+                Publisher.sendMessage('status', ssid='Zone APs', message=apInfoObj.apSSID + ' not configured')
+
+        print('******************************Programmed zone APs.******************************\n')
+        return programmedAPs
+
+
 class controllerInputObject:
     def __init__(self, username, password, controllerCluster, controllerPort, apZoneName):
         self.loginUsername = username
@@ -453,6 +589,72 @@ class controllerInputObject:
         self.controllerPort = controllerPort
         self.apZoneName = apZoneName
 
+class controllerSessionPool:  # keeps logged in controller sessions alive between APs and threads
+    def __init__(self):
+        self.sessions = {}  # [sessionID, sessionIP] stored by cluster/port/username
+        self.lock = threading.Lock()  # one login at a time, waiting threads reuse it
+
+    def sessionKey(self, userInputObject):
+        return (tuple(userInputObject.controllerCluster), str(userInputObject.controllerPort), userInputObject.loginUsername)
+
+    def getSession(self, zoneInfoObject, userInputObject):
+        key = self.sessionKey(userInputObject)
+        with self.lock:
+            if key in self.sessions:  # session already logged in by another AP
+                sessionID, sessionIP = self.sessions[key]
+                zoneInfoObject.sessionIP = sessionIP
+                zoneInfoObject.validSession = True
+                return [200, sessionID]
+
+            sessionID = requests.session()  # ID used to store session cookies
+            # keeps connections open for all of the AP programming threads
+            sessionID.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+            loginAttempt = loginRuckus(sessionID, zoneInfoObject, userInputObject)
+            if loginAttempt == 200:
+                self.sessions[key] = [sessionID, zoneInfoObject.sessionIP]
+            return [loginAttempt, sessionID]
+
+    def sessionExpired(self, response, sessionID, zoneInfoObject, userInputObject):
+        # returns True if the request should be sent again with a fresh session
+        if response.status_code != 401:
+            return False
+        key = self.sessionKey(userInputObject)
+        with self.lock:
+            if key not in self.sessions:  # login itself is failing, let the caller handle the 401
+                return False
+            if self.sessions[key][0] is sessionID:  # another thread may have already replaced it
+                print('Controller session expired. Logging in again...')
+                del self.sessions[key]
+        zoneInfoObject.validSession = False
+        return True
+
+    def closeAll(self):  # logs out of every pooled session
+        with self.lock:
+            for sessionID, sessionIP in self.sessions.values():
+                try:
+                    sessionID.delete('https://' + sessionIP + ':8443/wsg/api/public/v6_1/session', headers=universalHeaders, cookies=universalCookies, verify=False)
+                except requests.exceptions.ConnectionError:
+                    pass
+                sessionID.close()
+            self.sessions = {}
+
+sessionPool = controllerSessionPool()  # shared by every programKaiACK object
+
+# zoneInfo objects kept by cluster/port/username/zone, the UI makes a new programKaiACK each time the controller
+# settings are checked so the zone metadata cache lives here instead of on the programKaiACK object
+zoneInfoObjects = {}
+zoneInfoLock = threading.Lock()
+
+def getZoneInfo(userInputObject, cacheTTL=ZONECACHETTL):
+    key = sessionPool.sessionKey(userInputObject) + (userInputObject.apZoneName,)
+    with zoneInfoLock:
+        if key not in zoneInfoObjects:
+            zoneInfoObjects[key] = initializeZoneInfo(userInputObject, cacheTTL)
+        zoneInfoObject = zoneInfoObjects[key]
+        zoneInfoObject.userInputObject = userInputObject  # password may have been re-entered
+        zoneInfoObject.cacheTTL = cacheTTL
+        return zoneInfoObject
+
 # -----------------------FUNCTION TEMPLATE----------------------------
 # def templateFunction(sessionID, controllerCluster):
 #     serverResponse = checkController.checkController(controllerCluster, sessionID)
@@ -544,12 +746,13 @@ def loginRuckus(sessionID, zoneInfoObj, userInputObject):
             time.sleep(5)
 
 def logoutRuckus(sessionID, ip):
+    retry = controllerRetry.start()
     while True:
         try:
             logoutRequest = sessionID.delete('https://' + ip + ':8443/wsg/api/public/v6_1/session', headers=universalHeaders, cookies=universalCookies, verify=False)
             break
-        except requests.exceptions.ConnectionError:
-            time.sleep(.2)
+        except requests.exceptions.ConnectionError as error:
+            retry.failed(error)
     print('Logged out of Ruckus Controller.')
     return logoutRequest
 
@@ -564,17 +767,16 @@ def retrieveZoneList(sessionID, zoneInfoObject, userInputObject):
         ('listSize', '999'),
     )
     print('Retrieving zone list...')
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             apZoneList = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/rkszones', headers=universalHeaders, cookies=universalCookies, params=zoneListParameters, verify=False)
+            if sessionPool.sessionExpired(apZoneList, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if apZoneList.status_code == 200:  # checks HTTP response code
                 print('Zone list retrieved.')
                 apZoneList = apZoneList.json()
@@ -592,10 +794,10 @@ def retrieveZoneList(sessionID, zoneInfoObject, userInputObject):
                 print(json.dumps(apZoneList, indent=4))
                 return apZoneList.status_code
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
         except (TypeError):
             print('Zone list returned NoneType.')
@@ -609,17 +811,16 @@ def retrieveAPGroupList(sessionID, zoneInfoObject, userInputObject):
         ('listSize', '999'),
         )
     print('Retrieving AP group list...')
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             retrieveAPGroupList = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/rkszones/' + zoneInfoObject.apZoneID + '/apgroups', headers=universalHeaders, cookies=universalCookies, params=zoneListParameters, verify=False)
+            if sessionPool.sessionExpired(retrieveAPGroupList, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if retrieveAPGroupList.status_code == 200:  # checks HTTP response code
                 print('AP group list retrieved.')
                 zoneInfoObject.apGroupList = retrieveAPGroupList.json()
@@ -633,27 +834,26 @@ def retrieveAPGroupList(sessionID, zoneInfoObject, userInputObject):
                 print(retrieveAPGroupList.status_code)
                 print(retrieveAPGroupList.json())
                 return retrieveAPGroupList.status_code
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
 
 def retrieveAPConfig(sessionID, zoneInfoObject, userInputObject, apInfoObj):
     # ----------------------RETRIEVE AP CONFIGURATION---------------------------
+    retry = controllerRetry.start()
     while True:
         try:
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
 
             # runs until a valid response is returned from the controller
             # gets ap configuration response
             retrieveAPConfig = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/aps/' + apInfoObj.apMAC, headers=universalHeaders, cookies=universalCookies, verify=False)
+            if sessionPool.sessionExpired(retrieveAPConfig, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             print('Retrieving AP Configuration...')
             if retrieveAPConfig.status_code == 200:  # checks HTTP response code
                 print('AP configuration retrieval successful.')
@@ -671,10 +871,43 @@ def retrieveAPConfig(sessionID, zoneInfoObject, userInputObject, apInfoObj):
                 print(retrieveAPConfig.status_code)
                 print(json.dumps(retrieveAPConfig.json(), indent=4))
                 return retrieveAPConfig.status_code
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
             zoneInfoObject.validSession = False
+            retry.failed(error)
+
+def wlanGroupIndex(wlanGroupList):  # WLAN group name to ID index, this is what gets cached
+    wlanGroups = {}
+    for wlanGroup in wlanGroupList['list']:
+        wlanGroups[wlanGroup['name']] = wlanGroup['id']
+    return wlanGroups
+
+def selectWLANGroup(wlanGroups, apInfoObj):  # picks the unit WLAN group, falls back to the guest group
+    for wlanGroupName in wlanGroups:
+        # Sets Guest WLAN group as the default
+        if 'guest' in wlanGroupName.lower():
+            apInfoObj.wlanInfo.wlanGroupID = wlanGroups[wlanGroupName]
+            apInfoObj.wlanInfo.wlanGroupName = wlanGroupName
+            apInfoObj.wlanInfo.wlanGroupGuestID = wlanGroups[wlanGroupName]
+            apInfoObj.wlanInfo.wlanGroupGuestName = wlanGroupName
+            break
+    # --------------SSID WLAN Group CHOSEN---------------
+    if apInfoObj.apSSID in wlanGroups:
+        print('WLAN for AP found.')
+        apInfoObj.wlanInfo.wlanGroupID = wlanGroups[apInfoObj.apSSID]
+        apInfoObj.wlanInfo.wlanGroupName = apInfoObj.apSSID
+
+def selectPortIDs(portList):  # returns [accessPortID, trunkPortID] from the ethernet port profile list
+    accessPortID = None
+    trunkPortID = None
+    ap = 0  # this will run through the list of port IDs for the zone
+    while ap < portList['totalCount']:
+        if portList['list'][ap]['name'] == 'Default Access Port':
+            accessPortID = portList['list'][ap]['id']
+        if portList['list'][ap]['name'] == 'Default Trunk Port':
+            trunkPortID = portList['list'][ap]['id']
+        ap += 1
+    return [accessPortID, trunkPortID]
 
 def retrieveWLANGroupList (sessionID, zoneInfoObject, userInputObject, apInfoObj):
     # ----------------RETRIEVE WLAN GROUP LIST-------------------
@@ -683,48 +916,39 @@ def retrieveWLANGroupList (sessionID, zoneInfoObject, userInputObject, apInfoObj
     wlanListParameters = (
         ('listSize', '99999'),
         )
+    wlanGroups = zoneInfoObject.getCache('wlanGroups')
+    if wlanGroups is not None:  # skips the download while the cache is fresh
+        if apInfoObj.apSSID in wlanGroups:
+            selectWLANGroup(wlanGroups, apInfoObj)
+            return 200
+        # unit WLAN group may have been added since the list was cached, downloads it once before falling back to guest
+        zoneInfoObject.invalidateCache('wlanGroups')
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             # runs until a valid response is returned from the controller
             wlanGroupList = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/rkszones/' + zoneInfoObject.apZoneID + '/wlangroups', headers=universalHeaders, cookies=universalCookies, params=wlanListParameters, verify=False)
+            if sessionPool.sessionExpired(wlanGroupList, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if wlanGroupList.status_code == 200:  # checks HTTP response code
-                wlanGroupList = wlanGroupList.json()
+                wlanGroups = wlanGroupIndex(wlanGroupList.json())
+                zoneInfoObject.setCache('wlanGroups', wlanGroups)
                 print('WLAN Group list retrieved.')
-                for wlanGroup in wlanGroupList['list']:  # 'zones' is a variable that iterates through list
-                    # Sets Guest WLAN group as the default
-                    if 'guest' in wlanGroup['name'].lower():
-                        apInfoObj.wlanInfo.wlanGroupID = wlanGroup['id']
-                        apInfoObj.wlanInfo.wlanGroupName = wlanGroup['name']
-                        apInfoObj.wlanInfo.wlanGroupGuestID = wlanGroup['id']
-                        apInfoObj.wlanInfo.wlanGroupGuestName = wlanGroup['name']
-                        break
-                    else:
-                        'No guest WLAN Group found.'
-                # --------------SSID WLAN Group CHOSEN---------------
-                for wlans in wlanGroupList['list']:
-                    if wlans['name'] == apInfoObj.apSSID:
-                        print('WLAN for AP found.')
-                        apInfoObj.wlanInfo.wlanGroupID = wlans['id']
-                        apInfoObj.wlanInfo.wlanGroupName = wlans['name']
-                        break
+                selectWLANGroup(wlanGroups, apInfoObj)
                 return 200
             else:
                 print('WLAN Group list retrieval failed.')
                 print(wlanGroupList.status_code)
                 print(json.dumps(wlanGroupList.json(), indent=4))
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
 
 def retrieveWLANGroupConfig (apIDs, apLists, wlanGroupList, sessionID, controllerCluster, panel):
@@ -761,30 +985,136 @@ def retrieveWLANGroupConfig (apIDs, apLists, wlanGroupList, sessionID, controlle
         time.sleep(1)
 
 
-def changeAPZone(sessionID, zoneInfoObject, userInputObject, apInfoObj):
-    # ----------------CHANGE BASIC AP CONFIGURATION-------------------
-    print('Changing AP zone...')
-    # body for request is converted into json through json.dump
-    # body used to change the ap zone
-    sendAPConfig = {
+def apZoneBody(zoneInfoObject):  # body used to change the ap zone
+    return {
         "zoneId": zoneInfoObject.apZoneID,
         "apGroupId": zoneInfoObject.apGroupID,
         "network": {
             "ipType": "Dynamic" # APs set to static before cannot be moved without primary and secondary DNS so it is set to dynamic
         }
     }
+
+def apConfigBody(apInfoObj):  # body used to set name, wlan groups and static ip
+    # controller doesn't accept blank dns entries currently
+    return {
+        "name": apInfoObj.apSSID,
+        "description": apInfoObj.apSSID,
+        "wlanGroup24": {
+            "id": apInfoObj.wlanInfo.wlanGroupID,
+            "name": apInfoObj.wlanInfo.wlanGroupName
+        },
+        "wlanGroup50": {
+            "id": apInfoObj.wlanInfo.wlanGroupID,
+            "name": apInfoObj.wlanInfo.wlanGroupName
+        },
+        "network": {
+            "ipType": "Static",
+            "ip": apInfoObj.apIP,
+            "netmask": "255.255.255.0",
+            "gateway": "10.10.10.1",
+            "primaryDns": "10.10.10.1",
+            "secondaryDns": "10.10.10.1"
+        },
+    }
+
+def apSpecificBody(apModel, portIDs):  # body used to set model specific lldp, poe and lan port options
+    if apModel == "R610":
+        # body
+        return {
+            "lldp": {
+                "enabled": True,
+                "advertiseIntervalInSec": 30,
+                "holdTimeInSec": 120,
+                "managementIPTLVEnabled": True
+            },
+            "poeModeSetting": "_802_3at",
+            "lanPorts": [
+                    {
+                        "portName": "LAN1",
+                        "ethPortProfile": {
+                            "id": portIDs[1]
+                        },
+                        "enabled": True
+                    },
+                    {
+                        "portName": "LAN2",
+                        "ethPortProfile": {
+                            "id": portIDs[1]
+                        },
+                        "enabled": True
+                    }
+            ],
+        }
+    elif apModel == "H510":
+        # body
+        return {
+            "lldp": {
+                "enabled": True,
+                "advertiseIntervalInSec": 30,
+                "holdTimeInSec": 120,
+                "managementIPTLVEnabled": True
+            },
+            "lanPorts": [
+                    {
+                        "portName": "LAN1",
+                        "ethPortProfile": {
+                            "id": portIDs[1]
+                        },
+                        "enabled": True
+                    },
+                    {
+                        "portName": "LAN2",
+                        "ethPortProfile": {
+                            "id": portIDs[0]
+                        },
+                        "enabled": True
+                    },
+                    {
+                        "portName": "LAN3",
+                        "ethPortProfile": {
+                            "id": portIDs[0]
+                        },
+                        "enabled": True
+                    },
+                    {
+                        "portName": "LAN4",
+                        "ethPortProfile": {
+                            "id": portIDs[0]
+                        },
+                        "enabled": True
+                    },
+                    {
+                        "portName": "LAN5",
+                        "ethPortProfile": {
+                            "id": portIDs[1]
+                        },
+                        "enabled": True
+                    }
+            ],
+        }
+    else:
+        # body
+        return {
+          "poeModeSetting": None
+        }
+
+def changeAPZone(sessionID, zoneInfoObject, userInputObject, apInfoObj):
+    # ----------------CHANGE BASIC AP CONFIGURATION-------------------
+    print('Changing AP zone...')
+    # body for request is converted into json through json.dump
+    # body used to change the ap zone
+    sendAPConfig = apZoneBody(zoneInfoObject)
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             # runs until a valid response is returned from the controller
             changeAPZone = sessionID.patch('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/aps/' + apInfoObj.apMAC, headers=universalHeaders, cookies=universalCookies, data=json.dumps(sendAPConfig), verify=False)
+            if sessionPool.sessionExpired(changeAPZone, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if changeAPZone.status_code == 204:  # checks HTTP response code
                 print('AP zone changed.')
                 return changeAPZone.status_code
@@ -803,10 +1133,10 @@ def changeAPZone(sessionID, zoneInfoObject, userInputObject, apInfoObj):
                 time.sleep(1)
                 return changeAPZone.status_code
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
 
 def changeAPConfig(sessionID, zoneInfoObject, userInputObject, apInfoObj):
@@ -815,38 +1145,18 @@ def changeAPConfig(sessionID, zoneInfoObject, userInputObject, apInfoObj):
     # controller doesn't accept blank dns entries currently
     # body
     print('Changing AP configuration...')
-    sendAPConfig = {
-        "name": apInfoObj.apSSID,
-        "description": apInfoObj.apSSID,
-        "wlanGroup24": {
-            "id": apInfoObj.wlanInfo.wlanGroupID,
-            "name": apInfoObj.wlanInfo.wlanGroupName
-        },
-        "wlanGroup50": {
-            "id": apInfoObj.wlanInfo.wlanGroupID,
-            "name": apInfoObj.wlanInfo.wlanGroupName
-        },
-        "network": {
-            "ipType": "Static",
-            "ip": apInfoObj.apIP,
-            "netmask": "255.255.255.0",
-            "gateway": "10.10.10.1",
-            "primaryDns": "10.10.10.1",
-            "secondaryDns": "10.10.10.1"
-        },
-    }
+    sendAPConfig = apConfigBody(apInfoObj)
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             # runs until a valid response is returned from the controller
             changeAPConfig = sessionID.patch('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/aps/' + apInfoObj.apMAC, headers=universalHeaders, cookies=universalCookies, data=json.dumps(sendAPConfig), verify=False)
+            if sessionPool.sessionExpired(changeAPConfig, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if changeAPConfig.status_code == 204:  # checks HTTP response code
                 print('AP configuration changed.')
                 return 204
@@ -860,12 +1170,12 @@ def changeAPConfig(sessionID, zoneInfoObject, userInputObject, apInfoObj):
                 time.sleep(1)
                 return changeAPConfig.status_code
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
-            time.sleep(1)
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
 
-def checkAPConfig(sessionID, poeSpecific, zoneInfoObject, userInputObject, apInfoObj):
+def compareAPConfig(apConfig, poeSpecific, zoneInfoObject, apInfoObj):  # compares an AP config from the controller to the desired settings
     returnStatus = True
     apName = ['', True]
     zoneID = ['', True]
@@ -874,74 +1184,77 @@ def checkAPConfig(sessionID, poeSpecific, zoneInfoObject, userInputObject, apInf
     wlanGroup50ID = ['', True]
     ipType = ['', True]
     modelSpecific = ['', True]
+    # only checks certain values, if these are present then the others are aswell
+    # these values return to the programSingleAP function
+    # if a setting isn't correct, an array is created, holding the
+    #       incorrect setting and a False value to be checked in programSingleAP
+    try:
+        if poeSpecific == True:
+            if apConfig['specific'] is None:
+                modelSpecific = ['None', False]
+                returnStatus = False
+            if apInfoObj.apModel == "R610" and apConfig['specific']['poeModeSetting'] != '_802_3at':
+                modelSpecific = [apConfig['specific']['poeModeSetting'], False]
+                returnStatus = False
+                #needs to check for R510's eventually
+        else:
+            if apConfig['name'] != apInfoObj.apSSID:
+                apName = [apConfig['name'], False]
+                returnStatus = False
+            if apConfig['zoneId'] != zoneInfoObject.apZoneID:
+                zoneID = [apConfig['name'], False]
+                returnStatus = False
+            if apConfig['apGroupId'] != zoneInfoObject.apGroupID:
+                apGroupID = [apConfig['apGroupId'], False]
+                returnStatus = False
+            if apConfig['wlanGroup24'] is None:
+                wlanGroup24ID = ['No WLAN Assigned', False]
+                returnStatus = False
+            elif apConfig['wlanGroup24']['name'] != apInfoObj.apSSID and 'guest' not in apConfig['wlanGroup24']['name'].lower():
+                wlanGroup50ID = [apConfig['wlanGroup24']['name'], False]
+                returnStatus = False
+            if apConfig['wlanGroup50'] is None:
+                wlanGroup50ID = ['No WLAN Assigned', False]
+                returnStatus = False
+            elif apConfig['wlanGroup50']['name'] != apInfoObj.apSSID and 'guest' not in apConfig['wlanGroup50']['name'].lower():
+                wlanGroup50ID = [apConfig['wlanGroup50']['name'], False]
+                returnStatus = False
+            if apConfig['network']['ipType'] != 'Static':  # aps are always static
+                ipType = [apConfig['network']['ipType'], False]
+                returnStatus = False
+    except (TypeError, AttributeError):  # one of the values was a None type
+        returnStatus = False
+
+    return [returnStatus, apName, zoneID, apGroupID, wlanGroup24ID, wlanGroup50ID, ipType, modelSpecific]
+
+def checkAPConfig(sessionID, poeSpecific, zoneInfoObject, userInputObject, apInfoObj):
     # ----------------RETRIEVE AP CONFIGURATION-------------------
     #Publisher.sendMessage('status', ssid=self.panel.ssid, message='Retrieving AP configuration...')
     print('Checking AP Configuration.')
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             # gets ap configuration response
             retrieveAPConfig = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_0/aps/' + apInfoObj.apMAC, headers=universalHeaders, cookies=universalCookies, verify=False)
+            if sessionPool.sessionExpired(retrieveAPConfig, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if retrieveAPConfig.status_code == 200:
                 retrieveAPConfig = retrieveAPConfig.json()  # converts config to json
                 apInfoObj.apSN = retrieveAPConfig['serial']
-                # only checks certain values, if these are present then the others are aswell
-                # these values return to the programSingleAP function
-                # if a setting isn't correct, an array is created, holding the
-                #       incorrect setting and a False value to be checked in programSingleAP
-                try:
-                    if poeSpecific == True:
-                        if retrieveAPConfig['specific'] is None:
-                            modelSpecific = ['None', False]
-                            returnStatus = False
-                        if apInfoObj.apModel == "R610" and retrieveAPConfig['specific']['poeModeSetting'] != '_802_3at':
-                            modelSpecific = [retrieveAPConfig['specific']['poeModeSetting'], False]
-                            returnStatus = False
-                            #needs to check for R510's eventually
-                    else:
-                        if retrieveAPConfig['name'] != apInfoObj.apSSID:
-                            apName = [retrieveAPConfig['name'], False]
-                            returnStatus = False
-                        if retrieveAPConfig['zoneId'] != zoneInfoObject.apZoneID:
-                            zoneID = [retrieveAPConfig['name'], False]
-                            returnStatus = False
-                        if retrieveAPConfig['apGroupId'] != zoneInfoObject.apGroupID:
-                            apGroupID = [retrieveAPConfig['apGroupId'], False]
-                            returnStatus = False
-                        if retrieveAPConfig['wlanGroup24'] is None:
-                            wlanGroup24ID = ['No WLAN Assigned', False]
-                            returnStatus = False
-                        elif retrieveAPConfig['wlanGroup24']['name'] != apInfoObj.apSSID and 'guest' not in retrieveAPConfig['wlanGroup24']['name'].lower():
-                            wlanGroup50ID = [retrieveAPConfig['wlanGroup24']['name'], False]
-                            returnStatus = False
-                        if retrieveAPConfig['wlanGroup50'] is None:
-                            wlanGroup50ID = ['No WLAN Assigned', False]
-                            returnStatus = False
-                        elif retrieveAPConfig['wlanGroup50']['name'] != apInfoObj.apSSID and 'guest' not in retrieveAPConfig['wlanGroup50']['name'].lower():
-                            wlanGroup50ID = [retrieveAPConfig['wlanGroup50']['name'], False]
-                            returnStatus = False
-                        if retrieveAPConfig['network']['ipType'] != 'Static':  # aps are always static
-                            ipType = [retrieveAPConfig['network']['ipType'], False]
-                            returnStatus = False
-                except (TypeError, AttributeError):  # one of the values was a None type
-                    returnStatus = False
+                return compareAPConfig(retrieveAPConfig, poeSpecific, zoneInfoObject, apInfoObj)
             else:
                 print(retrieveAPConfig.status_code)
                 print(json.dumps(retrieveAPConfig.json(), indent=4))
                 return retrieveAPConfig.status_code
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Hiccup occurred at AP QC start. Retrying...')
-            time.sleep(1)
             zoneInfoObject.validSession = False
-        return [returnStatus, apName, zoneID, apGroupID, wlanGroup24ID, wlanGroup50ID, ipType, modelSpecific]
+            retry.failed(error)
 
 def retrieveZoneAPModel(apConfig, apLists, sessionID, controllerCluster, panel):
     serverResponse = checkController.checkController(controllerCluster, sessionID)
@@ -990,98 +1303,19 @@ def changeAPSpecific(sessionID, zoneInfoObject, userInputObject, parentAP):
     '''
     portIDs = retrievePortID(sessionID, zoneInfoObject, userInputObject)
 
-    if apModel == "R610":
-        # body
-        sendAPConfig = {
-            "lldp": {
-                "enabled": True,
-                "advertiseIntervalInSec": 30,
-                "holdTimeInSec": 120,
-                "managementIPTLVEnabled": True
-            },
-            "poeModeSetting": "_802_3at",
-            "lanPorts": [
-                    {
-                        "portName": "LAN1",
-                        "ethPortProfile": {
-                            "id": portIDs[1]
-                        },
-                        "enabled": True
-                    },
-                    {
-                        "portName": "LAN2",
-                        "ethPortProfile": {
-                            "id": portIDs[1]
-                        },
-                        "enabled": True
-                    }
-            ],
-        }
-    elif apModel == "H510":
-        # body
-        sendAPConfig = {
-            "lldp": {
-                "enabled": True,
-                "advertiseIntervalInSec": 30,
-                "holdTimeInSec": 120,
-                "managementIPTLVEnabled": True
-            },
-            "lanPorts": [
-                    {
-                        "portName": "LAN1",
-                        "ethPortProfile": {
-                            "id": portIDs[1]
-                        },
-                        "enabled": True
-                    },
-                    {
-                        "portName": "LAN2",
-                        "ethPortProfile": {
-                            "id": portIDs[0]
-                        },
-                        "enabled": True
-                    },
-                    {
-                        "portName": "LAN3",
-                        "ethPortProfile": {
-                            "id": portIDs[0]
-                        },
-                        "enabled": True
-                    },
-                    {
-                        "portName": "LAN4",
-                        "ethPortProfile": {
-                            "id": portIDs[0]
-                        },
-                        "enabled": True
-                    },
-                    {
-                        "portName": "LAN5",
-                        "ethPortProfile": {
-                            "id": portIDs[1]
-                        },
-                        "enabled": True
-                    }
-            ],
-        }
-    else:
-        # body
-        sendAPConfig =  {
-          "poeModeSetting": None
-        }
+    sendAPConfig = apSpecificBody(apModel, portIDs)
+    retry = controllerRetry.start()
     while True:
         try:
 
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
 
             # runs until a valid response is returned from the controller
             changeAPSpecific = sessionID.put('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/aps/' + parentAP.apMAC + '/specific', headers=universalHeaders, cookies=universalCookies, data=json.dumps(sendAPConfig), verify=False)
+            if sessionPool.sessionExpired(changeAPSpecific, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             # changeAPConfig = sessionID.put('https://' + serverResponse + ':8443/wsg/api/public/v6_1/aps/' + panel.apMAC, headers=universalHeaders, cookies=universalCookies, data=json.dumps(sendAPConfig), verify=False)
             if changeAPSpecific.status_code == 204:  # checks HTTP response code
                 print('----------Parent AP Model specific options changed.---------')
@@ -1093,9 +1327,9 @@ def changeAPSpecific(sessionID, zoneInfoObject, userInputObject, parentAP):
                 print('------Changing Parent AP Model specific options failed.-----')
                 print(json.dumps(changeAPSpecific.json(), indent=4))
                 return changeAPSpecific.status_code
-        except (socket.gaierror, requests.exceptions.ConnectionError):
-            time.sleep(1)
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             zoneInfoObject.validSession = False
+            retry.failed(error)
 
 def changeAPConfigDouble(sessionID, zoneInfoObject, apWLANInfoObj, userInputObject, doubleAPPanel):
     # ----------------CHANGE BASIC AP CONFIGURATION-------------------
@@ -1339,27 +1573,54 @@ def deleteWLANGroup (apSSID, wlanGroupID, apLists, sessionID, controllerCluster)
         print('Error connecting to controller. Check your internet connection.')
         time.sleep(1)
 
-def retrieveZoneAPsList(zoneID, sessionID, controllerCluster):
-    # ----------------RETRIEVE AP CONFIGURATION-------------------
-    # parameters for the request to get ap list
-    apListParameters = (
-    ('listSize', '9999'),
-    ('zoneId', zoneID),
-    )
+def retrieveZoneAPsList(sessionID, zoneInfoObject, userInputObject):
+    # ----------------RETRIEVE ZONE AP LIST-------------------
+    # returns every AP in the zone keyed by MAC, the controller pages the list
+    apListParameters = {
+        'zoneId': zoneInfoObject.apZoneID,
+        'index': 0,
+        'listSize': ZONEAPPAGESIZE,
+    }
+    zoneAPs = {}
+    print('Retrieving zone AP list...')
+    retry = controllerRetry.start()
+    while True:
+        try:
 
-    try:
-        # runs until a valid response is returned from the controller
-        # gets ap configuration response
-        retrieveZoneAPsList = sessionID.get('https://' + serverResponse + ':8443/wsg/api/public/v6_1/aps', headers=universalHeaders, cookies=universalCookies, params=apListParameters, verify=False)
-        if retrieveZoneAPsList.status_code == 200:  # checks HTTP response code
-            print('AP List retrieved.')
-            return retrieveZoneAPsList.json()
-        else:
-            print(retrieveZoneAPsList)
-            return retrieveZoneAPsList
-    except (socket.gaierror, requests.exceptions.ConnectionError):
-        #Publisher.sendMessage('status', ssid=self.panel.ssid, message='Error connecting to controller. Check your internet connection.')
-        time.sleep(1)
+            if zoneInfoObject.validSession is False:
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
+
+            retrieveZoneAPsList = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/aps', headers=universalHeaders, cookies=universalCookies, params=apListParameters, verify=False)
+            if sessionPool.sessionExpired(retrieveZoneAPsList, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
+            if retrieveZoneAPsList.status_code == 200:  # checks HTTP response code
+                retrieveZoneAPsList = retrieveZoneAPsList.json()
+                for ap in retrieveZoneAPsList['list']:
+                    zoneAPs[ap['mac'].upper()] = ap
+                if retrieveZoneAPsList.get('hasMore') is True and len(retrieveZoneAPsList['list']) > 0:  # gets the next page
+                    apListParameters['index'] += len(retrieveZoneAPsList['list'])
+                    continue
+                print('Zone AP list retrieved. ' + str(len(zoneAPs)) + ' APs in zone.')
+                return zoneAPs
+            else:
+                print('Zone AP list retrieval failed.')
+                print(retrieveZoneAPsList.status_code)
+                print(json.dumps(retrieveZoneAPsList.json(), indent=4))
+                return retrieveZoneAPsList.status_code
+
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
+            print('Error connecting to controller. Check your internet connection.')
+            zoneInfoObject.validSession = False
+            retry.failed(error)
+
+def zoneAPDelta(zoneAP, zoneInfoObject):  # returns the requests an AP needs based on its zone AP list entry
+    # the zone AP list only holds name, zone and AP group, so an empty delta only means the AP
+    # is in the right zone and AP group. the rest of its config is checked with checkAPConfig
+    if zoneAP is None or zoneAP.get('zoneId') != zoneInfoObject.apZoneID:
+        return ['zone', 'config']
+    if zoneAP.get('apGroupId') != zoneInfoObject.apGroupID:
+        return ['zone', 'config']  # zone body sets the AP group
+    return []
 
 def changeAPWLANs(apLists, apMAC, apSSID, wlanGroupID, sessionID, controllerCluster):
     # ----------------CHANGE BASIC AP CONFIGURATION-------------------
@@ -1465,46 +1726,40 @@ def changeAPWLAN50(apLists, apMAC, wlanGroupName, wlanGroupID, sessionID, contro
         time.sleep(1)
 
 def retrievePortID (sessionID, zoneInfoObject, userInputObject):
-    portID = None
-    accessPortID = None
-    trunkPortID = None
     '''
     portType Return:
     0 - Access Port
     1 - Trunk Port
     '''
     # ----------------RETRIEVE PORT ID LIST-------------------
+    portIDs = zoneInfoObject.getCache('portIDs')
+    if portIDs is not None:  # port profiles are the same for every AP in the zone
+        return portIDs
     print('Retrieving Ethernet Port Profile list...')
+    retry = controllerRetry.start()
     while True:
         try:
             if zoneInfoObject.validSession is False:
-                newSessionID = requests.session()
-
-                loginAttempt = loginRuckus(newSessionID, zoneInfoObject, userInputObject)
-                if loginAttempt == 200:
-                    sessionID = newSessionID
+                loginAttempt, sessionID = sessionPool.getSession(zoneInfoObject, userInputObject)
 
             # this while loop runs until a valid response is returned from the controller
             retrievePortID = sessionID.get('https://' + zoneInfoObject.sessionIP + ':8443/wsg/api/public/v6_1/rkszones/' + zoneInfoObject.apZoneID + '/profile/ethernetPort', headers=universalHeaders, cookies=universalCookies, verify=False)
+            if sessionPool.sessionExpired(retrievePortID, sessionID, zoneInfoObject, userInputObject):  # JSESSIONID expired, retries on a new login
+                continue
             if retrievePortID.status_code == 200:  # checks HTTP response code
                 retrievePortID = retrievePortID.json()
                 print('Ethernet Port Profile list retrieved.')
-                ap = 0  # this will run through the list of port IDs for the zone
-                while ap < retrievePortID['totalCount']:
-                    if retrievePortID['list'][ap]['name'] == 'Default Access Port':
-                        accessPortID = retrievePortID['list'][ap]['id']
-                    if retrievePortID['list'][ap]['name'] == 'Default Trunk Port':
-                        trunkPortID = retrievePortID['list'][ap]['id']
-                    ap += 1
-                return [accessPortID, trunkPortID]
+                portIDs = selectPortIDs(retrievePortID)
+                zoneInfoObject.setCache('portIDs', portIDs)
+                return portIDs
             else:
                 print("Ethernet Port Profile list retrieval failed.")
                 print(json.dumps(retrievePortID.json(), indent=4))
                 return retrievePortID.status_code
 
-        except (socket.gaierror, requests.exceptions.ConnectionError):
+        except (socket.gaierror, requests.exceptions.ConnectionError) as error:
             print('Error connecting to controller. Check your internet connection.')
-            time.sleep(1)
+            retry.failed(error)
             zoneInfoObject.validSession
 
 # *********************************REFURB AP STUFF*****************************
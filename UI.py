@@ -5,8 +5,14 @@ import googlesheets
 import panelquery
 import programpanel
 import sshftpconnection
+import routeroscommands
+import readiness
 import wattbox
 import optionsMenu
+import sitecache
+import siteartifacts
+import writequeue
+import sheetsclient
 
 # David's Libraries
 import RuckusLibrary
@@ -21,10 +27,8 @@ import sys
 from oauth2client.service_account import ServiceAccountCredentials
 import datetime
 from datetime import date
-from pathlib import Path
 import pexpect
 from pexpect import popen_spawn
-import _pickle as cPickle
 from cryptography.fernet import Fernet
 import json
 import select
@@ -39,8 +43,6 @@ import gspread
 import httplib2
 import requests
 import paramiko
-import splinter
-import selenium
 import ftplib
 import pubsub
 import librouteros
@@ -123,7 +125,7 @@ class uploadException(Thread):
                 scope = ('https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive')
                 
                 authorization = ServiceAccountCredentials.from_json_keyfile_dict(googlesheets.credentials, scope)
-                gc = gspread.authorize(authorization)
+                gc = sheetsclient.authorize(authorization)
                 wks = gc.open('Kai-ACK Errors').worksheet('Errors')
 
                 # find row placement of new error
@@ -406,7 +408,7 @@ class resetPanelsThread(Thread):
                                                     wks = None
                                                     while True:
                                                         try:
-                                                            gc = gspread.authorize(authorization)
+                                                            gc = sheetsclient.authorize(authorization)
                                                             wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                                             break
                                                         except gspread.exceptions.SpreadsheetNotFound:
@@ -500,7 +502,7 @@ class resetPanelsThread(Thread):
                                         wks = None
                                         while True:
                                             try:
-                                                gc = gspread.authorize(authorization)
+                                                gc = sheetsclient.authorize(authorization)
                                                 wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                                 break
                                             except gspread.exceptions.SpreadsheetNotFound:
@@ -588,7 +590,7 @@ class resetPanelsThread(Thread):
                                 wks = None
                                 while True:
                                     try:
-                                        gc = gspread.authorize(authorization)
+                                        gc = sheetsclient.authorize(authorization)
                                         wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                         break
                                     except gspread.exceptions.SpreadsheetNotFound:
@@ -678,28 +680,12 @@ class resetPanelsThread(Thread):
                 ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'file remove numbers=' + filesRemoved, ip, password)
                 
                 # Uploads the required files
-                fileList = os.listdir(kaiack.UI.siteDir)
-                routerosFileName = None
-                for item in fileList:
-                    if 'routeros' in item.lower() and '.npk' in item.lower():
-                        routerosFileName = item
-                        break
-                sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\' + routerosFileName, 'Downgrade Config') #downgrade package
-                sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\MTAutoscript.rsc', 'Downgrade Config', path = '/flash/') #MTAutoscript file
+                artifacts = siteartifacts.getSiteArtifacts(kaiack.UI.siteDir)
+                manifest = artifacts.manifest([artifacts.routerosFileName()], '/') #downgrade package
+                manifest += artifacts.manifest(['MTAutoscript.rsc'], '/flash/') #MTAutoscript file
                 # Uploads new or old certs depending on the site files chosen
-                if kaiack.UI.newCerts is True:
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\gd_bundle-g2-g1.crt', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\certificate-request_key.pem', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\be258587ac15fd8a.crt', 'Downgrade Config', path = '/flash/') #certificate file
-                elif kaiack.UI.newCerts is None:
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\server.cer', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\server.key', 'Downgrade Config', path = '/flash/') #certificate file
-                else:
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\AddTrustExternalCARoot.crt', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\certificate-request_key.pem', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\COMODORSAAddTrustCA.crt', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\COMODORSADomainValidationSecureServerCA.crt', 'Downgrade Config', path = '/flash/') #certificate file
-                    sshftpconnection.ftpSendFile(ip, password, kaiack.UI.siteDir + '\\hotspot_addmydevice_com.crt', 'Downgrade Config', path = '/flash/') #certificate file
+                manifest += artifacts.manifest(programpanel.certificateFiles(kaiack.UI.newCerts), '/flash/') #certificate files
+                sshftpconnection.ftpSendFiles(ip, password, manifest, 'Downgrade Config')
                 Publisher.sendMessage('status', ssid = 'Downgrade Config', message='Files Uploaded')
 
                 
@@ -754,14 +740,39 @@ class programDoubleAPsThread(Thread):
             dlg.ShowModal()
             dlg.Destroy()
         else:
-            apMACList = googlesheets.getNewList(self.sheetData.wks.col_values(self.sheetData.apMACIndex), self.sheetData.panelStartIndex, self.sheetData.panelEndIndex)
+            apMACList = googlesheets.getNewList(self.sheetData.getColumn(self.sheetData.apMACIndex), self.sheetData.panelStartIndex, self.sheetData.panelEndIndex)
             doubleAPList = kaiack.UI.controller.programDoubleAP(self.sheetData.ssidList, apMACList, doubleAPList)
             if doubleAPList != 403 and doubleAPList is not False:
-                self.sheetData.writeDoubleAP(doubleAPList)
+                kaiack.UI.writeQueue.writeAPs(doubleAPList)
             Publisher.sendMessage('status', ssid='Double APs', message='\nDone')
         
         kaiack.UI.programDoubleAPsButton.Enable()
 
+# Thread to program every AP on the programmer list from one zone AP list
+class programZoneAPsThread(Thread):
+    def __init__(self, sheetData):
+        Thread.__init__(self)
+        self.sheetData = sheetData
+
+        self.daemon = True
+        self.start()
+
+    @use_my_excepthook
+    def run(self):
+        self.programZoneAPs()
+
+    def programZoneAPs(self):
+        zoneAPList = self.sheetData.programZoneAPList(kaiack.UI.programmerNameTextBox.GetValue())
+        if len(zoneAPList) == 0: # Displays message if no aps are found
+            Publisher.sendMessage('status', ssid='Zone APs', message='No APs without serials found for programmer')
+        else:
+            zoneAPList = kaiack.UI.controller.programZoneAPs(zoneAPList)
+            if zoneAPList is not False and len(zoneAPList) > 0:
+                kaiack.UI.writeQueue.writeAPs(zoneAPList) # Writes AP MAC and SN by SSID
+            Publisher.sendMessage('status', ssid='Zone APs', message='\nDone')
+
+        kaiack.UI.menuZoneAPs.Enable(True)
+
 class spreadsheetThread(Thread): # Thread for gathering spreadsheet data
     def __init__(self):
         Thread.__init__(self)
@@ -776,7 +787,7 @@ class spreadsheetThread(Thread): # Thread for gathering spreadsheet data
         message = ''
         try:
             kaiack.UI.loadSpreadsheetDataButton.Disable()
-            sheetData = googlesheets.spreadsheetData(kaiack.UI.siteNameTextBox.GetValue(), kaiack.UI.siteDir)
+            sheetData = googlesheets.spreadsheetData(kaiack.UI.siteNameTextBox.GetValue(), kaiack.UI.siteDir, kaiack.UI.siteCache)
             if sheetData.apZone is not None and kaiack.UI.apZoneTextBox.GetValue().strip() == '':
                 kaiack.UI.apZoneTextBox.SetValue(sheetData.apZone)
                 
@@ -894,11 +905,35 @@ class panelQueryThread(Thread): # Gets panels ips and macs from arp table
     def panelQuery(self):
         kaiack.UI.panelQueryThreadOpen = True
         while kaiack.UI.programPanel == True:
-            Publisher.sendMessage('panelquery', panelList = panelquery.getPanelList())
-            time.sleep(3)
+            panelList = panelquery.getPanelList()
+            ipList = [ip for ip, mac in panelList]
+            for ip, mac in kaiack.UI.sweepList: # Panels that answered the last sweep but have dropped out of the arp table
+                if ip not in ipList:
+                    panelList.append([ip, mac])
+            Publisher.sendMessage('panelquery', panelList = panelList)
+            time.sleep(panelquery.POLLINTERVAL) # Sub-second where the neighbour table can be read directly
 
         kaiack.UI.panelQueryThreadOpen = False
 
+class panelSweepThread(Thread): # Probes the panel subnets so new panels are in the arp table right away
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.start()
+
+    @use_my_excepthook
+    def run(self):
+        self.panelSweep()
+
+    def panelSweep(self): # Runs apart from the query loop so a sweep doesn't hold up the arp table reads
+        kaiack.UI.panelSweepThreadOpen = True
+        while kaiack.UI.programPanel == True:
+            kaiack.UI.sweepList = [[ip, mac] for ip, mac, openPorts in panelquery.sweepPanels()]
+            time.sleep(panelquery.SWEEPINTERVAL)
+
+        kaiack.UI.sweepList = []
+        kaiack.UI.panelSweepThreadOpen = False
+
 class panelProgramMainThread(Thread): # Loop that starts programming process
     def __init__(self, currentPanelList):
         Thread.__init__(self)
@@ -957,7 +992,7 @@ class wattboxProgramThread(Thread):
                 Publisher.sendMessage('status', ssid = self.panel.ssid, message = 'Wattbox SN Stored', group = 2)
                 Publisher.sendMessage('status', ssid = self.panel.ssid, message = 'Wattbox configured', group = 2)
                 break
-            except splinter.exceptions.ElementDoesNotExist: # Catches error if the wattbox is not at default configuration
+            except wattbox.wattboxLoginError: # Catches error if the wattbox is not at default configuration
                 if passwordTested is False: # Site Password
                     Publisher.sendMessage('status', ssid = self.panel.ssid, message = 'Wattbox credentials are not default, testing site credentials', group = 2)
                     passwordTested = True
@@ -975,7 +1010,7 @@ class wattboxProgramThread(Thread):
                     wks = None
                     while True:
                         try:
-                            gc = gspread.authorize(authorization)
+                            gc = sheetsclient.authorize(authorization)
                             wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                             break
                         except gspread.exceptions.SpreadsheetNotFound:
@@ -1031,11 +1066,7 @@ class wattboxProgramThread(Thread):
                     passwordTested = ''
                     break
                 
-            except selenium.common.exceptions.WebDriverException as error: # Missing chromedriver.exe
-                dlg = wx.MessageDialog(None, 'Missing chromedriver.exe in Kai-ACK folder or chromedriver.exe is out of date', 'Error', wx.OK)
-                dlg.ShowModal()
-                dlg.Destroy()
-            except requests.exceptions.ConnectionError: # Connection Error
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout): # Connection Error
                 dlg = wx.MessageDialog(None, 'Error connecting to wattbox, please check cables or retry', 'Error', wx.OK)
                 dlg.ShowModal()
                 dlg.Destroy()
@@ -1056,9 +1087,9 @@ class wattboxProgramThread(Thread):
                 Publisher.sendMessage('status', ssid = self.panel.ssid, message = '\tIncorrect domain name, please correct manually', group = 3)
             if wattboxQC[2] is False:
                 Publisher.sendMessage('status', ssid = self.panel.ssid, message = '\tIncorrect email address, please correct manually', group = 3)
-        except splinter.exceptions.ElementDoesNotExist:
+        except wattbox.wattboxLoginError:
             Publisher.sendMessage('status', ssid = self.panel.ssid, message = '\tLogin attempt failed, please correct manually', group = 3)
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             Publisher.sendMessage('status', ssid = self.panel.ssid, message = '\tError occurred, please correct manually', group = 3)
             
         self._return = self.panel
@@ -1266,6 +1297,7 @@ class panelProgramThread(Thread): # Programming proccess thread
                     passwordTested = False
                     panelPasswordTested = False
                     APITried = False
+                    authPoll = readiness.poller()
                     while True:
                         message = ''
                         try:
@@ -1316,7 +1348,7 @@ class panelProgramThread(Thread): # Programming proccess thread
                                                     wks = None
                                                     while True: # Opens Master Password List Sheet
                                                         try:
-                                                            gc = gspread.authorize(authorization)
+                                                            gc = sheetsclient.authorize(authorization)
                                                             wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                                             break
                                                         except gspread.exceptions.SpreadsheetNotFound:
@@ -1410,7 +1442,7 @@ class panelProgramThread(Thread): # Programming proccess thread
                                         wks = None
                                         while True: # Loads Master Password List
                                             try:
-                                                gc = gspread.authorize(authorization)
+                                                gc = sheetsclient.authorize(authorization)
                                                 wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                                 break
                                             except gspread.exceptions.SpreadsheetNotFound:
@@ -1492,7 +1524,7 @@ class panelProgramThread(Thread): # Programming proccess thread
                                 wks = None
                                 while True: # Opens Master Password Sheet
                                     try:
-                                        gc = gspread.authorize(authorization)
+                                        gc = sheetsclient.authorize(authorization)
                                         wks = gc.open('Site Password Master List').worksheet('Programming Passwords')
                                         break
                                     except gspread.exceptions.SpreadsheetNotFound:
@@ -1550,12 +1582,15 @@ class panelProgramThread(Thread): # Programming proccess thread
                             dlg.ShowModal()
                             dlg.Destroy()
                         
-                        time.sleep(3)
+                        readiness.waitForPort(self.panel.ip, 22) # SSH may have just been enabled
+                        authPoll.wait()
 
                     # Checks packages to determine when to continue
                     printOnce = True
+                    packagePoll = readiness.poller()
                     while True: # Looped until all three packages are disabled, indicating that the MTAutoscript has finished running
-                        time.sleep(3)
+                        packagePoll.wait()
+                        readiness.waitForPort(self.panel.ip, 22, None) # Panel restarts while the MTAutoscript is running
                         try:
                             # Reconnect to SSH server each time because of potential restarts while the MTAutoscript is running
                             ssh = paramiko.SSHClient()
@@ -1643,14 +1678,13 @@ class panelProgramThread(Thread): # Programming proccess thread
                     Publisher.sendMessage('status', ssid = self.panel.ssid, message = 'MTAutoscript done runnning')
                     
                     # Checks cable connection to Wattbox and AP
-                    ssh = sshftpconnection.connectSSH(self.panel.ip, self.panel.initPassword)
                     while True: # Loop to wait unitl all needed devices are connected
                         connected = True
                         index = None
                         numConnections = []
                         message = 'One or more devices are not connected to the Mikrotik\nCheck all cable connections for:\n'
                         # Cable-test ether2 if wattbox option is enabled
-                        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'interface ethernet cable-test ether2 once', self.panel.ip, self.panel.initPassword)
+                        stdout = programpanel.getConnection(self.panel).sendCommand('interface ethernet cable-test ether2 once', self.panel.ip, self.panel.initPassword)
                         for line in stdout:
                             line = line.strip()
                             if 'no-link' in line and self.panel.optionsList['Wattbox'] is True:
@@ -1659,7 +1693,7 @@ class panelProgramThread(Thread): # Programming proccess thread
                                 break
 
                         # Cable-test ether5 if AP option is enabled
-                        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'interface ethernet cable-test ether5 once', self.panel.ip, self.panel.initPassword)
+                        stdout = programpanel.getConnection(self.panel).sendCommand('interface ethernet cable-test ether5 once', self.panel.ip, self.panel.initPassword)
                         for line in stdout:
                             line = line.strip()
                             if 'no-link' in line and self.panel.optionsList['AP'] is True:
@@ -1675,8 +1709,6 @@ class panelProgramThread(Thread): # Programming proccess thread
                             dlg.Destroy()
                             
                         time.sleep(2)
-
-                    ssh.close()
                     
                     # Start Programming process
                     self.panel = programpanel.progPanel1(self.panel)
@@ -1687,40 +1719,22 @@ class panelProgramThread(Thread): # Programming proccess thread
                         if self.panel.progStatus == 2 and returned is False: # Return panel after stage 2 is reached
                             Publisher.sendMessage(self.panel.ssid + 'return', panel = self.panel)
                             returned = True
-                        time.sleep(3)
+                        progStatus = self.panel.progStatus
+                        readiness.waitForStatus(lambda: self.panel.progStatus != progStatus) # Woken by catchProgStatus
 
-                    time.sleep(.5) # Wait time for ip to update, just in case
+                    readiness.waitFor(lambda: readiness.portOpen(self.panel.ip, 22)) # The ip may be updated while the panel comes back up
                     Publisher.sendMessage(self.panel.ssid + 'return', panel = self.panel)
 
                     # Factory Reset AP
                     if self.panel.optionsList['ResetAP'] is True and self.panel.optionsList['AP'] is True: # Checks that Refurb and AP option are checked
                         Publisher.sendMessage('status', ssid = self.panel.ssid, message = 'Factory Resetting AP...', group = 1)
-                        
-                        ssh = sshftpconnection.connectSSH(self.panel.ip, self.panel.initPassword)
 
-                        index1 = None
-                        index2 = None
                         ip = None
                         # Get the AP IP from the Mikrotik ARP table
-                        while True:
-                            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip arp print where interface=ether5-trunk-AP', self.panel.ip, self.panel.initPassword)
-                            for line in stdout:
-                                line = line.strip()
-                                if index1 is not None and index2 is not None:
-                                    if line[index2:index2+17].strip() != '':
-                                        ip = line[index1:index1+12].strip()
-                                        break
-                                        
-                                try:
-                                    index1 = line.index('ADDRESS')
-                                    index2 = line.index('MAC-ADDRESS')
-                                except ValueError:
-                                    pass
-                                
-                            if ip is not None:
-                                break
-
-                        ssh.close()
+                        while ip is None:
+                            arpEntries = routeroscommands.getARP(programpanel.getTransport(self.panel, self.panel.initPassword), 'ether5-trunk-AP', self.panel.ip, self.panel.initPassword)
+                            if len(arpEntries) > 0:
+                                ip = arpEntries[0]['address']
 
                         # Thread opened for factory resetting the AP
                         factoryResetAP = apProgramThread(panel = self.panel, ip = ip)
@@ -1733,34 +1747,15 @@ class panelProgramThread(Thread): # Programming proccess thread
                     Publisher.sendMessage(self.panel.ssid + 'return', panel = self.panel)
                     
                     # Configure Wattbox
-                    # Selenium/Splinter Web Browser Automation library is used to load the config
+                    # The saved settings are posted to the WattBox web forms over HTTP (wattbox.restoreSettings)
                     if self.panel.optionsList['Wattbox'] is True:
                         # Get wattbox IP
-                        ssh = sshftpconnection.connectSSH(self.panel.ip, self.panel.initPassword)
-
-                        index1 = None
-                        index2 = None
                         ip = None
                         # Get the wattbox IP from the Mikrotik ARP table
-                        while True:
-                            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip arp print where interface=ether2-wattBox', self.panel.ip, self.panel.sitePassword)
-                            for line in stdout:
-                                line = line.strip()
-                                if index1 is not None and index2 is not None:
-                                    if line[index2:index2+17].strip() != '':
-                                        ip = line[index1:index1+14].strip()
-                                        break
-                                        
-                                try:
-                                    index1 = line.index('ADDRESS')
-                                    index2 = line.index('MAC-ADDRESS')
-                                except ValueError:
-                                    pass
-                                
-                            if ip is not None:
-                                break
-
-                        ssh.close()
+                        while ip is None:
+                            arpEntries = routeroscommands.getARP(programpanel.getTransport(self.panel, self.panel.sitePassword), 'ether2-wattBox', self.panel.ip, self.panel.sitePassword)
+                            if len(arpEntries) > 0:
+                                ip = arpEntries[0]['address']
 
                         # Thread to program wattbox
                         programWattbox = wattboxProgramThread(self.panel, ip)
@@ -1797,12 +1792,11 @@ class panelProgramThread(Thread): # Programming proccess thread
                     # QC Mikrotik
                     programpanel.qcPanel(self.panel)
 
-                    # Disables ssh on the mikrotik
-                    ssh = sshftpconnection.connectSSH(self.panel.ip, self.panel.sitePassword)
-                    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip service disable ssh', self.panel.ip, self.panel.sitePassword)
-                    time.sleep(1)
+                    # Disables ssh on the mikrotik, the panel's connection is closed after since ssh is no longer available
+                    stdout = programpanel.getConnection(self.panel).sendCommand('ip service disable ssh', self.panel.ip, self.panel.sitePassword)
+                    readiness.waitForPortClosed(self.panel.ip, 22, 5)
 
-                    ssh.close()
+                    programpanel.closeConnections(self.panel)
 
                     mikrotikAPI.disableSSH(self.panel.ip, self.panel.sitePassword)
 
@@ -1857,6 +1851,8 @@ class panelProgramThread(Thread): # Programming proccess thread
                     # upload error info
                     catchExceptions(errInfo[0], errInfo[1], errInfo[2])
 
+                    programpanel.closeConnections(self.panel) # Retries start with new connections
+
                     dlg = wx.MessageDialog(None, 'An error has occured, would you like to retry?', 'Error', wx.ICON_ERROR | wx.YES_NO)
                     dlgReturn = dlg.ShowModal()
                     dlg.Destroy()
@@ -1989,6 +1985,9 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         # Setting up variables
         self.downgradeConfigPanel = False # Bool for generally downgrading and configing panels
         self.sheetData = None # Spreadsheet data
+        self.siteCache = None # sitecache.siteCache, opened when site data is first loaded
+        self.writeQueue = None # writequeue.writeQueue for the loaded site, flushes panel results in the background
+        self.controller = None # RuckusLibrary.programKaiACK object, set once site data loads
         self.panelList = [] # List of ssids for a Programmer name
         self.programPanel = False # Var for Program Panel button toggle
         self.currentPanelList = [] # List of panels being programmed
@@ -1999,6 +1998,8 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         self.downgradeThreadOpen = False # Prevent multiple downgrade threads from opening
         self.mainPanelThreadOpen = False # Prevent multiple main panel threads from opening
         self.panelQueryThreadOpen = False # Prevent multiple query threads from opening
+        self.panelSweepThreadOpen = False # Prevent multiple sweep threads from opening
+        self.sweepList = [] # [ip, mac] of panels found by the last sweep
         self.getPanelsThreadOpen = False # Prevent multiple get panel threads from opening
         self.optionsList = None # Options list from options window
         self.encompDir = None # Encompassing directory for site file folders
@@ -2032,6 +2033,8 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         ID_ENTERPRISE_OPTION = wx.Window.NewControlId()
         ID_SITEFILE_OPTION = wx.Window.NewControlId()
         ID_IMPORT_SSID_OPTION = wx.Window.NewControlId()
+        ID_REFRESH_SITE_OPTION = wx.Window.NewControlId()
+        ID_ZONE_APS_OPTION = wx.Window.NewControlId()
 
         # Options List
         self.menuFactory = optionMenu.AppendCheckItem(ID_FACTORY_OPTION, 'Factory New', ' Panels are factory new')
@@ -2039,11 +2042,13 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         self.menuEnterprise = optionMenu.AppendCheckItem(ID_ENTERPRISE_OPTION, 'Enterprise Site', ' Panels are for an enterprise site')
         optionMenu.AppendSeparator()
         menuAdvanced = optionMenu.Append(ID_ADVANCED_OPTION, 'Advanced Options', ' Opens advanced options for further customization')
+        self.menuZoneAPs = optionMenu.Append(ID_ZONE_APS_OPTION, 'Program Zone APs', ' Programs the APs on the programmer list from one controller AP list')
         
         filemenu= wx.Menu()
         menuAbout= filemenu.Append(wx.ID_ABOUT, "About", " Information about this program")
         menuFile = filemenu.Append(ID_SITEFILE_OPTION, 'Site Files', ' Choose the site file folder for programming')
         menuSSID = filemenu.Append(ID_IMPORT_SSID_OPTION, 'Import SSIDs', ' Import SSIDs seperated by new lines from a text file')
+        menuRefreshSite = filemenu.Append(ID_REFRESH_SITE_OPTION, 'Refresh Site Data', ' Clears the cached site data so the next load reads the whole spreadsheet')
         menuExit = filemenu.Append(wx.ID_EXIT, "Exit", " Terminate the program")
 
         self.getPanelsMenu = wx.Menu()
@@ -2152,11 +2157,13 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         self.Bind(wx.EVT_MENU, self.OnExit, menuExit)
         self.Bind(wx.EVT_MENU, self.OnAbout, menuAbout)
         self.Bind(wx.EVT_MENU, self.advancedOptions, menuAdvanced)
+        self.Bind(wx.EVT_MENU, self.programZoneAPs, self.menuZoneAPs)
         self.Bind(wx.EVT_MENU, self.factoryOption, self.menuFactory)
         self.Bind(wx.EVT_MENU, self.refurbOption, self.menuRefurb)
         self.Bind(wx.EVT_MENU, self.enterpriseOption, self.menuEnterprise)
         self.Bind(wx.EVT_MENU, self.chooseSiteFiles, menuFile)
         self.Bind(wx.EVT_MENU, self.importSSIDText, menuSSID)
+        self.Bind(wx.EVT_MENU, self.refreshSiteData, menuRefreshSite)
         self.Bind(wx.EVT_MENU_OPEN, self.getPanels)
                   
         
@@ -2223,12 +2230,6 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         except FileNotFoundError:
             message = message + 'Missing dynuscript.rsc\n'
 
-        try:
-            with open('chromedriver.exe', 'r') as file:
-                pass
-        except FileNotFoundError:
-            message = message + 'Missing chromedriver.exe\n'
-
         try:
             with open('enableSSH.auto.rsc', 'r') as file:
                 pass
@@ -2240,6 +2241,19 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
             dlg.ShowModal()
             dlg.Destroy()
 
+    # Clears the site from the cache, loading site data afterwards reads the NAF and Programming sheet again
+    def refreshSiteData(self, event):
+        siteName = self.siteNameTextBox.GetValue().strip()
+        if siteName == '':
+            dlg = wx.MessageDialog(self, 'No site name entered', 'Error', wx.OK)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+        if self.siteCache is None:
+            self.siteCache = sitecache.siteCache()
+        self.siteCache.invalidateSite(siteName)
+        self.statusbar.SetStatusText('Cached data cleared for ' + siteName + ', load site data to read it again', 0)
+
     # Pulls open file menu to get txt file with ssids in it
     def importSSIDText(self, event):
         # Prompt for ssid file list
@@ -2452,6 +2466,37 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
             dlg.ShowModal()
             dlg.Destroy()
 
+    # Programs the programmer's APs from one zone AP list
+    def programZoneAPs(self, event):
+        x = 0
+        while x < len(self.statusText):
+            if self.statusText[x][0] == 'Zone APs':
+                del self.statusText[x]
+                try:
+                    del self.panelGroups[x]
+                except IndexError:
+                    pass
+                break
+            x += 1
+
+        text = self.panelStatusLabel.GetLabel() # Gets identifier from status label
+        text = text[0:len(text)-7]
+        if text == 'Zone APs':
+            self.panelStatusLabel.SetLabel('No Panels Found')
+            self.panelStatusText.SetValue('')
+            self.panelStatusGauge.SetValue(0)
+
+        if self.sheetData is not None and self.controller is not None:
+            self.menuZoneAPs.Enable(False)
+            self.statusText.append(['Zone APs'])
+            self.nextButton('event')
+            programZoneAPsThread(self.sheetData)
+        else:
+            message = 'Site data must be loaded before APs are programmed'
+            dlg = wx.MessageDialog(self, message, 'Error', wx.OK)
+            dlg.ShowModal()
+            dlg.Destroy()
+
     # Updates status label from progamming panels
     def updateStatus(self, ssid, message, group = 0):
         # panelGroups was added to organize messages that are to be displayed on the the same 'sheet' and are being sent from threads that are running simultaniously
@@ -2589,40 +2634,17 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
             message = message + 'A Cluster must be selected from the options menu for use with no NAF or when overriding the NAF controller\n'
                 
         if message == '':
-            siteData = None
-            filename = Path('SiteData/')
-            filename.mkdir(parents=True, exist_ok=True)
-            fileList = os.listdir(os.getcwd() + '\\SiteData\\')
-            x = 0
-            while x < len(fileList):
-                y = len(fileList[x]) - 1
-                while y >= 0:
-                    if fileList[x][y] == '.':
-                        fileList[x] = fileList[x][:y]
-                    y -= 1
-                x += 1
-                    
-            for item in fileList:
-                if self.siteNameTextBox.GetValue().strip() == item and self.optionsList['No NAF'] is False:
-                    dlg = wx.MessageDialog(self, 'This data has been loaded previously\nWould you like to load the cached information instead of refreshing it?\nThis reduces load on the Google Sheets API', 'Load Cached Data?', wx.YES_NO)
-                    dlgReturn = dlg.ShowModal()
-                    dlg.Destroy()
-                    if dlgReturn == wx.ID_YES:
-                        with open('SiteData/' + item + '.pkl', 'rb') as file:
-                            siteData = cPickle.load(file)
-                    break
-                
-            if siteData is None and self.optionsList['No NAF'] is False:
+            # Cached sites are only read from Google Sheets again if the spreadsheet has been modified
+            if self.siteCache is None:
+                self.siteCache = sitecache.siteCache()
+
+            if self.optionsList['No NAF'] is False:
                 Publisher.subscribe(self.catchSpreadsheetData, "spreadsheet")
                 spreadsheetThread()
                 dots()
-            elif siteData is None and self.optionsList['No NAF'] is True:
-                Publisher.subscribe(self.catchSpreadsheetData, "spreadsheet")
-                testController(siteData)
-                dots()
             else:
                 Publisher.subscribe(self.catchSpreadsheetData, "spreadsheet")
-                testController(siteData)
+                testController(None)
                 dots()
                 
         else:
@@ -2636,12 +2658,9 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
             message = 'Site Data Loaded'
             dlg = wx.MessageDialog(self, message, 'Success', wx.OK)
             if self.optionsList['No NAF'] is False:
-                self.sheetData = sheetData
-                filename = Path('SiteData/')
-                filename.mkdir(parents=True, exist_ok=True)
-                del filename
-                with open('SiteData/' + self.siteNameTextBox.GetValue().strip() + '.pkl', 'wb') as file:
-                    cPickle.dump(sheetData, file, -1)
+                self.sheetData = sheetData # Saved to the site cache by spreadsheetData
+                if self.writeQueue is None:
+                    self.writeQueue = writequeue.writeQueue(sheetData)
             else:
                 self.sheetData = 'No NAF'
                     
@@ -2739,6 +2758,8 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
 
                 if self.panelQueryThreadOpen is False:
                     panelQueryThread()
+                if self.panelSweepThreadOpen is False:
+                    panelSweepThread()
                 self.programPanelsButton.SetBackgroundColour(wx.Colour(0, 255, 0))
                 if self.mainPanelThreadOpen is False:
                     programMainThread = panelProgramMainThread(self.currentPanelList)
@@ -2957,11 +2978,13 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
         while x < len(programThreads):
             if ssid == programThreads[x][0]:
                 programThreads[x][1].panel.progStatus = progStatus
+                readiness.notifyStatus() # Wakes the panel thread waiting on its status
                 break
+            x += 1
 
     #Simple function to write to google sheets after programming
     def writeToSheet(self, panel): # Write panel data to sheet
-        self.sheetData.write(panel)
+        self.writeQueue.writePanel(panel) # Queued and written with any other finished panels
 
     # Opens "About" menu when pressed
     def OnAbout(self, event): # About menu button
@@ -2994,6 +3017,9 @@ class panelProgramUI(wx.Frame): # Get input and initialize form
                 file.write(self.key.encrypt(file2.read().encode()))
         
         self.programPanel = False # Change toggle var on exit to end the loop
+        RuckusLibrary.sessionPool.closeAll() # Log out of the pooled controller sessions
+        if self.writeQueue is not None:
+            self.writeQueue.stop() # Writes any queued panel results
         try:
             global programThreads
             del programThreads
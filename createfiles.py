@@ -1,67 +1,46 @@
 # Written by Kai McGregor for use in Kai-ACK
 
-from pathlib import Path
 import os
+import threading
+
+# Site templates are read and split at their placeholders once, each panel's file is rendered in memory by joining the parts
+# Templates are reloaded if the file changes on disk
+templates = {} # path: [modified time, siteTemplate]
+templateLock = threading.Lock()
+
+class siteTemplate():
+    def __init__(self, path, placeholder, count):
+        with open(path, 'r') as file:
+            text = file.read()
+        parts = text.split(placeholder, count)
+        if len(parts) - 1 < count: # Placeholder is missing, site files aren't set up correctly
+            raise ValueError('substring not found')
+        # Text mode writes used the system line endings, rendered files keep them
+        self.parts = [part.replace('\n', os.linesep).encode() for part in parts]
+
+    def render(self, value): # Returns the file bytes with every placeholder replaced
+        return value.encode().join(self.parts)
+
+def getTemplate(path, placeholder, count = 1):
+    modifiedTime = os.path.getmtime(path)
+    with templateLock:
+        if path not in templates or templates[path][0] != modifiedTime:
+            templates[path] = [modifiedTime, siteTemplate(path, placeholder, count)]
+        return templates[path][1]
 
 def createFiles(panel):
-    mtAutoscript = open(panel.siteDir + '\\MTAutoscript.rsc','r')
-    password = open(panel.siteDir + '\\Password.txt','r')
-    wattBox = open(panel.siteDir + '\\WattBox.cfg','r')
-    dynu = open('dynuscript.rsc', 'r')
-
     # Gets password from file
-    panel.sitePassword = password.read().strip()
-    password.close()
-
-    # Creates Autoscript files for panels
-    config = mtAutoscript.read()
-    mtAutoscript.close()
+    with open(panel.siteDir + '\\Password.txt','r') as password:
+        panel.sitePassword = password.read().strip()
 
-    # Write ddnsHostname to autoscript
-    index = config.index('ReplaceWithDynu')
-    y = 0
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    filename = Path(dir_path + '/Autoscript/')
-    filename.mkdir(parents=True, exist_ok=True)
-    filename = Path(dir_path + '/Autoscript/' + panel.ssid + '.rsc')
-    filename.touch(exist_ok=True)
-    file = open(dir_path + '/Autoscript/' + panel.ssid + '.rsc', 'w')
+    # Renders the Autoscript and dynu script for the panel, both are uploaded from memory
     if panel.optionsList['Dynu'] is True: # Edits dynu if True
-        file.write(config[0:index] + panel.ddnsHostname + config[index + 15:len(config)])
+        panel.autoscript = getTemplate(panel.siteDir + '\\MTAutoscript.rsc', 'ReplaceWithDynu').render(panel.ddnsHostname)
     else:
-        file.write(config[0:index] + 'ReplaceWithDynu' + config[index + 15:len(config)])
-    file.close()
-
-    # Creates wattbox configs for panels
-    config = wattBox.read()
-    index = config.index('ReplaceWithSSID')
-    index2 = config.index('ReplaceWithSSID',index + 1)
-    index3 = config.index('ReplaceWithSSID',index2 + 1)
-    wattBox.close()
-    y = 0
-
-    # Write ssid's to wattbox config
-    filename = Path(dir_path + '/WattBox/')
-    filename.mkdir(parents=True, exist_ok=True)
-    filename = Path(dir_path + '/WattBox/' + panel.ssid + '.cfg')
-    filename.touch(exist_ok=True)
-    file = open(dir_path + '/WattBox/' + panel.ssid + '.cfg', 'w')
-    file.write(config[0:index] + panel.ssid)
-    file.write(config[index + (len('replacewithssid') - 1) + 1:index2] + panel.ssid)
-    file.write(config[index2 + (len('replacewithssid') - 1) + 1:index3] + panel.ssid + config[index3 + 15:len(config)])
-    file.close()
+        panel.autoscript = getTemplate(panel.siteDir + '\\MTAutoscript.rsc', 'ReplaceWithDynu').render('ReplaceWithDynu')
+    panel.dynuScript = getTemplate('dynuscript.rsc', 'ReplaceWithDynu').render(panel.ddnsHostname)
 
-    # Creates dynu scripts for panels
-    config = dynu.read()
-    dynu.close()
-    index = config.index('ReplaceWithDynu')
+    # Write ssid's to wattbox config, it's posted to the WattBox from memory
+    panel.wattboxConfig = getTemplate(panel.siteDir + '\\WattBox.cfg', 'ReplaceWithSSID', 3).render(panel.ssid)
 
-    filename = Path(dir_path + '/Dynu/')
-    filename.mkdir(parents=True, exist_ok=True)
-    filename = Path(dir_path + '/Dynu/' + panel.ssid + '.rsc')
-    filename.touch(exist_ok=True)
-    file = open(dir_path + '/Dynu/' + panel.ssid + '.rsc', 'w')
-    file.write(config[0:index] + panel.ddnsHostname + config[index + 15:len(config)])
-    file.close()
-    
     return panel
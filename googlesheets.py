@@ -2,11 +2,19 @@
 
 import gspread
 import math
+import time
 from oauth2client.client import HttpAccessTokenRefreshError
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import date
+import sitecache
+import sheetsclient
+import threading
 
 credentials = {} #dict containing credential information that was removed before making this repo public
+# spreadsheetData attributes saved in the site cache's column index map
+SNAPSHOTCOLUMNS = ('programmerIndex', 'apMACIndex', 'apSNIndex', 'wbSNIndex') # spreadsheetData columns that change while programming
+SNAPSHOTTTL = 30 # seconds programming columns are served from the snapshot before one batched read refreshes them
+INDEXNAMES = ('ssidIndex', 'ddnsHostnameIndex', 'dateIndex', 'mtMACIndex', 'mtSNIndex', 'apMACIndex', 'apSNIndex', 'wbMACIndex', 'wbSNIndex', 'programmerIndex', 'panelStartIndex', 'panelEndIndex')
 
 def getHeaderIndex(cellList, stringMatch, startPosition = 1): #looks for matching strings in list, stripped of spaces and lowercased
     headerIndex = 1
@@ -24,6 +32,15 @@ def getHeaderIndex(cellList, stringMatch, startPosition = 1): #looks for matchin
         headerIndex += 1
     return headerIndex
 
+def getCellValue(rowValues, row, col): # Cell from values API rows, blank if the row or column wasn't returned
+    try:
+        return rowValues[row - 1][col - 1]
+    except IndexError:
+        return ''
+
+def quoteTitle(title): # Worksheet title for an A1 range
+    return "'" + title.replace("'", "''") + "'"
+
 def getNewList(cellList, startPosition, endPosition): #grabs lists of SSIDS and DDNS hostnames
     cellCount = 1
     newList = []
@@ -56,34 +73,99 @@ class panel(): #class for individual panels
         self.ddnsHostname = ddnsHostname #ddns hostname for dynu script
         self.progStatus = panelProgStatus #indicates the stage that the panel is at in the programming process
         self.optionsList = optionsList # list of alternate programming methods from front-end
+        self.connection = None # ssh connection kept for the programming process, see programpanel.getConnection
+        self.apiConnection = None # RouterOS API connection, False if the panel's API can't be reached, see programpanel.getTransport
+        self.autoscript = None # MTAutoscript rendered for the panel, see createfiles
+        self.dynuScript = None # dynu script rendered for the panel
+        self.wattboxConfig = None # WattBox config rendered for the panel
 
 # Populates spreadsheet data
 class spreadsheetData():
-    def __init__(self, sheetName, siteDir):
+    def __init__(self, sheetName, siteDir, cache = None):
         # Finds and opens spreadsheet based on the sheet name
         scope = ('https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive')
 
         authorization = ServiceAccountCredentials.from_json_keyfile_dict(credentials, scope)
-        self.gc = gspread.authorize(authorization)
-            
+        self.gc = sheetsclient.authorize(authorization)
+
+        cachedSite = None
+        if cache is not None:
+            cachedSite = cache.loadSite(sheetName)
+
+        self.snapshot = None # Programming columns by column index, see refreshSnapshot
+        self.snapshotTime = 0
+        self.snapshotLock = threading.Lock()
+
+        if cachedSite is None: # Site hasn't been cached, reads the NAF and Programming sheet in one batched request
+            sheetValues, sheetModified = self.loadSpreadsheet(self.gc.open(sheetName), siteDir)
+        else: # NAF values and rows come from the cache while the spreadsheet is unchanged
+            sheetModified = sitecache.getSheetModified(self.gc, cachedSite['spreadsheetID'])
+            if sheetModified == cachedSite['sheetModified']:
+                print('Site data unchanged since ' + time.ctime(cachedSite['loadedTime']))
+                self.apZone = cachedSite['apZone']
+                self.controllerIP = cachedSite['controllerIP']
+                self.wks = self.gc.open_by_key(cachedSite['spreadsheetID']).worksheet(cachedSite['worksheet'])
+                sheetValues = cachedSite['rows']
+                self.setIndexMap(cachedSite['indexMap'])
+                self.updatePasswordList(siteDir) # Password.txt is local, it can change without the spreadsheet changing
+            else: # Spreadsheet changed, the NAF may have too
+                print('Site data changed, reloading')
+                sheetValues, sheetModified = self.loadSpreadsheet(self.gc.open_by_key(cachedSite['spreadsheetID']), siteDir)
+
+        self.loadLists(sheetValues)
+        if cache is not None:
+            changedRows = cache.saveSite(sheetName, self, sheetValues, sheetModified)
+            print(str(changedRows) + ' site rows updated in cache')
+
+        self.doubleAPList = self.getDoubleAPList() # list of double aps, needs 'fixing'
+        self.completedList = self.getCompletedPanels()
+
+    # Reads the NAF and Programming sheet in one batched request, returns the Programming rows and the spreadsheet's modified time
+    def loadSpreadsheet(self, spreadsheet, siteDir):
+        worksheets = {}
+        for worksheet in spreadsheet.worksheets():
+            worksheets[worksheet.title] = worksheet
+
+        # Load sheetData
+        if 'Programming' in worksheets:
+            self.wks = worksheets['Programming']
+        elif 'Asset Inventory' in worksheets:
+            self.wks = worksheets['Asset Inventory']
+        else:
+            raise gspread.exceptions.WorksheetNotFound('Programming')
+        ranges = [quoteTitle(self.wks.title)]
+
+        nafTitle = None
+        for title in ('Network Activation Form', 'NETWORK ACTIVATION FORM'):
+            if title in worksheets:
+                nafTitle = title
+                ranges.append(quoteTitle(nafTitle) + '!A:B')
+                break
+
+        sheetModified = sitecache.getSheetModified(self.gc, spreadsheet.id) # Read before the values so edits made during the load refresh next time
+        valueRanges = spreadsheet.values_batch_get(ranges)['valueRanges']
+        sheetValues = gspread.utils.fill_gaps(valueRanges[0].get('values', [[]])) # Pads rows like get_all_values
+        nafValues = None
+        if nafTitle is not None:
+            nafValues = valueRanges[1].get('values', [])
+
+        self.loadNAF(nafValues, siteDir)
+        self.loadIndexes(sheetValues)
+        return sheetValues, sheetModified
+
+    # Gets the AP Zone name and Controller IP off of the NAF and adds the site password to the master list
+    def loadNAF(self, nafValues, siteDir): # nafValues are the NAF's A:B rows, None if the NAF wasn't found
         # Gets the AP Zone name and Controller IP off of the NAF
-        worksheetFound = True
         self.apZone = ''
         self.controllerIP = ''
-        try:
-            self.wks = self.gc.open(sheetName).worksheet('Network Activation Form')
-        except gspread.exceptions.WorksheetNotFound:
-            try:
-                self.wks = self.gc.open(sheetName).worksheet('NETWORK ACTIVATION FORM')
-            except gspread.exceptions.WorksheetNotFound:
-                worksheetFound = False
-                
-        if worksheetFound is True:
-            colValues = self.wks.col_values(1)
+        if nafValues is not None:
+            colValues = []
+            for row in nafValues:
+                colValues.append(row[0] if len(row) > 0 else '')
             apZoneIndex = getHeaderIndex(colValues, ['Property', 'Name'])
             ruckusController = getHeaderIndex(colValues, ['Ruckus', 'Controller'])
-            self.apZone = self.wks.cell(apZoneIndex, 2).value.strip()
-            self.controllerIP = self.wks.cell(ruckusController, 2).value.strip()
+            self.apZone = getCellValue(nafValues, apZoneIndex, 2).strip()
+            self.controllerIP = getCellValue(nafValues, ruckusController, 2).strip()
             while True:
                 if self.controllerIP[len(self.controllerIP)-1].isdigit() is False:
                     self.controllerIP = self.controllerIP[:len(self.controllerIP)-1]
@@ -102,7 +184,10 @@ class spreadsheetData():
             except ValueError:
                 self.controllerIP = None
 
-        # Adds site password to master list
+        self.updatePasswordList(siteDir)
+
+    # Adds site password to master list
+    def updatePasswordList(self, siteDir):
         worksheetFound = True
         try:
             passwordWKS = self.gc.open('Site Password Master List').worksheet('Programming Passwords')
@@ -114,8 +199,11 @@ class spreadsheetData():
             worksheetFound = False
 
         if worksheetFound is True:
-            siteList = passwordWKS.col_values(1)
-            passList = passwordWKS.col_values(2)
+            passwordColumns = passwordWKS.spreadsheet.values_get(quoteTitle(passwordWKS.title) + '!A:B', params={'majorDimension': 'COLUMNS'}).get('values', [])
+            while len(passwordColumns) < 2:
+                passwordColumns.append([])
+            siteList = passwordColumns[0]
+            passList = passwordColumns[1]
 
             x = 0
             while x < len(passList):
@@ -156,14 +244,8 @@ class spreadsheetData():
                 passwordWKS.update_cell(index2, 1, self.apZone)
                 passwordWKS.update_cell(index2, 2, sitePassword)
 
-        # Load sheetData
-        try:
-            self.wks = self.gc.open(sheetName).worksheet('Programming')
-        except gspread.exceptions.WorksheetNotFound:
-            self.wks = self.gc.open(sheetName).worksheet('Asset Inventory')
-
-        sheetValues = self.wks.get_all_values()
-        
+    # Finds the column indexes and panel rows of the Programming sheet
+    def loadIndexes(self, sheetValues):
         col1List = []
         x = 0
         while x < len(sheetValues):
@@ -190,7 +272,19 @@ class spreadsheetData():
             x += 1
             
         self.panelEndIndex = getHeaderIndex(ssidPanelEndList,[''],self.panelStartIndex) - 1
-        
+
+    def getIndexMap(self): # Column index map stored in the site cache
+        indexMap = {}
+        for name in INDEXNAMES:
+            indexMap[name] = getattr(self, name)
+        return indexMap
+
+    def setIndexMap(self, indexMap):
+        for name in INDEXNAMES:
+            setattr(self, name, indexMap[name])
+
+    # Builds the ssid and ddns lists from the Programming sheet rows
+    def loadLists(self, sheetValues):
         self.ddnsList = []
         x = 0
         while x < len(sheetValues):
@@ -213,12 +307,60 @@ class spreadsheetData():
         while (len(self.ddnsList) < len(self.ssidList)): #makes lists equal in size
             self.ddnsList.append('None')
 
-        self.doubleAPList = self.getDoubleAPList() # list of double aps, needs 'fixing'
-        self.completedList = self.getCompletedPanels()
+        self.setSnapshot(sheetValues)
+
+    # Programming columns are kept in a snapshot so lookups don't each make a col_values request
+    def setSnapshot(self, sheetValues): # Snapshot from a full read of the Programming sheet
+        snapshot = {}
+        for column in SNAPSHOTCOLUMNS:
+            columnIndex = getattr(self, column)
+            snapshot[columnIndex] = []
+            for row in sheetValues:
+                snapshot[columnIndex].append(row[columnIndex - 1] if len(row) >= columnIndex else '')
+            while len(snapshot[columnIndex]) > 0 and snapshot[columnIndex][-1] == '': # Trimmed like col_values
+                del snapshot[columnIndex][-1]
+        with self.snapshotLock:
+            self.snapshot = snapshot
+            self.snapshotTime = time.time()
+
+    def refreshSnapshot(self, force = False): # Reads every snapshot column in one values.batchGet request
+        with self.snapshotLock:
+            if force is False and self.snapshot is not None and time.time() - self.snapshotTime < SNAPSHOTTTL:
+                return
+            columnIndexes = []
+            ranges = []
+            for column in SNAPSHOTCOLUMNS:
+                columnIndex = getattr(self, column)
+                columnLetter = gspread.utils.rowcol_to_a1(1, columnIndex)[:-1]
+                columnIndexes.append(columnIndex)
+                ranges.append(quoteTitle(self.wks.title) + '!' + columnLetter + ':' + columnLetter)
+            valueRanges = self.wks.spreadsheet.values_batch_get(ranges, params={'majorDimension': 'COLUMNS'})['valueRanges']
+            snapshot = {}
+            x = 0
+            while x < len(columnIndexes):
+                values = valueRanges[x].get('values', [])
+                snapshot[columnIndexes[x]] = values[0] if len(values) > 0 else []
+                x += 1
+            self.snapshot = snapshot
+            self.snapshotTime = time.time()
+
+    def getColumn(self, columnIndex): # Same values as wks.col_values, served from the snapshot
+        self.refreshSnapshot()
+        with self.snapshotLock:
+            return list(self.snapshot.get(columnIndex, []))
+
+    def setSnapshotCell(self, row, columnIndex, value): # Keeps the snapshot in line with our own writes
+        with self.snapshotLock:
+            if self.snapshot is None or columnIndex not in self.snapshot:
+                return
+            column = self.snapshot[columnIndex]
+            while len(column) < row:
+                column.append('')
+            column[row - 1] = value
 
     # Returns wbSN list indicating completed panels
     def getWbSNList(self):
-        wbSNList = getNewList(self.wks.col_values(self.wbSNIndex), self.panelStartIndex, self.panelEndIndex)
+        wbSNList = getNewList(self.getColumn(self.wbSNIndex), self.panelStartIndex, self.panelEndIndex)
         while (len(wbSNList) < len(self.ssidList)):
             wbSNList.append('None')
         return wbSNList
@@ -227,7 +369,7 @@ class spreadsheetData():
     def getProgrammerList(self, programmerName):
         while True:
             try:
-                allProgrammerList = getNewList(self.wks.col_values(self.programmerIndex), self.panelStartIndex, self.panelEndIndex)
+                allProgrammerList = getNewList(self.getColumn(self.programmerIndex), self.panelStartIndex, self.panelEndIndex)
                 self.completedList = self.getCompletedPanels()
                 programmerList = []
                 x = 0
@@ -267,9 +409,9 @@ class spreadsheetData():
     def programDoubleAPList(self, programmerName):
         while True:
             try:
-                allProgrammerList = getNewList(self.wks.col_values(self.programmerIndex), self.panelStartIndex, self.panelEndIndex)
-                apMACList = getNewList(self.wks.col_values(self.apMACIndex), self.panelStartIndex, self.panelEndIndex)
-                apSNList = getNewList(self.wks.col_values(self.apSNIndex), self.panelStartIndex, self.panelEndIndex)
+                allProgrammerList = getNewList(self.getColumn(self.programmerIndex), self.panelStartIndex, self.panelEndIndex)
+                apMACList = getNewList(self.getColumn(self.apMACIndex), self.panelStartIndex, self.panelEndIndex)
+                apSNList = getNewList(self.getColumn(self.apSNIndex), self.panelStartIndex, self.panelEndIndex)
                 allDoubleAPList = self.getDoubleAPList()
                 completedList = self.getCompletedPanels()
                 lowestLen = len(apMACList)
@@ -318,6 +460,38 @@ class spreadsheetData():
                     
         return doubleAPList
         
+    def programZoneAPList(self, programmerName): # APs on the programmers list with a MAC but no SN, double APs are left to programDoubleAPList
+        while True:
+            try:
+                allProgrammerList = getNewList(self.getColumn(self.programmerIndex), self.panelStartIndex, self.panelEndIndex)
+                apMACList = getNewList(self.getColumn(self.apMACIndex), self.panelStartIndex, self.panelEndIndex)
+                apSNList = getNewList(self.getColumn(self.apSNIndex), self.panelStartIndex, self.panelEndIndex)
+                allDoubleAPList = self.getDoubleAPList()
+
+                zoneAPList = []
+                x = 0
+                while x < min(len(self.ssidList), len(apMACList)):
+                    try:
+                        apSN = apSNList[x].strip()
+                    except IndexError: # col_values stops at the last filled cell
+                        apSN = ''
+                    if x < len(allProgrammerList) and allProgrammerList[x] == programmerName and allDoubleAPList[x] != self.ssidList[x] and apMACList[x].strip() != '' and apSN == '':
+                        apMAC = apMACList[x].strip().replace(':', '')
+                        zoneAPList.append([self.ssidList[x], ':'.join(a+b for a,b in zip(apMAC[::2], apMAC[1::2]))])
+                    x += 1
+
+                break
+            except gspread.exceptions.APIError:
+                print('credentials refreshed')
+                while True:
+                    try:
+                        self.gc.login()
+                        break
+                    except HttpAccessTokenRefreshError:
+                        time.sleep(1)
+
+        return zoneAPList
+
     def getCompletedPanels(self): #returns list of completed panels
         while True:
             try:
@@ -350,22 +524,36 @@ class spreadsheetData():
     def ssidPosition(self, panelSSID): #returns panel position on spreadsheet based on ssidList and given ssid
         return self.ssidList.index(panelSSID) + self.panelStartIndex
             
+    def panelCells(self, panelWrite): #cells written for a finished panel
+        panelPosition = self.ssidPosition(panelWrite.ssid)
+        cellList = []
+        cellList.append(gspread.models.Cell(panelPosition, self.mtMACIndex, value = panelWrite.tikMAC))
+        cellList.append(gspread.models.Cell(panelPosition, self.mtSNIndex, value = panelWrite.tikSN))
+        d = date.today()
+        cellList.append(gspread.models.Cell(panelPosition, self.dateIndex, value = str(d.month) + '/' + str(d.day) + '/' + str(d.year)))
+        if panelWrite.optionsList['AP'] is True:
+            cellList.append(gspread.models.Cell(panelPosition, self.apMACIndex, value = panelWrite.apMAC))
+            cellList.append(gspread.models.Cell(panelPosition, self.apSNIndex, value = panelWrite.apSN))
+        if panelWrite.optionsList['Wattbox'] is True:
+            cellList.append(gspread.models.Cell(panelPosition, self.wbMACIndex, value = panelWrite.wattMAC))
+            cellList.append(gspread.models.Cell(panelPosition, self.wbSNIndex, value = panelWrite.wattSN))
+        return cellList
+
+    def apCells(self, apWrite): #cells written for a list of [ssid, mac, sn] APs
+        cellList = []
+        for ap in apWrite:
+            panelPosition = self.ssidPosition(ap[0])
+            cellList.append(gspread.models.Cell(panelPosition, self.apMACIndex, value = ap[1]))
+            cellList.append(gspread.models.Cell(panelPosition, self.apSNIndex, value = ap[2]))
+        return cellList
+
     def write(self, panelWrite): #object from panel class should be passed, writes to spreadsheet
         while True:
             try:
-                panelPosition = self.ssidPosition(panelWrite.ssid)
-                cellList = []
-                cellList.append(gspread.models.Cell(panelPosition, self.mtMACIndex, value = panelWrite.tikMAC))
-                cellList.append(gspread.models.Cell(panelPosition, self.mtSNIndex, value = panelWrite.tikSN))
-                d = date.today()
-                cellList.append(gspread.models.Cell(panelPosition, self.dateIndex, value = str(d.month) + '/' + str(d.day) + '/' + str(d.year)))
-                if panelWrite.optionsList['AP'] is True:
-                    cellList.append(gspread.models.Cell(panelPosition, self.apMACIndex, value = panelWrite.apMAC))
-                    cellList.append(gspread.models.Cell(panelPosition, self.apSNIndex, value = panelWrite.apSN))
-                if panelWrite.optionsList['Wattbox'] is True:
-                    cellList.append(gspread.models.Cell(panelPosition, self.wbMACIndex, value = panelWrite.wattMAC))
-                    cellList.append(gspread.models.Cell(panelPosition, self.wbSNIndex, value = panelWrite.wattSN))
+                cellList = self.panelCells(panelWrite)
                 self.wks.update_cells(cellList)
+                for cell in cellList:
+                    self.setSnapshotCell(cell.row, cell.col, cell.value)
                 break
                 
             except gspread.exceptions.APIError as error:
@@ -382,6 +570,7 @@ class spreadsheetData():
                     if panelWrite.optionsList['Wattbox'] is True:
                         self.wks.update_cell(panelPosition, self.wbMACIndex, panelWrite.wattMAC) #write Wattbox MAC
                         self.wks.update_cell(panelPosition, self.wbSNIndex, panelWrite.wattSN) #write Wattbox SN
+                    self.refreshSnapshot(force = True)
                     break
                 
                 print('credentials refreshed')
@@ -399,6 +588,8 @@ class spreadsheetData():
                     panelPosition = self.ssidPosition(ap[0])
                     self.wks.update_cell(panelPosition, self.apMACIndex, ap[1]) # Write AP MAC of doubleAP list to spreadsheet
                     self.wks.update_cell(panelPosition, self.apSNIndex, ap[2])
+                    self.setSnapshotCell(panelPosition, self.apMACIndex, ap[1])
+                    self.setSnapshotCell(panelPosition, self.apSNIndex, ap[2])
                 break
             except gspread.exceptions.APIError:
                 print('credentials refreshed')
@@ -17,7 +17,15 @@ import librouteros  # library used to communciate with MikroTik API + Python
 from librouteros import connect  # imported so we can rip code directly off doc
 import json
 import socket  # used to except connection errors
-import time
+import retrypolicy
+
+# Retry policies for the API, see retrypolicy
+# A trap during login means the password is wrong, it's retried for a while since the password may be about to change
+RETRYDEADLINE = 300 # Seconds a dropped API connection is retried, a downgrade and reboot takes a couple of minutes
+AUTHDEADLINE = 120 # Seconds a failed login is retried
+APIERRORS = (librouteros.exceptions.ConnectionError, librouteros.exceptions.FatalError, socket.error, socket.gaierror, EOFError)
+apiRetry = retrypolicy.retryPolicy(APIERRORS, deadline = RETRYDEADLINE, onGiveUp = retrypolicy.printGiveUp('API'))
+authRetry = retrypolicy.retryPolicy(librouteros.exceptions.TrapError, deadline = AUTHDEADLINE, baseDelay = .2, maxDelay = 2, onGiveUp = retrypolicy.printGiveUp('API login'))
 
 def enableServices(ip, password):
     try:
@@ -72,6 +80,7 @@ def enableServices(ip, password):
         MikroTik IP is either 192.168.88.1 or 192.168.87.1\n')
 
 def disableSSH(ip, password):
+    retry = apiRetry.start()
     while True:
         try:
             api = connect(username='admin', password = password, host= ip)
@@ -87,8 +96,8 @@ def disableSSH(ip, password):
                 pass
 
             break
-        except (librouteros.exceptions.ConnectionError, socket.gaierror):
-            time.sleep(.5)
+        except (librouteros.exceptions.ConnectionError, socket.gaierror) as error:
+            retry.failed(error)
 
 def testAuth(ip, password):
     try:
@@ -104,3 +113,90 @@ def testAuth(ip, password):
     # except librouteros.exceptions.FatalError:
     #     print('Password incorrect on MikroTik API login.')
 
+
+# Persistent API connection for a panel, used by routeroscommands in place of ssh for the commands the API can run
+# Each command is one sentence exchange on the open socket instead of a new ssh channel and a console table to parse
+class apiConnection():
+    def __init__(self, hostname, password, username = 'admin'):
+        self.hostname = hostname
+        self.password = password
+        self.username = username
+        self.api = None
+
+    def connect(self): # Raises the librouteros error if the panel's API can't be logged into
+        self.close()
+        self.api = connect(username = self.username, password = self.password, host = self.hostname)
+
+    # Runs an API command, e.g. '/ip/arp/print', and returns the reply sentences as dicts
+    # Reconnects and retries if the connection drops, the panel reboots during programming
+    def run(self, cmd, words = None, hostname = None, password = None):
+        if hostname is not None and hostname != self.hostname:
+            self.hostname = hostname
+            self.close()
+        if password is not None:
+            self.password = password
+        if words is None:
+            words = {}
+        retry = apiRetry.start()
+        loginRetry = authRetry.start()
+        while True:
+            try:
+                if self.api is None:
+                    self.connect()
+                return list(self.api(cmd = cmd, **words))
+            except (librouteros.exceptions.ConnectionError, librouteros.exceptions.FatalError, socket.error, EOFError) as error:
+                self.close()
+                retry.failed(error)
+            except librouteros.exceptions.TrapError as error:
+                if self.api is None: # Login failed, password may not be set yet
+                    loginRetry.failed(error)
+                else: # Command failed on the panel, reported the same way the console would
+                    print(cmd + ' failed: ' + str(error))
+                    return []
+
+    # Returns rows of a menu, e.g. '/ip arp', in the same form as routeroscommands.printTerse
+    # The API print can't take a where filter so rows are filtered here, where is {key: value}
+    def printRows(self, path, where = None, hostname = None, password = None):
+        rows = []
+        index = 0
+        for sentence in self.run(path.strip().replace(' ', '/') + '/print', None, hostname, password):
+            row = {'.index': index, '.flags': ''}
+            index += 1
+            for key in sentence:
+                row[key] = getValue(sentence[key])
+            for flag, key in (('X', 'disabled'), ('I', 'invalid'), ('D', 'dynamic')):
+                if sentence.get(key) is True:
+                    row['.flags'] += flag
+            if where is not None and any(row.get(key) != where[key] for key in where):
+                continue
+            rows.append(row)
+        return rows
+
+    def close(self):
+        if self.api is not None:
+            try:
+                self.api(cmd = '/quit')
+            except (librouteros.exceptions.ConnectionError, librouteros.exceptions.FatalError, socket.error, EOFError):
+                pass
+            self.api = None
+
+def getValue(value): # API values converted to the console's text so rows match either transport
+    if value is True:
+        return 'yes'
+    elif value is False:
+        return 'no'
+    return str(value)
+
+# Returns an open apiConnection, None if the password was refused (the panel's password may not be set yet)
+# or False if the panel's API can't be used (disabled, or a login method this library doesn't support)
+def openConnection(hostname, password):
+    connection = apiConnection(hostname, password)
+    try:
+        connection.connect()
+        return connection
+    except librouteros.exceptions.TrapError:
+        connection.close()
+        return None
+    except (librouteros.exceptions.ConnectionError, librouteros.exceptions.FatalError, socket.error, EOFError):
+        connection.close()
+        return False
@@ -2,89 +2,145 @@
 
 import subprocess
 import re
+import sys
+import socket
+import errno
+from concurrent.futures import ThreadPoolExecutor
 
-# Get arp table for panel interfaces
-def getPanelList(): #BETTER USE THIS SETUP
-    CREATE_NO_WINDOW = 0x08000000
-    arpTables = []
-    ipMACList = []
+PANELSUBNETS = ('192.168.88.', '192.168.87.') # Subnets panels hand out to the programming computer
+CREATE_NO_WINDOW = 0x08000000
+SWEEPPORTS = (22, 8728) # SSH and RouterOS API, open on every panel Mikrotik
+SWEEPWORKERS = 128 # Probes running at once
+SWEEPTIMEOUT = 0.3 # Seconds before a probe gives up on a host
+SWEEPINTERVAL = 15 # Seconds between active sweeps while panels are being queried
+
+# Neighbour table backends, each returns [ip, mac, interface] records with lowercase colon separated MACs
+# interface is the device name on Linux and the interface ip on Windows
+backends = {}
+
+def registerBackend(platform, backend, pollInterval):
+    backends[platform] = [backend, pollInterval]
+
+# Linux keeps the neighbour table in /proc, reading it is a single file read
+def getLinuxNeighbours():
+    neighbours = []
+    with open('/proc/net/arp', 'r') as file:
+        next(file) # Header line
+        for line in file:
+            fields = line.split()
+            # IP address, HW type, Flags, HW address, Mask, Device
+            if len(fields) < 6 or fields[2] == '0x0' or fields[3] == '00:00:00:00:00:00': # Incomplete entries
+                continue
+            neighbours.append([fields[0], fields[3].lower(), fields[5]])
+    return neighbours
+
+# Windows only exposes the table through arp, every interface is listed under an 'Interface: ip --- index' header
+ipPattern = re.compile(r'\d{1,3}(?:\.\d{1,3}){3}$')
+arpInterfacePattern = re.compile(r'Interface:\s+(\d{1,3}(?:\.\d{1,3}){3})')
+arpEntryPattern = re.compile(r'^\s*(\d{1,3}(?:\.\d{1,3}){3})\s+([0-9a-fA-F]{2}(?:-[0-9a-fA-F]{2}){5})', re.MULTILINE)
+
+def getWindowsNeighbours():
+    cmdCommand = subprocess.Popen(['arp', '/a', '/n'], stdout = subprocess.PIPE, creationflags = CREATE_NO_WINDOW)
+    arpReturn = cmdCommand.communicate()[0].decode(errors = 'ignore')
+
+    neighbours = []
     interfaceIP = None
+    for line in arpReturn.splitlines():
+        interfaceMatch = arpInterfacePattern.search(line)
+        if interfaceMatch is not None:
+            interfaceIP = interfaceMatch.group(1)
+            continue
+        entryMatch = arpEntryPattern.match(line)
+        if entryMatch is not None and interfaceIP is not None:
+            neighbours.append([entryMatch.group(1), entryMatch.group(2).replace('-', ':').lower(), interfaceIP])
+    return neighbours
 
-    # Get ip of interface from cmd return
-    cmdCommand = subprocess.Popen(['ipconfig'], stdout = subprocess.PIPE, creationflags = CREATE_NO_WINDOW)
-    arpReturn = cmdCommand.communicate()
-    arpReturn = str(arpReturn[0])
-    if '192.168.88.1' in arpReturn:
-        gatewayIndex = arpReturn.index('192.168.88.1')
-        while gatewayIndex >= 0:
-            if arpReturn[gatewayIndex:gatewayIndex+12] == 'IPv4 Address':
-                break
-            gatewayIndex -= 1
-            
-        while gatewayIndex < len(arpReturn):
-            if arpReturn[gatewayIndex] == ':':
-                interfaceIP = arpReturn[gatewayIndex+2:gatewayIndex+16]
-                break
-            gatewayIndex += 1
+registerBackend('linux', getLinuxNeighbours, 0.5)
+registerBackend('win32', getWindowsNeighbours, 3) # Spawns arp, polled slower
 
-    if '192.168.87.1' in arpReturn:
-        gatewayIndex = arpReturn.index('192.168.87.1')
-        while gatewayIndex >= 0:
-            if arpReturn[gatewayIndex:gatewayIndex+12] == 'IPv4 Address':
-                break
-            gatewayIndex -= 1
-            
-        while gatewayIndex < len(arpReturn):
-            if arpReturn[gatewayIndex] == ':':
-                interfaceIP = arpReturn[gatewayIndex+2:gatewayIndex+16]
+def getBackend():
+    for platform in backends:
+        if sys.platform.startswith(platform):
+            return backends[platform]
+    return backends['win32']
+
+POLLINTERVAL = getBackend()[1] # Seconds between panel queries for this platform
+
+# Get arp table for panel interfaces, returns [ip, mac] for every panel
+def getPanelList():
+    ipMACList = []
+    for ip, mac, interface in getBackend()[0]():
+        for subnet in PANELSUBNETS:
+            if ip.startswith(subnet):
+                if ip == interface or ip == subnet + '255':
+                    break
+                if ipPattern.match(interface) is not None and interface.startswith(subnet) is False: # Entry was seen on another network's interface
+                    break
+                ipMACList.append([ip, mac])
                 break
-            gatewayIndex += 1
-
-    # Return empty array if no interface ip is found
-    if interfaceIP is None:
-        return []
-
-    # Get arp Table from ip
-    cmdCommand = subprocess.Popen(['arp','/a', '/n', interfaceIP], stdout = subprocess.PIPE, creationflags = CREATE_NO_WINDOW)
-    arpReturn = cmdCommand.communicate()
-    arpTables.append([False, interfaceIP, str(arpReturn[0])])
-
-    for tables in arpTables:
-        index = 0
-        while tables[0] is False:
-            try:
-                if tables[1][0:len(tables[1])-4] == '192.168.88':
-                    ipIndex = tables[2].index('192.168.88', index)
-                    index = ipIndex + 5
-                    ip = tables[2][ipIndex:ipIndex + 14]
-                    ip = ip.strip()
-                    if ip == tables[1] or ip == '192.168.88.255':
-                        continue
-                    if re.match('192\.168\.88\.\d{1,2}', ip) is not None:
-                        ipMACList.append([ip, tables[2][ipIndex + 13 + 9:ipIndex + 13 + 9 + 17]])
-                        
-                    
-                elif tables[1][0:len(tables[1])-4] == '192.168.87':
-                    ipIndex = tables[2].index('192.168.87', index)
-                    index = ipIndex + 5
-                    ip = tables[2][ipIndex:ipIndex + 14]
-                    ip = ip.strip()
-                    if ip == tables[1] or ip == '192.168.87.255':
-                        continue
-                    if re.match('192\.168\.87\.\d{1,2}', ip) is not None:
-                        ipMACList.append([ip, tables[2][ipIndex + 13 + 9:ipIndex + 13 + 9 + 17]])
-                        
-            except ValueError:
-                tables[0] = True
-
-    # Replace hyphens with colons
-    x = 0
-    while x < len(ipMACList):
-        ipMACList[x][1] = ipMACList[x][1].replace('-',':')
-        x += 1
-     
+
     return ipMACList
 
+# Returns the panel subnets this computer has an address on
+def getLocalSubnets():
+    localSubnets = []
+    for subnet in PANELSUBNETS:
+        testSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            testSocket.connect((subnet + '1', 9)) # UDP connect sends nothing, it only picks the source address
+            if testSocket.getsockname()[0].startswith(subnet):
+                localSubnets.append(subnet)
+        except OSError:
+            pass
+        finally:
+            testSocket.close()
+    return localSubnets
+
+# Returns the port if it's open, True if the host answered but the port is closed and None if nothing answered
+def probePort(ip, port, timeout = SWEEPTIMEOUT):
+    probeSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probeSocket.settimeout(timeout)
+    try:
+        result = probeSocket.connect_ex((ip, port))
+    except OSError:
+        return None
+    finally:
+        probeSocket.close()
+    if result == 0:
+        return port
+    if result in (errno.ECONNREFUSED, 10061): # Refused by the host, so it's there (10061 is WSAECONNREFUSED)
+        return True
+    return None
+
+# Actively probes the panel subnets so new panels show up without waiting for them in the arp cache
+# Connecting to a host makes the OS resolve its MAC, so the neighbour table is read once after the sweep
+# Returns [ip, mac, openPorts] for every host that answered
+def sweepPanels(subnets = None, ports = SWEEPPORTS, workers = SWEEPWORKERS, timeout = SWEEPTIMEOUT):
+    if subnets is None:
+        subnets = getLocalSubnets()
+    probes = []
+    for subnet in subnets:
+        for host in range(1, 255):
+            for port in ports:
+                probes.append([subnet + str(host), port])
+
+    hostPorts = {}
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        results = executor.map(lambda probe: probePort(probe[0], probe[1], timeout), probes)
+        for probe, result in zip(probes, results):
+            if result is None:
+                continue
+            if probe[0] not in hostPorts:
+                hostPorts[probe[0]] = []
+            if result is not True:
+                hostPorts[probe[0]].append(result)
+
+    sweepList = []
+    for ip, mac in getPanelList():
+        if ip in hostPorts:
+            sweepList.append([ip, mac, hostPorts[ip]])
+    return sweepList
+
 # Increment a hex number by one
 def getHexNum(int3MAC):
     int3MAC = int3MAC.replace(':', '')
@@ -2,15 +2,77 @@
 
 import sshftpconnection
 import time
-import os
 import datetime
 import createfiles
+import siteartifacts
+import routeroscommands
+import qcengine
+import readiness
+import mikrotikAPI
 from pubsub import pub as Publisher
 import ftplib
 import wx
 
+USEAPI = True # routeroscommands use the RouterOS API (port 8728) when the panel allows it, see getTransport
+HOTSPOTFILES = ('alogin.html', 'error.html', 'flogin.html', 'logout.html', 'md5.js', 'redirect.html', 'rlogin.html', 'status.html') # Uploaded with the old site files
+
+def certificateFiles(newCerts): # Certificate files for the site files chosen
+    if newCerts is True:
+        return ('gd_bundle-g2-g1.crt', 'certificate-request_key.pem', 'be258587ac15fd8a.crt')
+    elif newCerts is None:
+        return ('server.cer', 'server.key')
+    return ('AddTrustExternalCARoot.crt', 'certificate-request_key.pem', 'COMODORSAAddTrustCA.crt', 'COMODORSADomainValidationSecureServerCA.crt', 'hotspot_addmydevice_com.crt')
+
+def hotspotManifest(panel, artifacts): # Hotspot files for the site files chosen, uploaded while programming and checked by QC
+    manifest = []
+    if panel.newCerts is not None and panel.optionsList['Login'] is True:
+        manifest += artifacts.manifest(['login.html'], '/flash/hotspot/') #sends login file
+    elif panel.newCerts is None and panel.optionsList['Login'] is True:
+        manifest += artifacts.manifest(['hotspot\\login.html'], '/flash/hotspot/')
+
+    if panel.newCerts is None:
+        manifest += artifacts.manifest(['hotspot\\' + fileName for fileName in HOTSPOTFILES], '/flash/hotspot/')
+        manifest += artifacts.manifest(['hotspot\\img\\logobottom.png'], '/flash/hotspot/img/')
+    return manifest
+
+def getConnection(panel): # Panel keeps one ssh connection for the whole programming process, see sshftpconnection.panelConnection
+    if panel.connection is None:
+        panel.connection = sshftpconnection.panelConnection(panel.ip, panel.initPassword)
+    return panel.connection
+
+# Returns the panel's API connection for routeroscommands, or its ssh connection if the API can't be logged into
+# password is the one the caller's command uses, the panel's initial password if None
+# A refused login is tried again on the next call since the password changes during programming, the API is only
+# given up on for the panel if it can't be reached. Commands the API can't run (imports, resets, cable tests) always use getConnection
+def getTransport(panel, password = None):
+    if USEAPI is False:
+        return getConnection(panel)
+    if password is None:
+        password = panel.initPassword
+    if panel.apiConnection is None:
+        apiConnection = mikrotikAPI.openConnection(panel.ip, password)
+        if apiConnection is None:
+            print(panel.ssid + ': API login refused, using ssh')
+            return getConnection(panel)
+        panel.apiConnection = apiConnection
+        if panel.apiConnection is False:
+            print(panel.ssid + ': API unavailable, using ssh')
+    if panel.apiConnection is False:
+        return getConnection(panel)
+    return panel.apiConnection
+
+def reportBatch(panel, results): # Shows the commands in a routeroscommands.runBatch that failed
+    for command, lines, failed in results:
+        if failed is True:
+            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tCommand failed: ' + command, group = 4)
+
+def closeConnections(panel): # Closes the panel's connections, they reconnect on the next command
+    if panel.connection is not None:
+        panel.connection.close()
+    if panel.apiConnection is not None and panel.apiConnection is not False:
+        panel.apiConnection.close()
+
 def progPanel1(panel): #gets tik mac, tik sn, and downgrades and runs autoscript
-    dir_path = os.path.dirname(os.path.realpath(__file__))
     while True:
         try:
             panel = createfiles.createFiles(panel) #create unit-specific files
@@ -21,120 +83,73 @@ def progPanel1(panel): #gets tik mac, tik sn, and downgrades and runs autoscript
             dlg.Destroy()
             
     Publisher.sendMessage('status', ssid = panel.ssid, message = 'Unit-specific files created')
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.initPassword)
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'interface ethernet print', panel.ip, panel.initPassword) #get MAC
-    time.sleep(1)
-    ssh.close()
-    index = 0
-    index2 = 0
-    for line in stdout:
-        line = line.strip()
-        try:
-            index = line.index('MAC-ADDRESS')
-            index2 = line.index('ARP')
-        except ValueError:
-            pass
-
-        try:
-            newVar = line.index('ether')
-            if (panel.tikMAC == ''):
-                panel.tikMAC = line[index:index2 - 1]
-                break
-            
-        except ValueError:
-            pass
+    if panel.tikMAC == '': #get MAC
+        interfaces = routeroscommands.getInterfaces(getTransport(panel, panel.initPassword), {'default-name': 'ether1'}, panel.ip, panel.initPassword)
+        if len(interfaces) > 0:
+            panel.tikMAC = interfaces[0].get('mac-address', '')
     Publisher.sendMessage('status', ssid = panel.ssid, message = 'Mikrotik MAC stored')
     
     #gets SN
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.initPassword)  
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system routerboard print', panel.ip, panel.initPassword)
-    time.sleep(1)
-    ssh.close()
-    for line in stdout:
-        line = line.strip()
-        try:
-            line.index('serial-number')
-            if (panel.tikSN == ''):
-                panel.tikSN = line[15:len(line)]
-        except ValueError:
-            pass
+    if panel.tikSN == '':
+        panel.tikSN = routeroscommands.getRouterboard(getTransport(panel, panel.initPassword), panel.ip, panel.initPassword).get('serial-number', '')
     Publisher.sendMessage('status', ssid = panel.ssid, message = 'Mikrotik SN stored')
+    artifacts = siteartifacts.getSiteArtifacts(panel.siteDir)
+    manifest = [] # Every file is uploaded over one FTP login
     if panel.optionsList['Downgrade'] is True:
-        fileList = os.listdir(panel.siteDir)
-        routerosFileName = None
-        for item in fileList:
-            if 'routeros' in item.lower() and '.npk' in item.lower():
-                routerosFileName = item
-                break
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\' + routerosFileName, panel.ssid) #downgrade package
+        manifest += artifacts.manifest([artifacts.routerosFileName()], '/') #downgrade package
     if panel.optionsList['Autoscript'] is True:
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, dir_path + '\\Autoscript\\' + panel.ssid + '.rsc', panel.ssid, path = '/flash/') #MTAutoscript file
-        if panel.newCerts is True:
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\gd_bundle-g2-g1.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\certificate-request_key.pem', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\be258587ac15fd8a.crt', panel.ssid, path = '/flash/') #certificate file
-        elif panel.newCerts is None:
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\server.cer', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\server.key', panel.ssid, path = '/flash/') #certificate file
-        else:
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\AddTrustExternalCARoot.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\certificate-request_key.pem', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\COMODORSAAddTrustCA.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\COMODORSADomainValidationSecureServerCA.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot_addmydevice_com.crt', panel.ssid, path = '/flash/') #certificate file
+        manifest.append([panel.ssid + '.rsc', '/flash/', panel.autoscript]) #MTAutoscript file
+        manifest += artifacts.manifest(certificateFiles(panel.newCerts), '/flash/') #certificate files
+    sshftpconnection.ftpSendFiles(panel.ip, panel.initPassword, manifest, panel.ssid, priority = panel.progStatus)
     if panel.optionsList['Autoscript'] is True or panel.optionsList['Downgrade'] is True:
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Files Uploaded')
     
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.initPassword)            
     #executes reset commands based on options selected
     if panel.optionsList['Autoscript'] is True and panel.optionsList['Downgrade'] is True:
         panel.initPassword = ''
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, ':system package downgrade', panel.ip, panel.initPassword)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, ':system reset-configuration keep-users=no no-defaults=yes skip-backup=no run-after-reset=flash/' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
+        getConnection(panel).sendCommand(':system package downgrade', panel.ip, panel.initPassword)
+        getConnection(panel).sendCommand(':system reset-configuration keep-users=no no-defaults=yes skip-backup=no run-after-reset=flash/' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
     elif panel.optionsList['Autoscript'] is False and panel.optionsList['Downgrade'] is True:
         if panel.optionsList['Routerboard'] is True:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system routerboard upgrade', panel.ip, panel.initPassword)
+            getConnection(panel).sendCommand('system routerboard upgrade', panel.ip, panel.initPassword)
             
         if panel.optionsList['Packages'] is True:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable mpls,ppp,wireless', panel.ip, panel.initPassword)
+            getConnection(panel).sendCommand('system package disable mpls,ppp,wireless', panel.ip, panel.initPassword)
             
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package downgrade', panel.ip, panel.initPassword)
+        getConnection(panel).sendCommand('system package downgrade', panel.ip, panel.initPassword)
         panel.progStatus = 2
     elif panel.optionsList['Autoscript'] is True and panel.optionsList['Downgrade'] is False:
         panel.initPassword = ''
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, ':system reset-configuration keep-users=no no-defaults=yes skip-backup=no run-after-reset=flash/' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
+        getConnection(panel).sendCommand(':system reset-configuration keep-users=no no-defaults=yes skip-backup=no run-after-reset=flash/' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
     elif panel.optionsList['Autoscript'] is False and panel.optionsList['Downgrade'] is False:
         if panel.optionsList['Routerboard'] is True:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system routerboard upgrade', panel.ip, panel.initPassword)
+            getConnection(panel).sendCommand('system routerboard upgrade', panel.ip, panel.initPassword)
             panel.progStatus = 2
         else:
             panel.progStatus = 3
         if panel.optionsList['Packages'] is True:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable mpls,ppp,wireless', panel.ip, panel.initPassword)
+            getConnection(panel).sendCommand('system package disable mpls,ppp,wireless', panel.ip, panel.initPassword)
         if panel.progStatus == 2:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system reboot', panel.ip, panel.initPassword)
-            
-    time.sleep(1)
-    ssh.close()
+            getConnection(panel).sendCommand('system reboot', panel.ip, panel.initPassword)
+
+    closeConnections(panel) # Panel is resetting, the next command reconnects once it's back up
     if panel.progStatus == 2 or panel.progStatus == 1:
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Panel Resetting')
 
     return panel
 
 def progPanel2(panel): #uploads login file, sets password, gets wattbox MAC, gets AP MAC fix ip and pass
-    dir_path = os.path.dirname(os.path.realpath(__file__))
     if panel.optionsList['Autoscript'] is False:
         try:
             sshftpconnection.ftpDeleteFile(panel.ip, panel.initPassword, 'MTAutoscript.rsc', panel.ssid, path='/flash')
         except ftplib.error_perm:
             pass
         
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.initPassword)
     
     if panel.optionsList['2Stage'] is True:
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, dir_path + '\\Dynu\\' + panel.ssid + '.rsc', panel.ssid)
+        sshftpconnection.ftpSendFiles(panel.ip, panel.initPassword, [[panel.ssid + '.rsc', '/', panel.dynuScript]], panel.ssid)
         time.sleep(.5)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'import ' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
+        getConnection(panel).sendCommand('import ' + panel.ssid + '.rsc', panel.ip, panel.initPassword)
         
     loginDate = datetime.date.today()
     if loginDate.month == 1:
@@ -169,23 +184,9 @@ def progPanel2(panel): #uploads login file, sets password, gets wattbox MAC, get
     setDate += '/'
     setDate += str(loginDate.year)
     
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system clock set date=' + setDate, panel.ip, panel.initPassword) #sets date to ensure files are up to date
-    if panel.newCerts is not None and panel.optionsList['Login'] is True:
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\login.html', panel.ssid, path = '/flash/hotspot/') #sends login file
-    elif panel.newCerts is None and panel.optionsList['Login'] is True:
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\login.html', panel.ssid, path = '/flash/hotspot/')
-
-    if panel.newCerts is None:    
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\alogin.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\error.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\flogin.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\logout.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\md5.js', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\redirect.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\rlogin.html', panel.ssid, path = '/flash/hotspot/')
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\status.html', panel.ssid, path = '/flash/hotspot/')
-
-        sshftpconnection.ftpSendFile(panel.ip, panel.initPassword, panel.siteDir + '\\hotspot\\img\\logobottom.png', panel.ssid, path = '/flash/hotspot/img/')
+    getConnection(panel).sendCommand('system clock set date=' + setDate, panel.ip, panel.initPassword) #sets date to ensure files are up to date
+    manifest = hotspotManifest(panel, siteartifacts.getSiteArtifacts(panel.siteDir))
+    sshftpconnection.ftpSendFiles(panel.ip, panel.initPassword, manifest, panel.ssid, sync = True) # Hotspot files already on the panel aren't sent again
         
     if panel.optionsList['Login'] is True and panel.newCerts is not None:
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Login file uploaded')
@@ -193,40 +194,29 @@ def progPanel2(panel): #uploads login file, sets password, gets wattbox MAC, get
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Hotspot files uploaded')
         
     if panel.optionsList['Login'] is False: # delete login file
-         ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'file remove flash/hotspot/login.html', panel.ip, panel.initPassword)
+         getConnection(panel).sendCommand('file remove flash/hotspot/login.html', panel.ip, panel.initPassword)
          Publisher.sendMessage('status', ssid = panel.ssid, message = 'Login file deleted')
-
-    time.sleep(1)
-    ssh.close()
     
     if panel.optionsList['Autoscript'] is True:
         sshftpconnection.ftpDeleteFile(panel.ip, panel.initPassword, panel.ssid + '.rsc', panel.ssid, path = '/flash/')
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'MTAutoscript deleted')
     
     #gets AP MAC
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.initPassword)
     if panel.optionsList['AP'] is True:
         doOnce = False
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Searching for AP MAC...')
         numCount = 0
+        arpPoll = readiness.poller(.2, .5)
         while panel.apMAC.strip() == '':
             if numCount > 4 and doOnce is False:
-                ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'interface set ether5 name=ether5-trunk-AP', panel.ip, panel.initPassword)
+                getConnection(panel).sendCommand('interface set ether5 name=ether5-trunk-AP', panel.ip, panel.initPassword)
                 doOnce = True
             
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip arp print where interface=ether5-trunk-AP', panel.ip, panel.initPassword)
-            index = ''
-            for line in stdout:
-                line = line.strip()
-                if index == '':
-                    try:
-                        index = line.index('MAC-ADDRESS')
-                    except ValueError:
-                        pass
-                elif panel.apMAC.strip() == '':
-                    panel.apMAC = line[index:index+17]
-
-            time.sleep(.5)
+            arpEntries = routeroscommands.getARP(getTransport(panel, panel.initPassword), 'ether5-trunk-AP', panel.ip, panel.initPassword)
+            if len(arpEntries) > 0:
+                panel.apMAC = arpEntries[0]['mac-address']
+            else:
+                arpPoll.wait()
             numCount += 1
             
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'AP MAC stored')
@@ -236,222 +226,63 @@ def progPanel2(panel): #uploads login file, sets password, gets wattbox MAC, get
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Searching for Wattbox MAC...')
         numCount = 0
         doOnce = False
+        arpPoll = readiness.poller(.2, 1)
         while panel.wattMAC.strip() == '':
             if numCount > 4 and doOnce is False:
-                ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'interface set ether2-master name=ether2-wattBox', panel.ip, panel.initPassword)
+                getConnection(panel).sendCommand('interface set ether2-master name=ether2-wattBox', panel.ip, panel.initPassword)
                 doOnce = True
                 
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip arp print where interface=ether2-wattBox', panel.ip, panel.initPassword)
-            index = ''
-            for line in stdout:
-                line = line.strip()
-                if index == '':
-                    try:
-                        index = line.index('MAC-ADDRESS')
-                    except ValueError:
-                        pass
-                elif panel.wattMAC.strip() == '':
-                    panel.wattMAC = line[index:index+17]
-                    
-            time.sleep(1)
+            arpEntries = routeroscommands.getARP(getTransport(panel, panel.initPassword), 'ether2-wattBox', panel.ip, panel.initPassword)
+            if len(arpEntries) > 0:
+                panel.wattMAC = arpEntries[0]['mac-address']
+            else:
+                arpPoll.wait()
             numCount += 1
             
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Wattbox MAC stored')
     
     #sets password
     if panel.optionsList['Password'] is True:
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'user set admin password=' + panel.sitePassword, panel.ip, panel.initPassword)
+        routeroscommands.runCommand(getTransport(panel, panel.initPassword), '/user/set', {'numbers': 'admin', 'password': panel.sitePassword}, panel.ip, panel.initPassword)
         Publisher.sendMessage('status', ssid = panel.ssid, message = 'Mikrotik password set')
     else:
         panel.sitePassword = panel.initPassword
-    time.sleep(1)
-    ssh.close()
     
     return panel
 
-def qcPanel(panel): # Need to check the packages for routeros version
+def qcPanel(panel): # Reads the panel once, compares it to the site's golden spec and applies the fixes, see qcengine
     Publisher.sendMessage('status', ssid = panel.ssid, message = 'QCing Mikrotik:', group = 4)
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    ssh = sshftpconnection.connectSSH(panel.ip, panel.sitePassword)
 
-    # Checks ddns hostname
-    if panel.optionsList['Dynu'] is True:
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system script print without-paging from=Dynu', panel.ip, panel.sitePassword)
-        ddnsThere = False
-        for line in stdout:
-            line = line.strip()
-            if '\"' + panel.ddnsHostname + '\"' in line:
-                ddnsThere = True
-                break
-    
-        if ddnsThere is False:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tFixing DDNS Hostname', group = 4)
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, dir_path + '\\Dynu\\' + panel.ssid + '.rsc', panel.ssid) # DDNS hostname has not been written
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'import ' + panel.ssid + '.rsc', panel.ip, panel.sitePassword)
-            time.sleep(1)
-
-    # Checks for script files
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'file print without-paging where type=\"script\"', panel.ip, panel.sitePassword)
-    indexNumber = None
-    numbers = ''
-    for line in stdout:
-        line = line.strip()
-        if numbers != '':
-            numbers = numbers + ','
-        if indexNumber is not None:
-            numbers = numbers + line[indexNumber:indexNumber+1]
-        try:
-            indexNumber = line.index('#')
-        except ValueError:
-            pass
+    artifacts = siteartifacts.getSiteArtifacts(panel.siteDir)
+    if panel.newCerts is None:
+        certificateManifest = []
+    else:
+        certificateManifest = artifacts.manifest(certificateFiles(panel.newCerts), '/flash/')
+    spec = qcengine.goldenSpec(panel.optionsList, panel.newCerts, panel.ddnsHostname, panel.dynuScript, certificateManifest, hotspotManifest(panel, artifacts))
+    plan = qcengine.getPlan(spec, qcengine.getInventory(getConnection(panel), panel.ip, panel.sitePassword))
 
-    if numbers != '':
-        Publisher.sendMessage('status', ssid = panel.ssid, message = '\tRemoving ' + str(numbers.count(',')) + ' script file(s)', group = 4)
-        numbers = numbers[0:len(numbers)-1]
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'file remove numbers=' + numbers, panel.ip, panel.sitePassword)
-        
-    # Checks number of files
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'file print count-only', panel.ip, panel.sitePassword)
-    for line in stdout:
-        line = line.strip()
-        if line.isdigit() is True:
-            fileNum = int(line)
-            break
-        
-    if panel.optionsList['Login'] is True and panel.newCerts is False:
-        if fileNum != 36:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tThere are an incorrect number of files (' + str(fileNum) + '), please check manually', group = 4)
-    elif panel.optionsList['Login'] is True and (panel.newCerts is True or panel.newCerts is None):
-        if fileNum != 34:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tThere are an incorrect number of files (' + str(fileNum) + '), please check manually', group = 4)
-    elif panel.optionsList['Login'] is False and panel.newCerts is False:
-        if fileNum != 35:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tThere are an incorrect number of files (' + str(fileNum) + '), please check manually', group = 4)
-    elif panel.optionsList['Login'] is False and panel.newCerts is True:
-        if fileNum != 33:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tThere are an incorrect number of files (' + str(fileNum) + '), please check manually', group = 4)
-    
-    # Checks certificates
-    certificateNum = None
-    while certificateNum is None:
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate print count-only', panel.ip, panel.sitePassword)
-        for line in stdout:
-            line = line.strip()
-            if line.isdigit() is True:
-                certificateNum = int(line)
-                break
-        
-    if certificateNum != 4: # Re-imports certificates if needed
-        Publisher.sendMessage('status', ssid = panel.ssid, message = '\tMissing certificates, Re-importing...', group = 4)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate print', panel.ip, panel.sitePassword)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate remove numbers=0', panel.ip, panel.sitePassword)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate remove numbers=1', panel.ip, panel.sitePassword)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate remove numbers=2', panel.ip, panel.sitePassword)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate remove numbers=3', panel.ip, panel.sitePassword)
-        if panel.newCerts is True:
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\be258587ac15fd8a.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\certificate-request_key.pem', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\gd_bundle-g2-g1.crt', panel.ssid, path = '/flash/') #certificate file
+    for message in plan.messages:
+        Publisher.sendMessage('status', ssid = panel.ssid, message = message, group = 4)
+    if plan.isEmpty() is True:
+        print(panel.ssid + ': QC found nothing to fix')
 
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/be258587ac15fd8a.crt passphrase=\"\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/gd_bundle-g2-g1.crt passphrase=\"\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/certificate-request_key.pem passphrase=\"cvnlab\"', panel.ip, panel.sitePassword)
+    # Uploads, then every fix in one batch
+    for manifest, sync in plan.uploads:
+        sshftpconnection.ftpSendFiles(panel.ip, panel.sitePassword, manifest, panel.ssid, sync = sync)
+    if plan.routerosUpload is True:
+        sshftpconnection.ftpSendFiles(panel.ip, panel.sitePassword, artifacts.manifest([artifacts.routerosFileName()], '/'), panel.ssid, priority = panel.progStatus)
+    reportBatch(panel, routeroscommands.runBatch(getConnection(panel), plan.commands, panel.ip, panel.sitePassword))
 
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip service set www-ssl disabled=no certificate=be258587ac15fd8a.crt_0', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip service set api-ssl disabled=no certificate=be258587ac15fd8a.crt_0', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip hotspot profile set hsprof1 ssl-certificate=be258587ac15fd8a.crt_0', panel.ip, panel.sitePassword)
-        elif panel.newCerts is None:
-            Publisher.sendMessage('status', ssid = panel.ssid, message = '\tThere are an incorrect number of certificates, please reprogram the panel', group = 4)
-        else:
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\AddTrustExternalCARoot.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\certificate-request_key.pem', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\COMODORSAAddTrustCA.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\COMODORSADomainValidationSecureServerCA.crt', panel.ssid, path = '/flash/') #certificate file
-            sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\hotspot_addmydevice_com.crt', panel.ssid, path = '/flash/') #certificate file
-            
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/AddTrustExternalCARoot.crt passphrase=\"\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/COMODORSAAddTrustCA.crt passphrase=\"\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/COMODORSADomainValidationSecureServerCA.crt passphrase=\"\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/hotspot_addmydevice_com.crt passphrase=\"cvnlab\"', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'certificate import file-name=flash/certificate-request_key.pem passphrase=\"cvnlab\"', panel.ip, panel.sitePassword)
-            
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip service set www-ssl disabled=no certificate=hotspot_addmydevice_com', panel.ip, panel.sitePassword)
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'ip hotspot profile set hsprof1 ssl-certificate=hotspot_addmydevice_com.crt_0', panel.ip, panel.sitePassword)
-    
-    # Checks packages and routeros version
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package print without-paging', panel.ip, panel.sitePassword)
-    indexName = 0
-    indexVersion = 0
-    packagesDisabled = False
-    downgrade = False
-    for line in stdout:
-        line = line.strip()
-        
-        if indexName != 0 and indexVersion != 0:
-            if line[indexName:indexVersion].strip() == 'routeros-mmips':
-                if '6.40.9' not in line and '6.43.14' not in line: # RouterOS Version is out of date if this is executed
-                    Publisher.sendMessage('status', ssid = panel.ssid, message = '\tRouterOS Version out of date, Updating...', group = 4)
-                    fileList = os.listdir(panel.siteDir)
-                    routerosFileName = None
-                    for item in fileList:
-                        if 'routeros' in item.lower() and '.npk' in item.lower():
-                            routerosFileName = item
-                            break
-                    sshftpconnection.ftpSendFile(panel.ip, panel.sitePassword, panel.siteDir + '\\' + routerosFileName, panel.ssid)
-                    downgrade = True
-            elif line[indexName:indexVersion].strip() == 'ipv6':
-                if line[indexName-2:indexName-1] == ' ':
-                    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable ipv6', panel.ip, panel.sitePassword)
-                    packagesDisabled = True
-                    print('ipv6 disabled')
-            elif line[indexName:indexVersion].strip() == 'wireless':
-                if line[indexName-2:indexName-1] == ' ':
-                    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable wireless', panel.ip, panel.sitePassword)
-                    packagesDisabled = True
-                    print('wireless disabled')
-            elif line[indexName:indexVersion].strip() == 'mpls':
-                if line[indexName-2:indexName-1] == ' ':
-                    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable mpls', panel.ip, panel.sitePassword)
-                    packagesDisabled = True
-                    print('mpls disabled')
-            elif line[indexName:indexVersion].strip() == 'ppp':
-                if line[indexName-2:indexName-1] == ' ':
-                    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package disable ppp', panel.ip, panel.sitePassword)
-                    packagesDisabled = True
-                    print('ppp disabled')
-                    
-        try:
-            indexName = line.index('NAME')
-            indexVersion = line.index('VERSION') - 1
-        except ValueError:
-            pass
-        
-                  
-    # Checks routerboard
-    ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system routerboard print without-paging', panel.ip, panel.sitePassword)
-    index = 0
-    currentFirmware = False
-    for line in stdout:
-        line = line.strip()
-        if 'current-firmware: 3.41' in line or 'current-firmware: 6.43.14' in line:
-            currentFirmware = True
-            break
-        
     # Commands for resets and such
-    if packagesDisabled is True:
-        Publisher.sendMessage('status', ssid = panel.ssid, message = '\tDisabling some system packages...', group = 4)
-        
-    if currentFirmware is False:
-        Publisher.sendMessage('status', ssid = panel.ssid, message = '\tSystem firware out of date, Updating...', group = 4)
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system routerboard upgrade', panel.ip, panel.sitePassword) # firmware is out of date
-
-    if downgrade is True:
-        ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system package downgrade', panel.ip, panel.sitePassword)
+    if plan.firmwareUpgrade is True:
+        getConnection(panel).sendCommand('system routerboard upgrade', panel.ip, panel.sitePassword) # firmware is out of date
 
-    if currentFirmware is False or packagesDisabled is True:
-        if downgrade is not True:
-            ssh, stdout = sshftpconnection.sshSendCommand(ssh, 'system reboot', panel.ip, panel.sitePassword)
+    if plan.downgrade is True:
+        getConnection(panel).sendCommand('system package downgrade', panel.ip, panel.sitePassword)
+    elif plan.reboot is True:
+        getConnection(panel).sendCommand('system reboot', panel.ip, panel.sitePassword)
 
-    ssh.close()
+    if plan.downgrade is True or plan.reboot is True: # Panel is rebooting
+        closeConnections(panel)
 
     Publisher.sendMessage('status', ssid = panel.ssid, message = '\tQC Done', group = 4)
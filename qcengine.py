@@ -0,0 +1,185 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import routeroscommands
+
+# QC compares what is on a panel against a golden spec for its site and returns the fixes needed as one plan
+# The panel is read once (getInventory), the plan is applied by programpanel.qcPanel as uploads and a single batch
+# The site files the panel should have and the certificates to import come from the same site artifact manifests
+# programming uploads. RouterOS's own files aren't in the site files, so the total file count is still checked against FILECOUNTS
+ROUTEROSVERSIONS = ('6.40.9', '6.43.14') # Package versions left as they are
+FIRMWAREVERSIONS = ('3.41', '6.43.14') # Routerboard firmware left as it is
+DISABLEDPACKAGES = ('ipv6', 'wireless', 'mpls', 'ppp')
+CERTIFICATECOUNT = 4
+FILECOUNTS = {(True, False): 36, (True, True): 34, (True, None): 34, (False, False): 35, (False, True): 33} # (Login, newCerts): files on a programmed panel
+KEYFILES = ('.pem', '.key') # Imported after the certificates so RouterOS pairs them
+CERTIFICATEPASSPHRASES = {'certificate-request_key.pem': 'cvnlab', 'hotspot_addmydevice_com.crt': 'cvnlab'}
+
+# Certificate settings for the site's certificates, the names are the ones RouterOS gives the imported files
+CERTIFICATESETTINGS = {
+    True: (('/ip/service/set', {'numbers': 'www-ssl', 'disabled': 'no', 'certificate': 'be258587ac15fd8a.crt_0'}),
+           ('/ip/service/set', {'numbers': 'api-ssl', 'disabled': 'no', 'certificate': 'be258587ac15fd8a.crt_0'}),
+           ('/ip/hotspot/profile/set', {'numbers': 'hsprof1', 'ssl-certificate': 'be258587ac15fd8a.crt_0'})),
+    False: (('/ip/service/set', {'numbers': 'www-ssl', 'disabled': 'no', 'certificate': 'hotspot_addmydevice_com'}),
+            ('/ip/hotspot/profile/set', {'numbers': 'hsprof1', 'ssl-certificate': 'hotspot_addmydevice_com.crt_0'}))}
+
+# Sections read by getInventory, all in one batch
+INVENTORY = (('export', '/export terse'),
+             ('files', '/file print terse'),
+             ('certificates', '/certificate print terse'),
+             ('packages', '/system package print terse'),
+             ('routerboard', '/system routerboard print'))
+
+class goldenSpec():
+    def __init__(self, optionsList, newCerts, ddnsHostname, dynuScript, certificateManifest, hotspotManifest):
+        self.newCerts = newCerts
+        if optionsList['Dynu'] is True:
+            self.ddnsHostname = ddnsHostname
+        else:
+            self.ddnsHostname = None
+        self.dynuScript = dynuScript # Rendered from the site's dynu template, uploaded if the hostname is wrong
+        self.certificateManifest = certificateManifest # Site certificate files, uploaded if the certificates are re-imported
+        self.hotspotManifest = hotspotManifest # Site hotspot files, uploaded if any are missing
+        self.fileCount = FILECOUNTS.get((optionsList['Login'], newCerts))
+
+        # [file name, passphrase] imported from /flash, certificates first then keys
+        self.certificateImports = []
+        for keys in (False, True):
+            for entry in certificateManifest:
+                fileName = getFileName(entry[0])
+                if fileName.lower().endswith(KEYFILES) is keys:
+                    self.certificateImports.append([fileName, CERTIFICATEPASSPHRASES.get(fileName, '')])
+
+    def getMissingFiles(self, fileNames): # Hotspot manifest entries not in the panel's file names
+        return [entry for entry in self.hotspotManifest if getPanelPath(entry) not in fileNames]
+
+class remediationPlan():
+    def __init__(self):
+        self.messages = [] # Shown in the panel status
+        self.uploads = [] # [manifest, sync] for sshftpconnection.ftpSendFiles, sent before the batch
+        self.commands = [] # Console commands for routeroscommands.runBatch
+        self.routerosUpload = False # RouterOS package needs uploading, it's scheduled with the panel's priority
+        self.firmwareUpgrade = False
+        self.downgrade = False
+        self.reboot = False
+
+    def isEmpty(self):
+        return len(self.uploads) == 0 and len(self.commands) == 0 and self.routerosUpload is False and self.firmwareUpgrade is False and self.reboot is False
+
+# Reads everything QC needs from the panel in one ssh exec, returns {section: lines} or None for a section that failed
+def getInventory(connection, hostname = None, password = None):
+    results = routeroscommands.runBatch(connection, [command for section, command in INVENTORY], hostname, password)
+    inventory = {}
+    x = 0
+    while x < len(INVENTORY):
+        if x < len(results) and results[x][2] is False:
+            inventory[INVENTORY[x][0]] = results[x][1]
+        else:
+            inventory[INVENTORY[x][0]] = None
+        x += 1
+    return inventory
+
+def getFileName(fileName): # File name from a windows or posix path
+    return fileName.replace('\\', '/').split('/')[-1]
+
+def getPanelPath(entry): # Name the panel's file list gives a manifest entry, e.g. flash/hotspot/login.html
+    return entry[1].strip('/') + '/' + getFileName(entry[0])
+
+def getPlan(spec, inventory):
+    plan = remediationPlan()
+    if inventory['export'] is None:
+        plan.messages.append('\tCould not read the configuration, please check manually')
+        export = []
+    else:
+        export = routeroscommands.parseExport(inventory['export'])
+
+    # DDNS hostname in the Dynu script, the script source is checked on the export line as it's quoted and escaped
+    dynuImport = False
+    if spec.ddnsHostname is not None and inventory['export'] is not None:
+        ddnsThere = False
+        for line in inventory['export']:
+            if line.startswith('/system script add') and 'name=Dynu ' in line and '\\"' + spec.ddnsHostname + '\\"' in line:
+                ddnsThere = True
+                break
+        if ddnsThere is False:
+            plan.messages.append('\tFixing DDNS Hostname')
+            plan.uploads.append([[['dynu.rsc', '/', spec.dynuScript]], False])
+            plan.commands.append(routeroscommands.consoleCommand('/import', {'file-name': 'dynu.rsc'}))
+            dynuImport = True
+
+    # Script files, removed after the dynu import so its file goes too
+    if inventory['files'] is None:
+        plan.messages.append('\tCould not read the files, please check manually')
+    else:
+        files = routeroscommands.parseRows(inventory['files'])
+        missingFiles = spec.getMissingFiles([row.get('name') for row in files])
+        if len(missingFiles) > 0:
+            plan.messages.append('\tUploading ' + str(len(missingFiles)) + ' missing hotspot file(s)')
+            plan.uploads.append([missingFiles, True])
+        scriptFiles = [row for row in files if row.get('type') == 'script']
+        if len(scriptFiles) > 0 or dynuImport is True:
+            if len(scriptFiles) > 0:
+                plan.messages.append('\tRemoving ' + str(len(scriptFiles)) + ' script file(s)')
+            plan.commands.append('/file remove [find type="script"]')
+        fileNum = len(files) - len(scriptFiles) + len(missingFiles)
+        if spec.fileCount is not None and fileNum != spec.fileCount:
+            plan.messages.append('\tThere are an incorrect number of files (' + str(fileNum) + '), please check manually')
+
+    # Certificates
+    if inventory['certificates'] is None:
+        plan.messages.append('\tCould not read the certificates, please check manually')
+    elif len(routeroscommands.parseRows(inventory['certificates'])) != CERTIFICATECOUNT:
+        plan.messages.append('\tMissing certificates, Re-importing...')
+        plan.commands.append('/certificate remove [find]')
+        if spec.newCerts is None:
+            plan.messages.append('\tThere are an incorrect number of certificates, please reprogram the panel')
+        else:
+            plan.uploads.append([spec.certificateManifest, True])
+            for fileName, passphrase in spec.certificateImports:
+                plan.commands.append(routeroscommands.consoleCommand('/certificate/import', {'file-name': 'flash/' + fileName, 'passphrase': passphrase}))
+            for path, words in CERTIFICATESETTINGS[spec.newCerts]:
+                plan.commands.append(routeroscommands.consoleCommand(path, words))
+    elif spec.newCerts is not None and inventory['export'] is not None: # Certificates are there, checks the services use them
+        settingsFixed = False
+        for path, words in CERTIFICATESETTINGS[spec.newCerts]:
+            for row in export:
+                if row['.path'] == routeroscommands.consoleCommand(path[:-len('/set')]) and words['numbers'] in (row['.item'], row.get('name')):
+                    for key in words:
+                        if key != 'numbers' and row.get(key, words[key]) != words[key]:
+                            plan.commands.append(routeroscommands.consoleCommand(path, words))
+                            settingsFixed = True
+                            break
+                    break
+        if settingsFixed is True:
+            plan.messages.append('\tFixing certificate settings')
+
+    # Packages and routeros version
+    if inventory['packages'] is None:
+        plan.messages.append('\tCould not read the packages, please check manually')
+    else:
+        packages = {}
+        for row in routeroscommands.parseRows(inventory['packages']):
+            packages[row.get('name')] = row
+        if 'routeros-mmips' in packages and packages['routeros-mmips'].get('version', '') not in ROUTEROSVERSIONS:
+            plan.messages.append('\tRouterOS Version out of date, Updating...')
+            plan.routerosUpload = True
+            plan.downgrade = True
+        disabled = False
+        for packageName in DISABLEDPACKAGES:
+            if packageName in packages and 'X' not in packages[packageName]['.flags']: # Package is enabled
+                plan.commands.append(routeroscommands.consoleCommand('/system/package/disable', {'numbers': packageName}))
+                disabled = True
+        if disabled is True:
+            plan.messages.append('\tDisabling some system packages...')
+            plan.reboot = True
+
+    # Routerboard firmware
+    if inventory['routerboard'] is None:
+        plan.messages.append('\tCould not read the routerboard, please check manually')
+    elif routeroscommands.parseValues(inventory['routerboard']).get('current-firmware') not in FIRMWAREVERSIONS:
+        plan.messages.append('\tSystem firware out of date, Updating...')
+        plan.firmwareUpgrade = True
+        plan.reboot = True
+
+    if plan.downgrade is True: # Downgrade reboots the panel itself
+        plan.reboot = False
+    return plan
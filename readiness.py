@@ -0,0 +1,72 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import threading
+import time
+import panelquery
+
+# Waits for a device to be ready by checking for a concrete signal (a port accepting, an arp entry, the controller
+# seeing the AP) instead of sleeping a fixed time. Checks start a short interval apart and back off while the
+# device isn't ready, so a stage moves on as soon as the device is up without hammering it during a long reboot
+MININTERVAL = .2 # Seconds between the first checks
+MAXINTERVAL = 2 # Longest wait between checks
+BACKOFF = 1.5 # Interval multiplier after each failed check
+CONNECTTIMEOUT = 1 # Seconds a port check waits for the connection
+READYTIMEOUT = 30 # Default seconds before a wait gives up
+STATUSTIMEOUT = 3 # Longest wait for a progStatus change before it's checked again
+
+class poller(): # Adaptive sleep for retry loops, wait() sleeps a little longer each time it's called
+    def __init__(self, minInterval = MININTERVAL, maxInterval = MAXINTERVAL):
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.interval = minInterval
+
+    def wait(self):
+        time.sleep(self.interval)
+        self.interval = min(self.interval * BACKOFF, self.maxInterval)
+
+    def reset(self): # Device responded, go back to checking quickly
+        self.interval = self.minInterval
+
+# Calls check until it returns something other than None or False and returns that, returns None after timeout seconds
+# timeout of None waits forever
+def waitFor(check, timeout = READYTIMEOUT, minInterval = MININTERVAL, maxInterval = MAXINTERVAL):
+    startTime = time.monotonic()
+    poll = poller(minInterval, maxInterval)
+    while True:
+        result = check()
+        if result is not None and result is not False:
+            return result
+        if timeout is not None and time.monotonic() - startTime + poll.interval > timeout:
+            return None
+        poll.wait()
+
+def portOpen(ip, port, timeout = CONNECTTIMEOUT):
+    return panelquery.probePort(ip, port, timeout) == port
+
+def waitForPort(ip, port, timeout = READYTIMEOUT): # True once the port accepts connections, False on timeout
+    return waitFor(lambda: portOpen(ip, port), timeout) is True
+
+def waitForPortClosed(ip, port, timeout = READYTIMEOUT): # True once the port stops accepting, e.g. a reboot has started
+    return waitFor(lambda: portOpen(ip, port) is False, timeout) is True
+
+# Returns the first arp entry once getEntries returns any, e.g. lambda: routeroscommands.getARP(connection, interface)
+def waitForARP(getEntries, timeout = READYTIMEOUT):
+    def check():
+        entries = getEntries()
+        if len(entries) > 0:
+            return entries[0]
+        return None
+    return waitFor(check, timeout)
+
+# Panel programming status changes, set by the main thread when a panel comes back from a reset
+# Threads waiting on a status are woken by notifyStatus instead of polling it
+statusCondition = threading.Condition()
+
+def notifyStatus():
+    with statusCondition:
+        statusCondition.notify_all()
+
+def waitForStatus(check, timeout = STATUSTIMEOUT): # Waits until check() is True or timeout seconds pass, returns check()
+    with statusCondition:
+        statusCondition.wait_for(check, timeout)
+    return check()
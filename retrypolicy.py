@@ -0,0 +1,92 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import random
+import time
+
+# Shared retry behaviour for the panel, FTP, API and controller connections
+# A policy caps how long a failing call is retried (attempts and/or a deadline in seconds) and spaces the retries out
+# with exponential backoff. Each delay is jittered so threads that failed together (a switch flap, a controller restart)
+# don't all retry at the same moment. Errors in retryOn are retried, errors in fatal and anything else are raised
+# straight away, and the last error is raised once the policy gives up so the caller's error handling sees it
+BASEDELAY = .5 # Seconds before the first retry
+MAXDELAY = 10 # Longest wait between retries
+JITTER = .5 # Fraction of each delay that is randomised, .5 waits between half and all of the delay
+
+class retryPolicy():
+    def __init__(self, retryOn, maxAttempts = None, deadline = None, baseDelay = BASEDELAY, maxDelay = MAXDELAY, jitter = JITTER, fatal = (), classify = None, onRetry = None, onGiveUp = None):
+        self.retryOn = retryOn
+        self.maxAttempts = maxAttempts # Retries allowed, None for no limit
+        self.deadline = deadline # Seconds from the first attempt, None for no limit
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.jitter = jitter
+        self.fatal = fatal
+        self.classify = classify # classify(error) returns False for a retryOn error that shouldn't be retried
+        self.onRetry = onRetry # onRetry(error, attempt, delay) is called before each wait, e.g. for a status message
+        self.onGiveUp = onGiveUp # onGiveUp(error, attempt) is called before the error is raised
+
+    def isRetryable(self, error):
+        if isinstance(error, self.fatal) or isinstance(error, self.retryOn) is False:
+            return False
+        if self.classify is not None:
+            return self.classify(error) is not False
+        return True
+
+    def getDelay(self, attempt):
+        delay = min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    # Returns a retryState for a loop that handles its own errors, the hooks can be replaced for this call
+    def start(self, onRetry = None, onGiveUp = None):
+        return retryState(self, onRetry or self.onRetry, onGiveUp or self.onGiveUp)
+
+    def run(self, function, *args, **kwargs): # Calls function until it returns, see retryState.failed
+        state = self.start()
+        while True:
+            try:
+                return function(*args, **kwargs)
+            except self.retryOn as error:
+                state.failed(error)
+
+class retryState():
+    def __init__(self, policy, onRetry, onGiveUp):
+        self.policy = policy
+        self.onRetry = onRetry
+        self.onGiveUp = onGiveUp
+        self.attempt = 0
+        self.startTime = time.monotonic()
+
+    # Called from an except block, waits before the next attempt or raises error if it can't be retried
+    def failed(self, error):
+        time.sleep(self.nextDelay(error))
+
+    # Same as failed but returns the delay instead of sleeping, for callers that wait themselves (asyncio.sleep)
+    def nextDelay(self, error):
+        self.attempt += 1
+        if self.policy.isRetryable(error) is False:
+            raise error
+        delay = self.policy.getDelay(self.attempt)
+        outOfAttempts = self.policy.maxAttempts is not None and self.attempt > self.policy.maxAttempts
+        pastDeadline = self.policy.deadline is not None and time.monotonic() + delay - self.startTime > self.policy.deadline
+        if outOfAttempts or pastDeadline:
+            if self.onGiveUp is not None:
+                self.onGiveUp(error, self.attempt)
+            raise error
+        if self.onRetry is not None:
+            self.onRetry(error, self.attempt, delay)
+        return delay
+
+    def succeeded(self): # Progress was made (e.g. a file was sent), the attempts and deadline start over
+        self.attempt = 0
+        self.startTime = time.monotonic()
+
+def printRetry(name): # onRetry hook that prints the first failure of a call
+    def onRetry(error, attempt, delay):
+        if attempt == 1:
+            print(name + ' failed, retrying: ' + str(error))
+    return onRetry
+
+def printGiveUp(name): # onGiveUp hook
+    def onGiveUp(error, attempt):
+        print(name + ' failed after ' + str(attempt) + ' attempt(s): ' + str(error))
+    return onGiveUp
@@ -0,0 +1,184 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import re
+import mikrotikAPI
+
+# Structured RouterOS commands over a panel connection, either ssh (sshftpconnection.panelConnection) or the API (mikrotikAPI.apiConnection)
+# Over ssh tables are printed with 'print terse', one row per line as key=value pairs, and returned as lists of dicts
+# Every row also has '.index', the print number, and '.flags', e.g. 'X' for disabled or 'D' for dynamic
+# where is {key: value}, over ssh it's passed to RouterOS so only the needed rows are printed
+# hostname and password are passed to the connection so it can reconnect, see panelConnection.streamCommand
+pairPattern = re.compile(r'(?:^|\s)([a-z][\w.-]*)=')
+
+def parseTerse(line): # Returns a dict for a terse line or None if the line has no values
+    matches = list(pairPattern.finditer(line))
+    if len(matches) == 0:
+        return None
+    row = {'.index': None, '.flags': ''}
+    head = line[:matches[0].start()].split()
+    if len(head) > 0 and head[0].isdigit():
+        row['.index'] = int(head[0])
+        head = head[1:]
+    row['.flags'] = ''.join(head)
+
+    x = 0
+    while x < len(matches):
+        if x + 1 < len(matches):
+            value = line[matches[x].end():matches[x + 1].start()]
+        else:
+            value = line[matches[x].end():]
+        value = value.strip()
+        if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+            value = value[1:-1]
+        row[matches[x].group(1)] = value
+        x += 1
+    return row
+
+def quoteValue(value): # Console string, \ " and $ are escaped
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('$', '\\$') + '"'
+
+def getWhere(where):
+    return ' where ' + ' and '.join(key + '=' + quoteValue(where[key]) for key in where)
+
+def printTerse(connection, path, where = None, hostname = None, password = None): # path is the menu, e.g. '/ip arp'
+    if isinstance(connection, mikrotikAPI.apiConnection):
+        return connection.printRows(path, where, hostname, password)
+    command = path + ' print terse'
+    if where is not None:
+        command += getWhere(where)
+    return parseRows(connection.streamCommand(command, hostname, password))
+
+def parseRows(lines): # Rows for the lines of a 'print terse'
+    rows = []
+    for line in lines:
+        row = parseTerse(line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+def printCount(connection, path, where = None, hostname = None, password = None): # Returns the number of rows or None if the output wasn't a number
+    if isinstance(connection, mikrotikAPI.apiConnection):
+        return len(connection.printRows(path, where, hostname, password))
+    command = path + ' print count-only'
+    if where is not None:
+        command += getWhere(where)
+    for line in connection.streamCommand(command, hostname, password):
+        if line.strip().isdigit() is True:
+            return int(line.strip())
+    return None
+
+def printValues(connection, path, hostname = None, password = None): # Menus that print 'key: value' lines instead of a table
+    if isinstance(connection, mikrotikAPI.apiConnection):
+        rows = connection.printRows(path, None, hostname, password)
+        if len(rows) == 0:
+            return {}
+        return rows[0]
+    return parseValues(connection.streamCommand(path + ' print', hostname, password))
+
+def parseValues(lines):
+    values = {}
+    for line in lines:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            values[key.strip()] = value.strip()
+    return values
+
+# Rows for the lines of an '/export terse', one command per line e.g. '/ip service set www-ssl certificate=none'
+# Every row has '.path' ('/ip service'), '.action' ('add' or 'set') and '.item' ('www-ssl', or '' if there isn't one)
+EXPORTACTIONS = ('add', 'set')
+
+def parseExport(lines):
+    rows = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('/') is False:
+            continue
+        match = pairPattern.search(line)
+        if match is None:
+            head = line.split()
+            row = {}
+        else:
+            head = line[:match.start()].split()
+            row = parseTerse(line[match.start():])
+            del row['.index'], row['.flags']
+        for x in range(len(head)):
+            if head[x] in EXPORTACTIONS:
+                row['.path'] = ' '.join(head[:x])
+                row['.action'] = head[x]
+                row['.item'] = ' '.join(head[x + 1:])
+                rows.append(row)
+                break
+    return rows
+
+def getInterfaces(connection, where = None, hostname = None, password = None):
+    return printTerse(connection, '/interface ethernet', where, hostname, password)
+
+def getARP(connection, interface, hostname = None, password = None): # Entries with a MAC address on an interface
+    rows = printTerse(connection, '/ip arp', {'interface': interface}, hostname, password)
+    return [row for row in rows if row.get('mac-address', '') != '']
+
+def getFiles(connection, where = None, hostname = None, password = None):
+    return printTerse(connection, '/file', where, hostname, password)
+
+def getCertificates(connection, where = None, hostname = None, password = None):
+    return printTerse(connection, '/certificate', where, hostname, password)
+
+def getPackages(connection, hostname = None, password = None): # Returns {name: row}
+    packages = {}
+    for row in printTerse(connection, '/system package', None, hostname, password):
+        packages[row.get('name')] = row
+    return packages
+
+def getRouterboard(connection, hostname = None, password = None): # serial-number, current-firmware, upgrade-firmware and so on
+    return printValues(connection, '/system routerboard', hostname, password)
+
+# Runs a command with its arguments, e.g. runCommand(connection, '/user/set', {'numbers': 'admin', 'password': password})
+# Over the API the arguments are sent as words, over ssh they're written as a console command
+def runCommand(connection, path, words = None, hostname = None, password = None):
+    if words is None:
+        words = {}
+    if isinstance(connection, mikrotikAPI.apiConnection):
+        return connection.run(path, words, hostname, password)
+    return connection.sendCommand(consoleCommand(path, words), hostname, password)
+
+def consoleCommand(path, words = None): # Console form of a command, consoleCommand('/user/set', {'numbers': 'admin'}) is '/user set numbers="admin"'
+    command = '/' + path.strip('/').replace('/', ' ')
+    if words is not None:
+        for key in words:
+            command += ' ' + key + '=' + quoteValue(words[key])
+    return command
+
+# Runs console commands in order as one script on a single ssh exec, returns [command, output lines, failed] for each
+# Each command is wrapped in :do/on-error so a failure is reported and the rest of the batch still runs
+# and a marker line is printed before each command so the output can be split back up
+# A command only counts as finished once the next marker (or the end marker after the last command) arrives,
+# if the connection drops partway through every command that didn't finish comes back failed
+BATCHMARKER = '#KAIACK'
+
+def runBatch(connection, commands, hostname = None, password = None):
+    if len(commands) == 0:
+        return []
+    script = []
+    x = 0
+    while x < len(commands):
+        script.append(':put "' + BATCHMARKER + ' ' + str(x) + '"')
+        script.append(':do { ' + commands[x] + ' } on-error={ :put "' + BATCHMARKER + 'ERROR ' + str(x) + '" }')
+        x += 1
+    script.append(':put "' + BATCHMARKER + ' END"')
+
+    results = [[command, [], True] for command in commands] # Failed until the command is seen to finish
+    errors = []
+    current = None
+    for line in connection.streamCommand('; '.join(script), hostname, password):
+        marker = line.strip()
+        if marker.startswith(BATCHMARKER + 'ERROR '):
+            errors.append(int(marker.split()[1]))
+        elif marker.startswith(BATCHMARKER + ' '):
+            if current is not None: # Previous command finished
+                results[current][2] = current in errors
+            if marker == BATCHMARKER + ' END':
+                break
+            current = int(marker.split()[1])
+        elif current is not None:
+            results[current][1].append(line)
+    return results
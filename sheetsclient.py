@@ -0,0 +1,101 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import gspread
+import time
+import requests
+from threading import Lock
+from oauth2client.client import HttpAccessTokenRefreshError
+
+# Every gspread call goes through Client.request, sheetsClient spaces them out with a token bucket shared by all threads
+# so panel threads together stay under the Google Sheets per minute quota
+REQUESTSPERMINUTE = 60 # Sheets read and write quota per user is counted per minute
+BURSTSIZE = 10 # requests allowed at once before the bucket starts spacing them out
+QUOTABACKOFF = 60 # seconds waited after a 429, the quota window is a minute
+MAXQUOTARETRIES = 5 # 429s retried before the error is raised to the caller
+MAXSERVERRETRIES = 3 # 500/503s retried before the error is raised to the caller
+
+class tokenBucket():
+    def __init__(self, requestsPerMinute = REQUESTSPERMINUTE, burstSize = BURSTSIZE):
+        self.lock = Lock()
+        self.setBudget(requestsPerMinute, burstSize)
+
+    def setBudget(self, requestsPerMinute, burstSize = BURSTSIZE):
+        with self.lock:
+            self.rate = requestsPerMinute / 60 # tokens added per second
+            self.capacity = min(burstSize, requestsPerMinute)
+            self.tokens = self.capacity
+            self.lastRefill = time.monotonic()
+
+    def acquire(self): # Blocks until a request is allowed
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.lastRefill) * self.rate)
+                self.lastRefill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self): # Quota was exceeded anyway, nothing else is sent until the bucket refills
+        with self.lock:
+            self.tokens = 0
+            self.lastRefill = time.monotonic()
+
+bucket = tokenBucket() # Shared by every client since the quota is for the service account
+
+def setRequestBudget(requestsPerMinute, burstSize = BURSTSIZE):
+    bucket.setBudget(requestsPerMinute, burstSize)
+
+# Returns the type of a gspread APIError
+# 'quota' - 429, retried after a backoff
+# 'auth' - 401, token refreshed and retried
+# 'server' - 500/503, retried after a short backoff
+# 'request' - 400 and anything else, the request itself is wrong so it's raised
+def classifyError(error):
+    statusCode = error.response.status_code
+    if statusCode == 429:
+        return 'quota'
+    elif statusCode == 401:
+        return 'auth'
+    elif statusCode in (500, 502, 503):
+        return 'server'
+    return 'request'
+
+class sheetsClient(gspread.Client):
+    def request(self, *args, **kwargs):
+        quotaRetries = 0
+        serverRetries = 0
+        authRetried = False
+        while True:
+            bucket.acquire()
+            try:
+                return gspread.Client.request(self, *args, **kwargs)
+            except gspread.exceptions.APIError as error:
+                errorType = classifyError(error)
+                if errorType == 'quota' and quotaRetries < MAXQUOTARETRIES:
+                    quotaRetries += 1
+                    print('Google Sheets quota exceeded, retrying in ' + str(QUOTABACKOFF) + 's')
+                    bucket.drain()
+                    time.sleep(QUOTABACKOFF)
+                elif errorType == 'auth' and authRetried is False:
+                    authRetried = True
+                    print('credentials refreshed')
+                    self.refreshLogin()
+                elif errorType == 'server' and serverRetries < MAXSERVERRETRIES:
+                    serverRetries += 1
+                    time.sleep(2 ** serverRetries)
+                else:
+                    raise
+
+    def refreshLogin(self):
+        while True:
+            try:
+                self.login()
+                return
+            except (HttpAccessTokenRefreshError, requests.exceptions.ConnectionError):
+                time.sleep(1)
+
+def authorize(credentials): # Used in place of gspread.authorize
+    return gspread.authorize(credentials, client_class=sheetsClient)
@@ -0,0 +1,139 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import os
+import mmap
+import hashlib
+import threading
+
+# Read-only cache of the files in a site directory, shared by every panel thread
+# The directory is indexed once, small files are held in memory and large files (the RouterOS .npk) are memory-mapped
+# so concurrent uploads read the same pages instead of each opening and reading the file
+MMAPSIZE = 1024 * 1024 # Files at least this size are memory-mapped instead of read into memory
+
+class siteArtifact():
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.file = None
+        self.hash = None
+        self.stat = None
+
+    def load(self): # Loads the file if it hasn't been loaded or it changed on disk
+        stat = os.stat(self.path)
+        with self.lock:
+            if self.stat is not None and self.stat.st_mtime == stat.st_mtime and self.stat.st_size == stat.st_size:
+                return self.data
+            self.close()
+            if stat.st_size >= MMAPSIZE:
+                self.file = open(self.path, 'rb')
+                self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+            else:
+                with open(self.path, 'rb') as file:
+                    self.data = file.read()
+            self.hash = None
+            self.stat = stat
+            return self.data
+
+    def getHash(self): # sha256 of the contents, stays the same until the file changes
+        data = self.load()
+        with self.lock:
+            if self.hash is None:
+                self.hash = hashlib.sha256(data).hexdigest()
+            return self.hash
+
+    def open(self): # Each upload gets its own reader so threads don't share a file position
+        return artifactReader(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def close(self): # Called with self.lock held
+        if self.file is not None:
+            try:
+                self.data.close()
+            except BufferError: # An upload is still reading the old map, it's freed once the upload finishes
+                pass
+            self.file.close()
+            self.file = None
+        self.data = None
+        self.stat = None
+
+class artifactReader(): # File-like reader over an artifact's bytes or memory map, only what is read gets copied
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.position = 0
+
+    def read(self, size = -1):
+        if size is None or size < 0:
+            size = len(self.view) - self.position
+        chunk = self.view[self.position:self.position + size].tobytes()
+        self.position += len(chunk)
+        return chunk
+
+    def close(self):
+        self.view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class siteArtifacts():
+    def __init__(self, siteDir):
+        self.siteDir = siteDir
+        self.lock = threading.Lock()
+        self.artifacts = {}
+        self.index()
+
+    def index(self): # Relative paths are stored lowercase with / separators
+        artifacts = {}
+        for directory, folders, files in os.walk(self.siteDir):
+            for fileName in files:
+                path = os.path.join(directory, fileName)
+                key = getKey(os.path.relpath(path, self.siteDir))
+                if key in self.artifacts:
+                    artifacts[key] = self.artifacts[key]
+                else:
+                    artifacts[key] = siteArtifact(path)
+        with self.lock:
+            self.artifacts = artifacts
+
+    def get(self, relativePath): # Returns the artifact for a path relative to the site directory
+        key = getKey(relativePath)
+        with self.lock:
+            artifact = self.artifacts.get(key)
+        if artifact is None: # File was added after the site was indexed
+            self.index()
+            with self.lock:
+                artifact = self.artifacts.get(key)
+            if artifact is None:
+                raise FileNotFoundError(os.path.join(self.siteDir, relativePath))
+        return artifact
+
+    def routerosFileName(self): # RouterOS package in the site files
+        with self.lock:
+            for key in self.artifacts:
+                if '/' not in key and 'routeros' in key and '.npk' in key:
+                    return os.path.basename(self.artifacts[key].path)
+        return None
+
+    def manifest(self, relativePaths, path): # Manifest entries for ftpSendFiles, uploaded from the cache
+        manifest = []
+        for relativePath in relativePaths:
+            artifact = self.get(relativePath)
+            manifest.append([os.path.basename(artifact.path), path, artifact])
+        return manifest
+
+def getKey(relativePath):
+    return relativePath.replace('\\', '/').lower()
+
+sites = {} # siteDir: siteArtifacts
+sitesLock = threading.Lock()
+
+def getSiteArtifacts(siteDir):
+    with sitesLock:
+        if siteDir not in sites:
+            sites[siteDir] = siteArtifacts(siteDir)
+        return sites[siteDir]
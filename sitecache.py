@@ -0,0 +1,68 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import sqlite3
+import json
+import time
+import threading
+from pathlib import Path
+
+# Stores site data from Google Sheets so sites reload without using the Sheets API quota
+# sites - one row per site: NAF values, the Programming sheet location, its column index map and when it was last modified
+# rows - the Programming sheet rows
+# The cache is invalidated for the whole site when the spreadsheet's Drive modified time changes, the Sheets API can't
+# tell which ranges changed and a full read is the same single values.batchGet request as reading part of it
+CACHEPATH = 'SiteData/sitecache.db'
+DRIVEFILESURL = 'https://www.googleapis.com/drive/v3/files/' # Used to read a spreadsheet's modified time
+
+class siteCache():
+    def __init__(self, path = CACHEPATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False) # Threads share the connection behind the lock
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS sites (site TEXT PRIMARY KEY, apZone TEXT, controllerIP TEXT, spreadsheetID TEXT, worksheet TEXT, indexMap TEXT, sheetModified TEXT, loadedTime REAL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS rows (site TEXT, rowNumber INTEGER, rowValues TEXT, PRIMARY KEY (site, rowNumber))')
+
+    # Returns a dict of the cached site or None if the site hasn't been loaded before
+    def loadSite(self, site):
+        with self.lock:
+            siteRow = self.connection.execute('SELECT apZone, controllerIP, spreadsheetID, worksheet, indexMap, sheetModified, loadedTime FROM sites WHERE site = ?', (site,)).fetchone()
+            if siteRow is None:
+                return None
+            rows = self.connection.execute('SELECT rowValues FROM rows WHERE site = ? ORDER BY rowNumber', (site,)).fetchall()
+
+        return {'apZone': siteRow[0], 'controllerIP': siteRow[1], 'spreadsheetID': siteRow[2], 'worksheet': siteRow[3], 'indexMap': json.loads(siteRow[4]),
+                'sheetModified': siteRow[5], 'loadedTime': siteRow[6], 'rows': [json.loads(row[0]) for row in rows]}
+
+    # Saves the site and updates the rows that changed, returns the number of changed rows
+    def saveSite(self, site, sheetData, sheetValues, sheetModified):
+        now = time.time()
+        changedRows = 0
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO sites VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (site, sheetData.apZone, sheetData.controllerIP, sheetData.wks.spreadsheet.id, sheetData.wks.title,
+                                                                                                     json.dumps(sheetData.getIndexMap()), sheetModified, now))
+            cachedRows = dict(self.connection.execute('SELECT rowNumber, rowValues FROM rows WHERE site = ?', (site,)).fetchall())
+            x = 0
+            while x < len(sheetValues):
+                rowValues = json.dumps(sheetValues[x])
+                if cachedRows.get(x + 1) != rowValues: # Only rows that changed are written
+                    self.connection.execute('INSERT OR REPLACE INTO rows (site, rowNumber, rowValues) VALUES (?, ?, ?)', (site, x + 1, rowValues))
+                    changedRows += 1
+                x += 1
+            self.connection.execute('DELETE FROM rows WHERE site = ? AND rowNumber > ?', (site, len(sheetValues))) # Rows removed from the sheet
+
+        return changedRows
+
+    def invalidateSite(self, site): # Forces the next load to read the whole site from Google Sheets
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM sites WHERE site = ?', (site,))
+            self.connection.execute('DELETE FROM rows WHERE site = ?', (site,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+# Gets the last modified time of a spreadsheet from Google Drive, one request that doesn't count against the Sheets quota
+def getSheetModified(gc, spreadsheetID):
+    response = gc.request('get', DRIVEFILESURL + spreadsheetID, params={'fields': 'modifiedTime', 'supportsAllDrives': True})
+    return response.json()['modifiedTime']
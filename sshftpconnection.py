@@ -3,10 +3,29 @@
 import paramiko
 from ftplib import FTP
 import ftplib
-import time
 from pubsub import pub as Publisher
 import urllib3
 import select
+import codecs
+import posixpath
+import os
+import io
+import uploadscheduler
+import retrypolicy
+
+KEEPALIVE = 5 # Seconds between keepalives on panel connections, a rebooted panel is noticed within this
+READTIMEOUT = 2 # Longest wait for command output before the channel's state is checked again
+READSIZE = 32768 # bytes read from a channel at a time
+RETRYDEADLINE = 300 # Seconds a dropped panel connection is retried, a downgrade and reboot takes a couple of minutes
+AUTHDEADLINE = 120 # Seconds a failed login is retried while waiting for the panel's password to change
+
+# Retry policies for panel connections, see retrypolicy
+# A 550 from FTP means the file or directory isn't there, retrying won't change that so it's raised to the caller
+SSHERRORS = (paramiko.ssh_exception.SSHException, TimeoutError, ConnectionAbortedError, paramiko.ssh_exception.NoValidConnectionsError, ConnectionResetError, EOFError)
+FTPERRORS = (OSError, ConnectionResetError, ftplib.error_perm, ftplib.error_temp, EOFError)
+sshRetry = retrypolicy.retryPolicy(SSHERRORS, deadline = RETRYDEADLINE, fatal = (paramiko.ssh_exception.AuthenticationException,), onGiveUp = retrypolicy.printGiveUp('SSH'))
+authRetry = retrypolicy.retryPolicy(paramiko.ssh_exception.AuthenticationException, deadline = AUTHDEADLINE, baseDelay = .2, maxDelay = 2, onGiveUp = retrypolicy.printGiveUp('SSH login'))
+ftpRetry = retrypolicy.retryPolicy(FTPERRORS, deadline = RETRYDEADLINE, baseDelay = 1, classify = lambda error: str(error).startswith('550') is False, onGiveUp = retrypolicy.printGiveUp('FTP'))
 
 def testMikrotikAuth(hostname, password, port = '22', username = 'admin'): # Tests mikrotik password
     ssh = paramiko.SSHClient()
@@ -18,72 +37,83 @@ def testMikrotikAuth(hostname, password, port = '22', username = 'admin'): # Tes
     
 def connectSSH(hostname, password, port = '22', username = 'admin'): #create ssh connection with desired host
     urllib3.disable_warnings(paramiko.ssh_exception.SSHException)
+    retry = sshRetry.start()
     while True:
         try:
             ssh = paramiko.SSHClient()
-            ssh.load_system_host_keys()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy()) # Panels share addresses so system host keys aren't loaded
             ssh.connect(hostname, port, username, password)
             return ssh
-        except (paramiko.ssh_exception.SSHException, TimeoutError, ConnectionAbortedError, paramiko.ssh_exception.NoValidConnectionsError, ConnectionResetError) as error:
-            if 'Authentication failed' in str(error):
-                return False
-            time.sleep(2)
-
-def ftpGetDirs(ftpConnection):
-    contents = ftpConnection.nlst()
-    folderList = []
+        except paramiko.ssh_exception.AuthenticationException:
+            return False
+        except SSHERRORS as error:
+            retry.failed(error)
+
+# Lists one remote directory, returns {name: size} for files and a list of folder names
+# MLSD returns names, types and sizes in one listing, servers without it fall back to NLST and SIZE for each file
+def ftpListDir(ftpConnection, path):
+    files = {}
+    folders = []
+    try:
+        for name, facts in ftpConnection.mlsd(path, facts = ['type', 'size']):
+            if facts.get('type') == 'dir':
+                folders.append(name)
+            elif facts.get('type') == 'file':
+                files[name] = int(facts.get('size', -1))
+        return files, folders
+    except ftplib.error_perm as error:
+        if str(error).startswith('550'): # Directory doesn't exist
+            return files, folders
+
+    try:
+        contents = ftpConnection.nlst(path)
+    except ftplib.error_perm:
+        return files, folders
+    ftpConnection.sendcmd('TYPE I') # SIZE is only reliable in binary mode
     for item in contents:
-        if '.' not in item:
-            folderList.append('/' + item)
+        name = item.split('/')[-1]
+        if name in ('.', '..'):
+            continue
+        if '.' not in name:
+            folders.append(name)
+            continue
+        try:
+            files[name] = ftpConnection.size(posixpath.join(path, name))
+        except ftplib.error_perm:
+            files[name] = -1
+    return files, folders
 
+# Walks the remote tree from path, returns {remote path: size} for every file and a list of every folder
+def ftpListTree(ftpConnection, path = '/'):
+    fileSizes = {}
+    folderList = [path]
     x = 0
     while x < len(folderList):
-        try:
-            contents = ftpConnection.nlst(folderList[x])
-            for item in contents:
-                if '.' not in item:
-                    folderList.append(folderList[x] + '/' + item)
-        except ftplib.error_perm:
-            pass
-        
+        files, folders = ftpListDir(ftpConnection, folderList[x])
+        for name in files:
+            fileSizes[posixpath.join(folderList[x], name)] = files[name]
+        for name in folders:
+            folderList.append(posixpath.join(folderList[x], name))
         x += 1
 
-    folderList.insert(0, '/')
-    
-    return folderList
-        
-        
+    return fileSizes, folderList
+
 def ftpGetFileList(hostname, password, username = 'admin', path = '/'):
+    retry = ftpRetry.start()
     while True:
         try:
             ftpConnection = FTP(hostname, username, password)
-            ftpConnection.cwd(path)
-            folderList = ftpGetDirs(ftpConnection)
-            fileList = []
-            for item in folderList:
-                try:
-                    contents = ftpConnection.nlst(item)
-                    for item in contents:
-                        if '.' in item and item != '.' and item != '..':
-                            fileList.append(item)
-                except ftplib.error_perm:
-                    pass
-                
-            loginSize = None
-            if '/flash/hotspot' in folderList:
-                ftpConnection.sendcmd("TYPE i")
-                ftpConnection.cwd('/flash/hotspot')
-                loginSize = ftpConnection.size('login.html')
-                ftpConnection.sendcmd("TYPE A")
+            fileSizes, folderList = ftpListTree(ftpConnection, path)
             ftpConnection.quit()
-            return fileList, folderList, loginSize
-        except (OSError, ConnectionResetError, ftplib.error_perm, EOFError) as error:
+            loginSize = fileSizes.get('/flash/hotspot/login.html')
+            return list(fileSizes), folderList, loginSize
+        except FTPERRORS as error:
             print(error)
-            time.sleep(.5)
+            retry.failed(error)
 
 def ftpSendFile(hostname, password, fileName, ssid, username = 'admin', path = '/'): #send file to desired host and path
     printOnce = True
+    retry = ftpRetry.start()
     while True:
         try:
             fileTransfer = FTP(hostname, username, password)
@@ -99,79 +129,242 @@ def ftpSendFile(hostname, password, fileName, ssid, username = 'admin', path = '
             file.close()
             fileTransfer.quit()
             break
-        except (OSError, ConnectionResetError, ftplib.error_perm, EOFError):
+        except FTPERRORS as error:
             if printOnce is True:
                 Publisher.sendMessage('status', ssid = ssid, message = 'FTP Failed on ' + fileName)
                 printOnce = False
-            time.sleep(2)
+            retry.failed(error)
+
+# Uploads a manifest of files over one FTP login, see openManifestFile
+# The current directory is remembered so cwd is only sent when the directory changes
+# A failed file is retried on a new login starting from that file, files already sent aren't sent again
+# With sync the remote directories are listed once and files already on the panel with the same size are skipped,
+# sizes are compared instead of times since the panel clock is reset during programming
+# Large files wait for a slot in uploadscheduler so panels uploading at the same time don't split the bench NIC, priority orders the wait
+def ftpSendFiles(hostname, password, manifest, ssid, username = 'admin', sync = False, priority = 0):
+    printOnce = True
+    retry = ftpRetry.start()
+    x = 0
+    while x < len(manifest):
+        try:
+            fileTransfer = FTP(hostname, username, password)
+            if sync is True:
+                manifest = ftpSyncManifest(fileTransfer, manifest)
+                sync = False
+            currentPath = None
+            while x < len(manifest):
+                fileName, path = manifest[x][0:2]
+                if path != currentPath:
+                    fileTransfer.cwd(path)
+                    currentPath = path
+                fileSize = getManifestSize(manifest[x])
+                with openManifestFile(manifest[x]) as file:
+                    if fileSize >= uploadscheduler.LARGEUPLOADSIZE:
+                        uploadscheduler.scheduledUpload(lambda blockSize: fileTransfer.storbinary('STOR ' + getFileName(fileName), file, blockSize), ssid, fileSize, priority)
+                    else:
+                        fileTransfer.storbinary('STOR ' + getFileName(fileName), file)
+                x += 1
+                retry.succeeded()
+                print(ssid + ': ' + getFileName(fileName) + ' uploaded (' + str(x) + '/' + str(len(manifest)) + ')')
+            fileTransfer.quit()
+        except FTPERRORS as error:
+            if x == len(manifest): # Every file was sent, only the quit failed
+                break
+            if printOnce is True:
+                Publisher.sendMessage('status', ssid = ssid, message = 'FTP Failed on ' + getFileName(manifest[x][0]))
+                printOnce = False
+            retry.failed(error)
+
+def ftpSyncManifest(ftpConnection, manifest): # Returns the manifest without files the panel already has
+    remoteDirs = {}
+    syncedManifest = []
+    for entry in manifest:
+        fileName, path = entry[0:2]
+        if path not in remoteDirs:
+            remoteDirs[path] = ftpListDir(ftpConnection, path)[0]
+        if remoteDirs[path].get(getFileName(fileName)) != getManifestSize(entry):
+            syncedManifest.append(entry)
+    if len(syncedManifest) < len(manifest):
+        print(str(len(manifest) - len(syncedManifest)) + ' file(s) already on the panel, skipped')
+    return syncedManifest
+
+# Manifest entries are [local path, remote directory] or [file name, remote directory, contents]
+# contents are bytes for files rendered in memory or a siteartifacts.siteArtifact for cached site files
+def openManifestFile(entry):
+    if len(entry) > 2:
+        if isinstance(entry[2], bytes):
+            return io.BytesIO(entry[2])
+        return entry[2].open()
+    return open(entry[0], 'rb')
+
+def getManifestSize(entry):
+    if len(entry) > 2:
+        return len(entry[2])
+    return os.path.getsize(entry[0])
+
+def getFileName(fileName): # File name from a windows or posix path
+    return fileName.replace('\\', '/').split('/')[-1]
 
 def ftpDeleteFile(hostname, password, fileName, ssid, username = 'admin', path = '/'): #delete file from desired host and path
     printOnce = True
+    retry = ftpRetry.start()
     while True:
         try:
             fileTransfer = FTP(hostname, username, password)
             fileTransfer.cwd(path)
             fileTransfer.delete(fileName)
             break
-        except (OSError, ConnectionResetError):
+        except (OSError, ConnectionResetError) as error: # error_perm is raised, the caller handles a missing file
             if printOnce is True:
                 Publisher.sendMessage('status', ssid = ssid, message = 'FTP Failed on ' + fileName)
                 printOnce = False
-            time.sleep(2)
+            retry.failed(error)
+
+# Runs a command on an open ssh connection and yields the output lines as they arrive
+# Closing the generator early (a break in the caller's for loop) closes the channel without reading the rest of the output
+# Lines are split the same way as str.splitlines, a \r at the end of a chunk is held until the next chunk shows whether \n follows
+def streamCommand(ssh, command, timeout = READTIMEOUT):
+    channel = ssh.get_transport().open_session()
+    try:
+        channel.exec_command(command)
+        channel.shutdown_write()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors = 'replace')
+        buffer = bytearray()
+        finished = False
+        while finished is False:
+            if channel.recv_stderr_ready(): # make sure to read stderr to prevent stall
+                channel.recv_stderr(READSIZE)
+                continue
+            if channel.recv_ready():
+                chunk = channel.recv(READSIZE)
+                if len(chunk) == 0:
+                    finished = True
+                buffer += chunk
+            elif channel.eof_received or channel.closed or channel.exit_status_ready():
+                finished = True
+            else:
+                select.select([channel], [], [], timeout) # Wakes up as soon as the channel has data
+                continue
+
+            start = 0
+            while True:
+                newline = buffer.find(b'\n', start)
+                carriageReturn = buffer.find(b'\r', start, newline if newline != -1 else len(buffer))
+                if carriageReturn != -1:
+                    if carriageReturn + 1 == len(buffer) and finished is False: # \n may be in the next chunk
+                        break
+                    end = carriageReturn
+                    if carriageReturn + 1 < len(buffer) and buffer[carriageReturn + 1] == 10: # \r\n
+                        nextStart = carriageReturn + 2
+                    else:
+                        nextStart = carriageReturn + 1
+                elif newline != -1:
+                    end = newline
+                    nextStart = newline + 1
+                else:
+                    break
+                yield decoder.decode(bytes(buffer[start:end]))
+                start = nextStart
+            del buffer[:start]
+
+        if len(buffer) > 0:
+            yield decoder.decode(bytes(buffer), final = True)
+    finally:
+        channel.close()
+
+def readCommand(ssh, command, timeout = READTIMEOUT): # Runs a command on an open ssh connection and returns the output lines
+    return list(streamCommand(ssh, command, timeout))
 
 def sshSendCommand(ssh, command, hostname, password, port = '22', username = 'admin'):
-    timeout = 2
+    retry = sshRetry.start()
     while True:
         try:
-            while ssh is False:
-                ssh = connectSSH(hostname, password, port, username)
-                time.sleep(.2)
-            (stdin, stdout, stderr) = ssh.exec_command(command)
-            #@https://github.com/paramiko/paramiko/issues/563 credit for reading paramiko output
-            channel = stdout.channel
-            stdin.close()
-            channel.shutdown_write()
-
-            stdout_chunks = []
-            stdout_chunks.append(stdout.channel.recv(len(stdout.channel.in_buffer)))
-
-            while not channel.closed or channel.recv_ready() or channel.recv_stderr_ready(): 
-                # stop if channel was closed prematurely, and there is no data in the buffers.
-                got_chunk = False
-                readq, _, _ = select.select([stdout.channel], [], [], timeout)
-                for c in readq:
-                    if c.recv_ready(): 
-                        stdout_chunks.append(stdout.channel.recv(len(c.in_buffer)))
-                        got_chunk = True
-                    if c.recv_stderr_ready(): 
-                        # make sure to read stderr to prevent stall    
-                        stderr.channel.recv_stderr(len(c.in_stderr_buffer))  
-                        got_chunk = True
-                if not got_chunk \
-                    and stdout.channel.exit_status_ready() \
-                    and not stderr.channel.recv_stderr_ready() \
-                    and not stdout.channel.recv_ready(): 
-                    # indicate that we're not going to read from this channel anymore
-                    stdout.channel.shutdown_read()  
-                    # close the channel
-                    stdout.channel.close()
-                    break    # exit as remote side is finished and our bufferes are empty
-
-            # close all the pseudofiles
-            stdout.close()
-            stderr.close()
-
-            collectedLines = ''
-            x = 0
-            while x < len(stdout_chunks):
-                stdout_chunks[x] = stdout_chunks[x].decode()
-                collectedLines = collectedLines + stdout_chunks[x]
-                x += 1
-            
-            return [ssh, collectedLines.splitlines()]
-        except (paramiko.ssh_exception.SSHException, ConnectionResetError, EOFError):
+            if ssh is False:
+                ssh = loginSSH(hostname, password, port, username)
+            return [ssh, readCommand(ssh, command)]
+        except (paramiko.ssh_exception.SSHException, ConnectionResetError, EOFError) as error:
             print('Command failed to send, re-establishing connection...')
             ssh = False
+            retry.failed(error)
+
+def loginSSH(hostname, password, port = '22', username = 'admin'): # connectSSH, retrying failed logins with authRetry
+    retry = authRetry.start()
+    while True:
+        ssh = connectSSH(hostname, password, port, username)
+        if ssh is not False:
+            return ssh
+        retry.failed(paramiko.ssh_exception.AuthenticationException('Authentication failed.'))
+
+# Keeps one authenticated ssh transport open for a panel, every command opens a channel on it instead of a new connection
+# Panels reboot during programming, a dropped transport is noticed by the keepalive and reconnected on the next command
+class panelConnection():
+    def __init__(self, hostname, password, port = '22', username = 'admin'):
+        self.hostname = hostname
+        self.password = password
+        self.port = port
+        self.username = username
+        self.ssh = False
+
+    def isActive(self):
+        if self.ssh is False:
+            return False
+        transport = self.ssh.get_transport()
+        return transport is not None and transport.is_active()
+
+    def connect(self): # Authentication failures are retried, the password may not be set yet
+        self.close()
+        self.ssh = loginSSH(self.hostname, self.password, self.port, self.username)
+        self.ssh.get_transport().set_keepalive(KEEPALIVE)
+
+    # Returns the output lines of a command, hostname and password are updated if the panel's have changed
+    # A new password is only used when reconnecting, the open transport is already authenticated
+    def sendCommand(self, command, hostname = None, password = None):
+        if hostname is not None and hostname != self.hostname:
+            self.hostname = hostname
+            self.close()
+        if password is not None:
+            self.password = password
+        retry = sshRetry.start()
+        while True:
+            try:
+                if self.isActive() is False:
+                    self.connect()
+                return readCommand(self.ssh, command)
+            except (paramiko.ssh_exception.SSHException, ConnectionResetError, EOFError) as error:
+                print('Command failed to send, re-establishing connection...')
+                self.close()
+                retry.failed(error)
+
+    # Yields the output lines of a command as they arrive, see streamCommand
+    # The command is retried on a new connection if it fails before any output, a failure after that ends the output early
+    def streamCommand(self, command, hostname = None, password = None):
+        if hostname is not None and hostname != self.hostname:
+            self.hostname = hostname
+            self.close()
+        if password is not None:
+            self.password = password
+        retry = sshRetry.start()
+        while True:
+            started = False
+            try:
+                if self.isActive() is False:
+                    self.connect()
+                for line in streamCommand(self.ssh, command):
+                    started = True
+                    yield line
+                return
+            except (paramiko.ssh_exception.SSHException, ConnectionResetError, EOFError) as error:
+                self.close()
+                if started is True:
+                    print('Connection lost during command output')
+                    return
+                print('Command failed to send, re-establishing connection...')
+                retry.failed(error)
+
+    def close(self):
+        if self.ssh is not False:
+            self.ssh.close()
+            self.ssh = False
 
 def enableSSH(hostname, password, fileName, username = 'admin', path = '/'):
     fileTransfer = FTP(hostname, username, password)
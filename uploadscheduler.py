@@ -0,0 +1,75 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import heapq
+import itertools
+import threading
+import time
+
+# Limits how many large uploads (the RouterOS .npk) run at once so panels don't all share the bench NIC at the same time
+# Waiting uploads are started in priority order, panels further along in programming go first and ties go in arrival order
+LARGEUPLOADSIZE = 1024 * 1024 # Uploads at least this size are scheduled
+MAXLARGEUPLOADS = 2 # Large uploads allowed at once
+LARGEBLOCKSIZE = 64 * 1024 # storbinary block size for large uploads, default is 8192
+
+class uploadScheduler():
+    def __init__(self, maxUploads = MAXLARGEUPLOADS):
+        self.condition = threading.Condition()
+        self.maxUploads = maxUploads
+        self.running = 0
+        self.waiting = [] # heap of [-priority, arrival, ssid]
+        self.arrivals = itertools.count()
+        self.stats = {'uploads': 0, 'bytes': 0, 'seconds': 0, 'waitSeconds': 0}
+
+    def setMaxUploads(self, maxUploads):
+        with self.condition:
+            self.maxUploads = maxUploads
+            self.condition.notify_all()
+
+    def acquire(self, ssid, priority = 0): # Blocks until the upload is allowed to start, returns the seconds waited
+        startTime = time.monotonic()
+        with self.condition:
+            entry = [-priority, next(self.arrivals), ssid]
+            heapq.heappush(self.waiting, entry)
+            while self.waiting[0] is not entry or self.running >= self.maxUploads:
+                self.condition.wait()
+            heapq.heappop(self.waiting)
+            self.running += 1
+            self.condition.notify_all() # The next waiting upload may also fit
+        return time.monotonic() - startTime
+
+    def release(self, size, seconds, waitSeconds):
+        with self.condition:
+            self.running -= 1
+            if size is not None:
+                self.stats['uploads'] += 1
+                self.stats['bytes'] += size
+                self.stats['seconds'] += seconds
+                self.stats['waitSeconds'] += waitSeconds
+            self.condition.notify_all()
+
+    def getStats(self): # Totals for completed large uploads, throughput is in bytes per second
+        with self.condition:
+            stats = dict(self.stats)
+            stats['running'] = self.running
+            stats['waiting'] = len(self.waiting)
+        if stats['seconds'] > 0:
+            stats['throughput'] = stats['bytes'] / stats['seconds']
+        else:
+            stats['throughput'] = 0
+        return stats
+
+scheduler = uploadScheduler() # Shared by every panel thread
+
+# Runs upload() for a large file once the scheduler allows it, upload is passed the block size to use
+def scheduledUpload(upload, ssid, size, priority = 0):
+    waitSeconds = scheduler.acquire(ssid, priority)
+    startTime = time.monotonic()
+    uploaded = None
+    try:
+        upload(LARGEBLOCKSIZE)
+        uploaded = size
+    finally:
+        seconds = time.monotonic() - startTime
+        scheduler.release(uploaded, seconds, waitSeconds)
+    if seconds > 0:
+        print(ssid + ': ' + str(round(size / 1048576, 1)) + 'MB uploaded at ' + str(round(size / seconds / 1048576, 2)) + 'MB/s after waiting ' + str(round(waitSeconds, 1)) + 's')
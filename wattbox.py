@@ -1,122 +1,126 @@
 # Written by Kai McGregor for use in Kai-ACK
 
-from splinter import Browser
-import os
 import requests
 from xml.etree import ElementTree
-import subprocess
-import time
-import selenium
-import splinter
+from html.parser import HTMLParser
+import threading
+import readiness
+import retrypolicy
 
-def configWattbox(panel, ip, passwordTested):
-    # Get wattbox SN
-    ip = ip.strip()
-    url = 'http://' + ip + '/wattbox_info.xml'
+# The WattBox is configured over plain HTTP, the restore page's form is read and the panel's config file is posted to it
+# Sessions are pooled per WattBox ip so the connection is reused across requests
+WATTBOXTIMEOUT = 10 # Seconds before a WattBox request gives up
+RESTOREFIELD = 'settings_file' # File input on save_restore.htm
+QCIP = '192.168.88.254' # WattBox address once the panel's config is restored
+QCDEADLINE = 60 # Seconds QC retries while the WattBox web server comes back after the restore
+
+class wattboxLoginError(Exception): # Credentials were refused or the page returned isn't the one asked for
+    pass
+
+sessions = {} # ip: requests.Session
+sessionsLock = threading.Lock()
+
+def getSession(ip):
+    with sessionsLock:
+        if ip not in sessions:
+            sessions[ip] = requests.Session()
+        return sessions[ip]
+
+def closeSession(ip):
+    with sessionsLock:
+        session = sessions.pop(ip, None)
+    if session is not None:
+        session.close()
+
+def getCredentials(panel, passwordTested): # Default, site or tested credentials, see UI.wattboxProgramThread
     if passwordTested is False:
-        with requests.session() as sessionID:
-            r = sessionID.get(url, auth=('wattbox', 'wattbox'))
-            r = ElementTree.fromstring(r.content)
-            panel.wattSN = r.findtext('serial_number')
-            dir_path = os.path.dirname(os.path.realpath(__file__))
-            
-            browser = Browser('chrome', headless=True) 
-            browser.visit('http://wattbox:wattbox@' + ip + '/save_restore.htm')
-            try:
-                browser.attach_file('settings_file', dir_path + '/WattBox/' + panel.ssid + '.cfg')
-            except splinter.exceptions.ElementDoesNotExist:
-                browser.quit()
-                raise splinter.exceptions.ElementDoesNotExist
-            browser.find_by_value('Restore').first.click()
-            browser.quit()
-            
+        return ('wattbox', 'wattbox')
     elif passwordTested is True:
-        with requests.session() as sessionID:
-            r = sessionID.get(url, auth=('admin', panel.sitePassword))
-            r = ElementTree.fromstring(r.content)
-            panel.wattSN = r.findtext('serial_number')
-            dir_path = os.path.dirname(os.path.realpath(__file__))
-            
-            browser = Browser('chrome', headless=True) 
-            browser.visit('http://admin:'+ panel.sitePassword + '@' + ip + '/save_restore.htm')
-            try:
-                browser.attach_file('settings_file', dir_path + '/WattBox/' + panel.ssid + '.cfg')
-            except splinter.exceptions.ElementDoesNotExist:
-                browser.quit()
-                raise splinter.exceptions.ElementDoesNotExist
-            browser.find_by_value('Restore').first.click()
-            browser.quit()
-    else:
-        with requests.session() as sessionID:
-            r = sessionID.get(url, auth=('admin', passwordTested))
-            r = ElementTree.fromstring(r.content)
-            panel.wattSN = r.findtext('serial_number')
-            dir_path = os.path.dirname(os.path.realpath(__file__))
-
-            browser = Browser('chrome', headless=True) 
-            browser.visit('http://admin:' + passwordTested + '@' + ip + '/save_restore.htm')
-            try:
-                browser.attach_file('settings_file', dir_path + '/WattBox/' + panel.ssid + '.cfg')
-            except splinter.exceptions.ElementDoesNotExist:
-                browser.quit()
-                raise splinter.exceptions.ElementDoesNotExist
-            browser.find_by_value('Restore').first.click()
-            browser.quit()
+        return ('admin', panel.sitePassword)
+    return ('admin', passwordTested)
+
+def getPage(ip, page, auth): # Returns the response for a page, raises wattboxLoginError if the credentials are refused
+    response = getSession(ip).get('http://' + ip + '/' + page, auth = auth, timeout = WATTBOXTIMEOUT)
+    if response.status_code == 401:
+        raise wattboxLoginError(page)
+    return response
+
+# Collects the forms on a page, each is {'action', 'method', 'inputs': [[type, name, value]]}
+# fields is {id: value} for every input on the page, the settings pages fill their inputs in the html
+class formParser(HTMLParser):
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.forms = []
+        self.fields = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self.forms.append({'action': attrs.get('action') or '', 'method': (attrs.get('method') or 'get').lower(), 'inputs': []})
+        elif tag == 'input':
+            if attrs.get('id') is not None:
+                self.fields[attrs['id']] = attrs.get('value') or ''
+            if len(self.forms) > 0:
+                self.forms[-1]['inputs'].append([(attrs.get('type') or 'text').lower(), attrs.get('name'), attrs.get('value') or ''])
+
+def getFields(html): # Returns {id: value} for the inputs on a page
+    parser = formParser()
+    parser.feed(html)
+    return parser.fields
+
+def getForm(html, fieldName): # Returns the form with an input named fieldName or None
+    parser = formParser()
+    parser.feed(html)
+    for form in parser.forms:
+        for inputType, name, value in form['inputs']:
+            if name == fieldName:
+                return form
+    return None
+
+# Posts a settings file to the restore form the same way the Restore button does
+def restoreSettings(ip, auth, fileName, contents):
+    form = getForm(getPage(ip, 'save_restore.htm', auth).text, RESTOREFIELD)
+    if form is None: # Not the restore page, the WattBox sent its login or error page
+        raise wattboxLoginError('save_restore.htm')
+
+    data = {}
+    for inputType, name, value in form['inputs']:
+        if name is None or name == RESTOREFIELD:
+            continue
+        if inputType == 'hidden' or inputType == 'submit' and value == 'Restore': # Only the clicked button is sent
+            data[name] = value
+    action = form['action'].lstrip('/') or 'save_restore.htm'
+    response = getSession(ip).post('http://' + ip + '/' + action, auth = auth, data = data, files = {RESTOREFIELD: (fileName, contents, 'application/octet-stream')}, timeout = WATTBOXTIMEOUT)
+    if response.status_code == 401:
+        raise wattboxLoginError(action)
+    response.raise_for_status()
+
+def configWattbox(panel, ip, passwordTested):
+    ip = ip.strip()
+    auth = getCredentials(panel, passwordTested)
+
+    # Get wattbox SN
+    response = getPage(ip, 'wattbox_info.xml', auth)
+    panel.wattSN = ElementTree.fromstring(response.content).findtext('serial_number')
+
+    # Restore the config rendered for the panel, see createfiles
+    restoreSettings(ip, auth, panel.ssid + '.cfg', panel.wattboxConfig)
 
     return panel
 
+# The WattBox reboots after a restore, connection errors are retried until its web server answers again
+qcRetry = retrypolicy.retryPolicy((requests.exceptions.ConnectionError, requests.exceptions.Timeout), deadline = QCDEADLINE, baseDelay = .75, maxDelay = 5)
+
+def getQCFields(auth): # Returns [hostname, domain, email user] from the network and email settings pages
+    ipFields = getFields(getPage(QCIP, 'ipaddr.htm', auth).text)
+    if 'mib_name' not in ipFields: # Not the settings page, the WattBox sent its login or error page
+        raise wattboxLoginError('ipaddr.htm')
+    email = getFields(getPage(QCIP, 'mailsetting.htm', auth).text).get('sender', '')
+    return [ipFields['mib_name'], ipFields.get('wbx_domain', ''), email.split('@')[0]]
+
 def qcWattbox(panel):
-    x = 0
-    while True:
-        CREATE_NO_WINDOW = 0x08000000
-        cmdCommand = subprocess.Popen(['ping', '/n', '1', '192.168.88.254'], stdout = subprocess.PIPE, creationflags = CREATE_NO_WINDOW)
-        pingReturn = cmdCommand.communicate()
-        if 'Received = 1' in str(pingReturn[0]) and 'Destination host unreachable' not in str(pingReturn[0]):
-            if x == 0 or x == 1:
-                time.sleep(3)
-            else:
-                break
-
-        time.sleep(1)
-        x += 1
-    
-    while True:
-        try:
-            browser = Browser('chrome', headless = True)
-            browser.visit('http://admin:'+ panel.sitePassword + '@192.168.88.254/ipaddr.htm')
-            try:
-                hostname = browser.find_by_id('mib_name').first.value
-            except splinter.exceptions.ElementDoesNotExist:
-                browser.quit()
-                raise splinter.exceptions.ElementDoesNotExist
-            domain = browser.find_by_id('wbx_domain').first.value
-            browser.visit('http://admin:'+ panel.sitePassword + '@192.168.88.254/mailsetting.htm')
-            email = browser.find_by_id('sender').first.value
-            email = email[0:email.index('@')]
-            browser.quit()
-            break
-        except selenium.common.exceptions.TimeoutException:
-            browser.quit()
-            time.sleep(.75)
+    readiness.waitForPort(QCIP, 80, None) # Web server is up once it accepts connections
+    closeSession(QCIP) # Pooled connections from before the restore are stale
     
-    if panel.ssid == hostname and panel.ssid == domain and panel.ssid == email:
-        
-        return [True, True, True]
-    else:
-        returnList = []
-        if panel.ssid != hostname:
-            returnList.append(False)
-        else:
-            returnList.append(True)
-
-        if panel.ssid != domain:
-            returnList.append(False)
-        else:
-            returnList.append(True)
-
-        if panel.ssid != email:
-            returnList.append(False)
-        else:
-            returnList.append(True)
-
-        return returnList
+    hostname, domain, email = qcRetry.run(getQCFields, ('admin', panel.sitePassword))
+    return [panel.ssid == hostname, panel.ssid == domain, panel.ssid == email]
@@ -0,0 +1,144 @@
+# Written by Kai McGregor for use in Kai-ACK
+
+import gspread
+import json
+import os
+import requests
+from threading import Thread, Event, Lock
+from pathlib import Path
+from oauth2client.client import HttpAccessTokenRefreshError
+
+# Queues spreadsheet writes and flushes them together in one update_cells call
+# Pending cells are saved to disk until they're written so a crash doesn't lose finished panels
+FLUSHINTERVAL = 5 # seconds between flushes
+MINBACKOFF = 5 # seconds waited after the first quota error, doubles on each error after
+MAXBACKOFF = 60 # Sheets quota is per minute so waits never go past this
+QUEUEDIR = 'SiteData/'
+
+class writeQueue(Thread):
+    def __init__(self, sheetData, flushInterval = FLUSHINTERVAL, queueDir = QUEUEDIR):
+        Thread.__init__(self)
+        self.sheetData = sheetData
+        self.flushInterval = flushInterval
+        Path(queueDir).mkdir(parents=True, exist_ok=True)
+        self.path = os.path.join(queueDir, 'pendingwrites_' + sheetData.wks.spreadsheet.id + '.json') # One file per spreadsheet
+        self.lock = Lock()
+        self.flushLock = Lock() # Only one flush at a time so stop() and the thread don't write the same cells twice
+        self.pending = {} # cell values keyed by (row, col), newer writes replace older ones
+        self.backoff = 0
+        self.flushNow = Event()
+        self.stopped = Event()
+        self.loadPending()
+
+        self.daemon = True
+        self.start()
+
+    def loadPending(self): # Picks up writes left over from a crash
+        try:
+            with open(self.path, 'r') as file:
+                pendingFile = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if pendingFile.get('worksheet') != self.sheetData.wks.title:
+            return
+        for cell in pendingFile['cells']:
+            self.pending[(cell[0], cell[1])] = cell[2]
+        if len(self.pending) > 0:
+            print(str(len(self.pending)) + ' unwritten cells loaded from the last session')
+
+    def savePending(self): # Called with self.lock held
+        if len(self.pending) == 0:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        cells = []
+        for key in self.pending:
+            cells.append([key[0], key[1], self.pending[key]])
+        tempPath = self.path + '.tmp'
+        with open(tempPath, 'w') as file:
+            json.dump({'worksheet': self.sheetData.wks.title, 'cells': cells}, file)
+        os.replace(tempPath, self.path) # File is never left half written
+
+    def addCells(self, cellList):
+        with self.lock:
+            for cell in cellList:
+                self.pending[(cell.row, cell.col)] = cell.value
+            self.savePending()
+
+    def writePanel(self, panelWrite): # Replaces spreadsheetData.write
+        self.addCells(self.sheetData.panelCells(panelWrite))
+
+    def writeAPs(self, apWrite): # Replaces spreadsheetData.writeDoubleAP
+        self.addCells(self.sheetData.apCells(apWrite))
+
+    def run(self):
+        while self.stopped.is_set() is False:
+            self.flushNow.wait(self.flushInterval + self.backoff)
+            self.flushNow.clear()
+            self.flush()
+
+    def flush(self): # Writes every pending cell, returns False if they're still queued
+        with self.flushLock:
+            try:
+                return self.writePending()
+            except Exception as error: # Anything unexpected (a token refresh, a read timeout) leaves the cells queued and keeps the thread running
+                print('Spreadsheet write failed: ' + repr(error))
+                self.increaseBackoff()
+                return False
+
+    def writePending(self): # Writes every pending cell in one request
+        with self.lock:
+            pending = dict(self.pending)
+        if len(pending) == 0:
+            return True
+
+        cellList = []
+        for key in pending:
+            cellList.append(gspread.models.Cell(key[0], key[1], value = pending[key]))
+
+        try:
+            self.sheetData.wks.update_cells(cellList)
+        except gspread.exceptions.APIError as error:
+            if error.response.status_code == 400: # Batch rejected, old write process sends cells one at a time
+                print('old write process used')
+                for cell in cellList:
+                    self.sheetData.wks.update_cell(cell.row, cell.col, cell.value)
+            else:
+                self.apiError(error)
+                return False
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError):
+            self.increaseBackoff()
+            return False
+
+        self.backoff = 0
+        with self.lock:
+            for key in pending:
+                if self.pending.get(key) == pending[key]: # Cells rewritten during the flush stay queued
+                    del self.pending[key]
+            self.savePending()
+        for cell in cellList:
+            self.sheetData.setSnapshotCell(cell.row, cell.col, cell.value)
+        print(str(len(cellList)) + ' cells written to spreadsheet')
+        return True
+
+    def apiError(self, error):
+        if error.response.status_code == 429: # Quota exceeded
+            self.increaseBackoff()
+            print('Spreadsheet quota exceeded, retrying in ' + str(self.backoff) + 's')
+        elif error.response.status_code == 401: # Token expired
+            print('credentials refreshed')
+            try:
+                self.sheetData.gc.login()
+            except HttpAccessTokenRefreshError:
+                self.increaseBackoff()
+        else:
+            print(error)
+            self.increaseBackoff()
+
+    def increaseBackoff(self):
+        self.backoff = min(max(self.backoff * 2, MINBACKOFF), MAXBACKOFF)
+
+    def stop(self): # Flushes what's left, anything that fails stays on disk for next time
+        self.stopped.set()
+        self.flushNow.set()
+        self.flush()